@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+End-to-end ETL benchmark
+Generates seeded datasets of fixed sizes, runs every ETLPipeline stage
+against the MySQL/MariaDB configured in .env and saves per-stage
+throughput, batch latency percentiles, memory and the query plans of the
+workload registered in scripts/index_advisor.py as JSON.
+
+    python benchmarks/run_benchmark.py --sizes 100k 1m --allow-reset
+    python benchmarks/run_benchmark.py --compare benchmarks/results/A.json benchmarks/results/B.json
+
+Each run TRUNCATES the staging and DW tables, so point it at a scratch
+database; --allow-reset is required to confirm that.
+"""
+import sys
+import os
+
+# Thêm thư mục gốc vào đường dẫn Python
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+sys.path.append(os.path.join(ROOT_DIR, 'scripts'))
+sys.path.append(os.path.join(ROOT_DIR, 'data'))
+
+import argparse
+import json
+import multiprocessing
+import platform
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+SIZES = {
+    '100k': 100_000,
+    '1m': 1_000_000,
+    '10m': 10_000_000,
+}
+DEFAULT_SEED = 42
+
+# Fixed "today" for the generator, inside the ETLConfig date range, so datasets never drift
+REFERENCE_DATE = datetime(2025, 6, 30)
+
+DATASET_DIR = os.path.join(ROOT_DIR, 'benchmarks', 'data')
+RESULTS_DIR = os.path.join(ROOT_DIR, 'benchmarks', 'results')
+
+# Tables emptied before each size, so every run starts from the same state
+STAGING_TABLES = [
+    'staging_sales', 'staging_customers', 'staging_products', 'etl_metadata',
+    'staging_sales_rejects', 'staging_customers_rejects', 'staging_products_rejects',
+]
+DW_TABLES = [
+    'fact_sales', 'agg_sales_daily', 'dim_customer', 'dim_product', 'dim_date', 'dim_order',
+    'etl_metadata', 'etl_checkpoint',
+]
+
+# Stage metrics copied into the result file
+STAGE_FIELDS = [
+    'status', 'duration_seconds', 'rows', 'rows_per_second', 'bytes_read', 'batches',
+    'batch_p50_seconds', 'batch_p95_seconds', 'batch_p99_seconds', 'round_trips', 'retries',
+    'parse_seconds', 'transform_seconds', 'db_wait_seconds', 'peak_rss_mb',
+]
+
+
+def git_commit():
+    """Current commit hash, with a -dirty suffix for uncommitted changes"""
+    try:
+        commit = subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR, text=True
+        ).strip()
+        dirty = subprocess.call(['git', 'diff', '--quiet', 'HEAD'], cwd=ROOT_DIR) != 0
+        return f"{commit}-dirty" if dirty else commit
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def ensure_dataset(size_label, seed):
+    """Generate the dataset for a size/seed once and reuse it afterwards"""
+    import generate_sample_data
+
+    num_sales = SIZES[size_label]
+    dataset_dir = os.path.join(DATASET_DIR, f"{size_label}_seed{seed}")
+    if os.path.exists(os.path.join(dataset_dir, 'sales.csv')):
+        return dataset_dir
+
+    os.makedirs(dataset_dir, exist_ok=True)
+    print(f"Generating {size_label} dataset (seed {seed}) in {dataset_dir}")
+    generate_sample_data.generate_customers(
+        max(1000, num_sales // 200), output_dir=dataset_dir, reference_date=REFERENCE_DATE, seed=seed
+    )
+    generate_sample_data.generate_products(200, output_dir=dataset_dir, seed=seed)
+    generate_sample_data.generate_sales(
+        num_sales, output_dir=dataset_dir, reference_date=REFERENCE_DATE, seed=seed,
+        workers=os.cpu_count() or 1
+    )
+    return dataset_dir
+
+
+def reset_databases(connections):
+    """Empty the staging and DW tables the pipeline writes to"""
+    for database, tables in (('staging', STAGING_TABLES), ('dw', DW_TABLES)):
+        with connections.connection(database) as connection:
+            cursor = connection.cursor()
+            try:
+                cursor.execute("SET SESSION foreign_key_checks = 0")
+                for table in tables:
+                    cursor.execute(f"TRUNCATE TABLE {table}")
+                cursor.execute("SET SESSION foreign_key_checks = 1")
+                connection.commit()
+            finally:
+                cursor.close()
+
+
+def server_version(connections):
+    with connections.connection('dw') as connection:
+        cursor = connection.cursor()
+        try:
+            cursor.execute("SELECT VERSION()")
+            return cursor.fetchone()[0]
+        finally:
+            cursor.close()
+
+
+def run_size(size_label, dataset_dir, run_id):
+    """Benchmark one dataset size; runs in its own process so peak RSS is per size"""
+    # The ETL modules log and read data relative to the project root
+    os.chdir(ROOT_DIR)
+    os.makedirs('logs', exist_ok=True)
+
+    from connection_manager import ConnectionManager
+    from etl_metrics import MetricsRecorder
+    from index_advisor import IndexAdvisor
+    from etl_pipeline import ETLPipeline
+    from stage_scheduler import StageScheduler
+
+    class BenchmarkRecorder(MetricsRecorder):
+        """Keeps every stage's metrics in memory besides publishing them"""
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.results = []
+
+        def publish(self, metrics):
+            super().publish(metrics)
+            self.results.append(metrics)
+
+    connections = ConnectionManager()
+    reset_databases(connections)
+
+    pipeline = ETLPipeline(connection_manager=connections, run_id=run_id)
+    pipeline.data_dir = dataset_dir
+    recorder = BenchmarkRecorder(connections, run_id=run_id)
+
+    # One worker, so each stage is measured without competing for the server
+    scheduler = StageScheduler(pipeline.build_stages(), max_workers=1, metrics_recorder=recorder)
+    start = time.perf_counter()
+    scheduler.run()
+    total_seconds = time.perf_counter() - start
+
+    stages = {}
+    for metrics in recorder.results:
+        result = metrics.as_dict()
+        stages[metrics.stage_name] = {field: result[field] for field in STAGE_FIELDS}
+
+    return {
+        'sales_rows': SIZES[size_label],
+        'dataset': os.path.relpath(dataset_dir, ROOT_DIR),
+        'total_seconds': round(total_seconds, 3),
+        'rows_per_second': round(SIZES[size_label] / total_seconds, 2),
+        'mysql_version': server_version(connections),
+        'stages': stages,
+        # Plans of the registered workload on the loaded data, compared by --compare
+        'plans': IndexAdvisor(connections).plans(),
+    }
+
+
+def run_benchmark(size_labels, seed, output_dir=RESULTS_DIR):
+    """Run every size and write one JSON result file; returns its path"""
+    from config.database_config import DatabaseConfig
+    from config.etl_config import ETLConfig
+
+    commit = git_commit()
+    created_at = datetime.now()
+    result = {
+        'commit': commit,
+        'created_at': created_at.isoformat(timespec='seconds'),
+        'seed': seed,
+        'host': {
+            'platform': platform.platform(),
+            'python': platform.python_version(),
+            'cpu_count': os.cpu_count(),
+        },
+        'config': {
+            'extract_batch_size': ETLConfig.BATCH_SIZE,
+            'chunk_size': DatabaseConfig.CHUNK_SIZE,
+            'etl_pool_size': DatabaseConfig.ETL_POOL_SIZE,
+            'memory_budget_mb': ETLConfig.MEMORY_BUDGET_MB,
+        },
+        'sizes': {},
+    }
+
+    # A fresh spawned process per size keeps peak RSS and pools independent
+    context = multiprocessing.get_context('spawn')
+    for size_label in size_labels:
+        dataset_dir = ensure_dataset(size_label, seed)
+        run_id = f"bench-{size_label}-{commit}-{created_at.strftime('%Y%m%dT%H%M%S')}"
+        print(f"Running {size_label} benchmark ({run_id})")
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            result['sizes'][size_label] = executor.submit(run_size, size_label, dataset_dir, run_id).result()
+        print(f"  {size_label}: {result['sizes'][size_label]['total_seconds']:.1f}s")
+
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, f"{created_at.strftime('%Y%m%dT%H%M%S')}_{commit}.json")
+    with open(path, 'w', encoding='utf-8') as result_file:
+        json.dump(result, result_file, indent=2)
+    print(f"Results written to {path}")
+    return path
+
+
+def compare_results(base_path, head_path, threshold=0.10):
+    """Print per-stage changes and worse query plans between two result files; returns the regressions"""
+    from index_advisor import compare_plans
+
+    with open(base_path, encoding='utf-8') as base_file:
+        base = json.load(base_file)
+    with open(head_path, encoding='utf-8') as head_file:
+        head = json.load(head_file)
+
+    print(f"Base {base['commit']} ({base['created_at']})  vs  head {head['commit']} ({head['created_at']})")
+    regressions = []
+    for size_label, head_size in head['sizes'].items():
+        base_size = base['sizes'].get(size_label)
+        if base_size is None:
+            continue
+        print(f"\n{size_label}")
+        print(f"  {'stage':<28} {'base s':>10} {'head s':>10} {'change':>8} {'p95 base':>10} {'p95 head':>10}")
+        for stage, head_stage in head_size['stages'].items():
+            base_stage = base_size['stages'].get(stage)
+            if base_stage is None or not base_stage['duration_seconds']:
+                continue
+            change = head_stage['duration_seconds'] / base_stage['duration_seconds'] - 1
+            flag = ''
+            if change > threshold:
+                flag = '  REGRESSION'
+                regressions.append((size_label, stage, change))
+            print(
+                f"  {stage:<28} {base_stage['duration_seconds']:>10.2f} "
+                f"{head_stage['duration_seconds']:>10.2f} {change:>+8.1%} "
+                f"{base_stage['batch_p95_seconds'] or 0:>10.3f} "
+                f"{head_stage['batch_p95_seconds'] or 0:>10.3f}{flag}"
+            )
+        for query, change in compare_plans(base_size.get('plans', {}), head_size.get('plans', {})):
+            print(f"  PLAN REGRESSION {query}: {change}")
+            regressions.append((size_label, query, change))
+    return regressions
+
+
+def parse_size(value):
+    label = value.lower()
+    if label not in SIZES:
+        raise argparse.ArgumentTypeError(f"size must be one of {', '.join(SIZES)}")
+    return label
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the ETL pipeline end to end")
+    parser.add_argument('--sizes', nargs='+', type=parse_size, default=['100k'],
+                        help="dataset sizes to run (100k, 1m, 10m)")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help="dataset seed")
+    parser.add_argument('--output', default=RESULTS_DIR, help="directory for result JSON files")
+    parser.add_argument('--allow-reset', action='store_true',
+                        help="confirm the configured databases may be truncated")
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'HEAD'),
+                        help="compare two result files instead of running")
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help="slowdown ratio reported as a regression (default 0.10)")
+    args = parser.parse_args()
+
+    if args.compare:
+        found = compare_results(args.compare[0], args.compare[1], args.threshold)
+        if found:
+            print(f"\n{len(found)} regression(s): stages slower by more than {args.threshold:.0%} or worse plans")
+            sys.exit(1)
+        sys.exit(0)
+
+    if not args.allow_reset:
+        parser.error("benchmarks truncate the staging and DW tables; pass --allow-reset to confirm")
+
+    run_benchmark(args.sizes, args.seed, args.output)
@@ -25,6 +25,17 @@ class DatabaseConfig:
     MAX_RETRIES = 3
     RETRY_DELAY = 5
     
+    # Dashboard connection pool
+    DASHBOARD_POOL_SIZE = int(os.getenv('DASHBOARD_POOL_SIZE', 5))
+    DASHBOARD_POOL_TIMEOUT = float(os.getenv('DASHBOARD_POOL_TIMEOUT', 10))
+    DASHBOARD_QUERY_TIMEOUT = float(os.getenv('DASHBOARD_QUERY_TIMEOUT', 30))
+    # 'mysql', or 'duckdb' to serve filtered views from the OLAP mirror (MySQL stays the fallback)
+    DASHBOARD_BACKEND = os.getenv('DASHBOARD_BACKEND', 'mysql')
+    
+    # ETL connection pools, one per database, shared by all steps of a run
+    ETL_POOL_SIZE = int(os.getenv('ETL_POOL_SIZE', 5))
+    ETL_POOL_TIMEOUT = float(os.getenv('ETL_POOL_TIMEOUT', 60))
+    
     @classmethod
     def get_staging_connection_string(cls):
         return f"mysql+mysqlconnector://{cls.STAGING_USER}:{cls.STAGING_PASSWORD}@{cls.STAGING_HOST}:{cls.STAGING_PORT}/{cls.STAGING_DATABASE}"
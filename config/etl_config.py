@@ -1,3 +1,6 @@
+import os
+
+
 class ETLConfig:
     """Configuration for ETL processes"""
     
@@ -10,6 +13,51 @@ class ETLConfig:
     # ETL settings
     BATCH_SIZE = 50000
     LOG_FILE = "logs/etl.log"
+    METRICS_LOG = "logs/etl_metrics.jsonl"
+
+    # Memory budget for the whole process (e.g. the container limit); batch sizes shrink to fit it
+    MEMORY_BUDGET_MB = int(os.getenv('ETL_MEMORY_BUDGET_MB', 1024))
+    MEMORY_BATCH_FRACTION = 0.5  # share of the budget for batch data, split across parallel stages
+    MIN_BATCH_ROWS = 1000
+    LOAD_BATCH_SIZE = 5000  # upper bound for DW load batches
+
+    # Opt-in profiling: comma-separated stage names, or "all"; empty disables it
+    PROFILE_STAGES = [
+        stage.strip() for stage in os.getenv('ETL_PROFILE_STAGES', '').split(',') if stage.strip()
+    ]
+    PROFILER = os.getenv('ETL_PROFILER', 'cprofile')  # cprofile or sampling
+    PROFILE_MEMORY = os.getenv('ETL_PROFILE_MEMORY', '1') == '1'  # tracemalloc snapshot per stage
+    PROFILE_SAMPLE_INTERVAL = float(os.getenv('ETL_PROFILE_SAMPLE_INTERVAL', 0.005))
+    PROFILE_TRACEMALLOC_FRAMES = 10
+    PROFILE_TOP_N = 40
+    
+    # Independent pipeline stages run concurrently on this many workers (1 = sequential)
+    MAX_PARALLEL_STAGES = int(os.getenv('ETL_MAX_PARALLEL_STAGES', 4))
+    
+    # Monthly fact_sales partitions: created this many months past today; 0 retention keeps everything
+    FACT_PARTITIONS_AHEAD = 3
+    FACT_RETENTION_MONTHS = int(os.getenv('ETL_FACT_RETENTION_MONTHS', 0))
+    FACT_ARCHIVE_EXPIRED = os.getenv('ETL_FACT_ARCHIVE_EXPIRED', '1') == '1'  # archive tables instead of dropping
+    # Fact load with indexes dropped and rebuilt afterwards: '1', '0', or 'auto' (when fact_sales is empty)
+    FACT_BULK_LOAD = os.getenv('ETL_FACT_BULK_LOAD', 'auto')
+    
+    # Staging purge after each load: loaded or rejected rows are archived per source file
+    # ('file': gzip CSV under STAGING_ARCHIVE_DIR, 'table': <table>_history, 'none') and deleted.
+    # Off by default: fact reloads read staging_sales, so purged months can no longer be reloaded
+    STAGING_PURGE_ENABLED = os.getenv('ETL_STAGING_PURGE', '0') == '1'
+    STAGING_ARCHIVE_MODE = os.getenv('ETL_STAGING_ARCHIVE_MODE', 'file')
+    STAGING_ARCHIVE_DIR = os.getenv('ETL_STAGING_ARCHIVE_DIR', 'archive/staging')
+    STAGING_RETENTION_DAYS = int(os.getenv('ETL_STAGING_RETENTION_DAYS', 0))  # keep recent files this long
+    STAGING_PURGE_BATCH_SIZE = 5000
+    
+    # Optional DuckDB copy of the star schema, refreshed after each load (needs the duckdb package)
+    OLAP_MIRROR_ENABLED = os.getenv('ETL_OLAP_MIRROR', '0') == '1'
+    OLAP_MIRROR_PATH = os.getenv('ETL_OLAP_MIRROR_PATH', 'olap/sales_dw.duckdb')
+    
+    # Dashboard snapshot published after each load
+    SNAPSHOT_DIR = "snapshots"
+    SNAPSHOT_TEMPLATE = "dashboard.html"
+    SNAPSHOT_KEEP = 7
     
     # Validation rules
     MIN_UNIT_PRICE = 0.01
@@ -19,4 +67,9 @@ class ETLConfig:
     
     # Date range
     START_DATE = "2020-01-01"
-    END_DATE = "2025-12-31"
\ No newline at end of file
+    END_DATE = "2025-12-31"
+    
+    # Date dimension: holiday calendar (a pandas AbstractHolidayCalendar, by class name in
+    # scripts/date_dimension.py or dotted path) and the first month of the fiscal year
+    HOLIDAY_CALENDAR = os.getenv('ETL_HOLIDAY_CALENDAR', 'VietnamHolidayCalendar')
+    FISCAL_YEAR_START_MONTH = int(os.getenv('ETL_FISCAL_YEAR_START_MONTH', 1))
\ No newline at end of file
@@ -2,11 +2,39 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-import mysql.connector
 from mysql.connector import Error
+from dashboard_data import (
+    DASHBOARD_QUERIES, DashboardFilters, create_dashboard_pool,
+    export_sales_csv, load_filter_options, load_dashboard_data, load_snapshot
+)
+import os
+import time
+import uuid
 import warnings
 warnings.filterwarnings('ignore')
 
+# Detail tables show at most this many rows; use the CSV export for everything
+MAX_TABLE_ROWS = 1000
+
+# Sales detail exports are written here and served by Streamlit's static file
+# server (.streamlit/config.toml), never loaded into the script's memory
+EXPORT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'exports')
+EXPORT_RETENTION_SECONDS = 3600
+
+
+def remove_old_exports():
+    """Delete exports older than EXPORT_RETENTION_SECONDS"""
+    if not os.path.isdir(EXPORT_DIR):
+        return
+    cutoff = time.time() - EXPORT_RETENTION_SECONDS
+    for name in os.listdir(EXPORT_DIR):
+        path = os.path.join(EXPORT_DIR, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except FileNotFoundError:
+            pass  # Removed by another session in the meantime
+
 # Page config
 st.set_page_config(
     page_title="Sales Data Warehouse Dashboard",
@@ -18,148 +46,142 @@ st.set_page_config(
 st.title("📊 Sales Data Warehouse Dashboard")
 st.markdown("---")
 
-# Database connection
+# Database connection pool
 @st.cache_resource
-def get_connection():
+def create_connection_pool():
+    # MySQL, or the DuckDB mirror when DASHBOARD_BACKEND=duckdb
+    return create_dashboard_pool()
+
+def get_connection_pool():
+    # A failed connect raises out of the cached function, so it is not
+    # cached and the next rerun tries again
     try:
-        connection = mysql.connector.connect(
-            host="localhost",
-            port=3306,
-            user="etl_user",
-            password="etl_password",
-            database="sales_dw"
-        )
-        return connection
-    except Error as e:
+        return create_connection_pool()
+    except (Error, ImportError) as e:
         st.error(f"Database connection error: {e}")
         return None
 
-# Load data
+# Filter options
 @st.cache_data(ttl=300)
-def load_data():
-    conn = get_connection()
-    if conn is None:
+def get_filter_options():
+    pool = get_connection_pool()
+    if pool is None:
         return {}
     
-    data = {}
+    try:
+        with pool.connection() as conn:
+            return load_filter_options(conn)
+    except Exception as e:
+        st.error(f"Error loading filter options: {e}")
+        return {}
+
+# Load data
+@st.cache_data(ttl=300)
+def load_data(start_date=None, end_date=None, category=None):
+    pool = get_connection_pool()
+    if pool is None:
+        return {}, {'all': "no database connection"}
+    
+    data, errors = {}, {}
     
     try:
-        # Sales summary
-        query = """
-        SELECT 
-            SUM(total_amount) as total_sales,
-            SUM(profit_amount) as total_profit,
-            SUM(quantity) as total_quantity,
-            COUNT(DISTINCT order_id) as order_count,
-            AVG(profit_margin) as avg_margin
-        FROM fact_sales
-        """
-        data['summary'] = pd.read_sql(query, conn)
-        
-        # Daily sales trend
-        query = """
-        SELECT 
-            d.full_date,
-            d.day_name,
-            d.month_name,
-            d.year,
-            SUM(fs.total_amount) as daily_sales,
-            SUM(fs.profit_amount) as daily_profit,
-            SUM(fs.quantity) as daily_quantity,
-            COUNT(DISTINCT fs.order_id) as daily_orders
-        FROM fact_sales fs
-        JOIN dim_date d ON fs.date_key = d.date_key
-        GROUP BY d.full_date, d.day_name, d.month_name, d.year
-        ORDER BY d.full_date
-        """
-        data['daily'] = pd.read_sql(query, conn)
-        
-        # Top products
-        query = """
-        SELECT 
-            p.product_name,
-            p.category,
-            SUM(fs.quantity) as total_quantity,
-            SUM(fs.total_amount) as revenue,
-            SUM(fs.profit_amount) as profit,
-            AVG(fs.profit_margin) as avg_margin
-        FROM fact_sales fs
-        JOIN dim_product p ON fs.product_key = p.product_key
-        GROUP BY p.product_name, p.category
-        ORDER BY revenue DESC
-        LIMIT 20
-        """
-        data['products'] = pd.read_sql(query, conn)
-        
-        # Customer analysis
-        query = """
-        SELECT 
-            c.city,
-            c.country,
-            c.customer_segment,
-            COUNT(DISTINCT c.customer_key) as customer_count,
-            SUM(fs.total_amount) as total_sales,
-            COUNT(DISTINCT fs.order_id) as order_count,
-            AVG(fs.total_amount) as avg_order_value
-        FROM fact_sales fs
-        JOIN dim_customer c ON fs.customer_key = c.customer_key
-        GROUP BY c.city, c.country, c.customer_segment
-        """
-        data['customers'] = pd.read_sql(query, conn)
-        
-        # Monthly trends
-        query = """
-        SELECT 
-            d.year,
-            d.month,
-            d.month_name,
-            SUM(fs.total_amount) as monthly_sales,
-            SUM(fs.profit_amount) as monthly_profit,
-            COUNT(DISTINCT fs.order_id) as order_count,
-            COUNT(DISTINCT fs.customer_key) as customer_count
-        FROM fact_sales fs
-        JOIN dim_date d ON fs.date_key = d.date_key
-        GROUP BY d.year, d.month, d.month_name
-        ORDER BY d.year, d.month
-        """
-        data['monthly'] = pd.read_sql(query, conn)
+        # Date range and category are pushed into the SQL, not applied in pandas;
+        # the independent views run concurrently on pooled connections
+        filters = DashboardFilters(start_date, end_date, category)
+        data, errors = load_dashboard_data(pool, filters)
         
     except Exception as e:
         st.error(f"Error loading data: {e}")
-    finally:
-        conn.close()
     
-    return data
+    return data, errors
+
+# Pre-rendered snapshot from the last ETL run
+@st.cache_data(ttl=60)
+def get_snapshot():
+    try:
+        return load_snapshot()
+    except Exception as e:
+        st.warning(f"Could not read dashboard snapshot: {e}")
+        return None
+
+# Filters
+st.sidebar.title("🔍 Filters")
+st.sidebar.markdown("---")
+
+snapshot = get_snapshot()
+filter_options = snapshot['filter_options'] if snapshot else get_filter_options()
+if not filter_options:
+    # Don't keep a failed lookup in the cache until the TTL expires
+    get_filter_options.clear()
+start_date, end_date = None, None
+selected_category = 'All'
 
-# Load all data
-data = load_data()
+if filter_options.get('min_date') is not None:
+    date_range = st.sidebar.date_input(
+        "Date Range",
+        [filter_options['min_date'], filter_options['max_date']],
+        min_value=filter_options['min_date'],
+        max_value=filter_options['max_date']
+    )
+    # date_input returns a single date while the user is still picking the range
+    if len(date_range) == 2:
+        start_date, end_date = date_range
+
+if filter_options.get('categories'):
+    categories = ['All'] + filter_options['categories']
+    selected_category = st.sidebar.selectbox("Product Category", categories)
+
+# Load all data; the unfiltered view is served from the snapshot without touching MySQL
+filters_active = selected_category != 'All' or (
+    start_date is not None and
+    (start_date, end_date) != (filter_options['min_date'], filter_options['max_date'])
+)
+
+if snapshot and not filters_active:
+    data, errors = snapshot['data'], {}
+    last_updated = f"Snapshot {snapshot['version']}"
+else:
+    data, errors = load_data(start_date, end_date, selected_category)
+    last_updated = "Real-time"
+
+if errors:
+    # Show what loaded, but don't keep a failed or partial result in the cache
+    load_data.clear()
+    for view, error in errors.items():
+        st.warning(f"Could not load {view} data: {error}")
 
 if not data:
     st.stop()
 
+for view in DASHBOARD_QUERIES:
+    data.setdefault(view, pd.DataFrame())
+
 # KPI Metrics
 st.subheader("📈 Key Performance Indicators")
-col1, col2, col3, col4, col5 = st.columns(5)
+summary = data['summary'].fillna(0)
 
-with col1:
-    total_sales = data['summary']['total_sales'].iloc[0]
-    st.metric("Total Sales", f"${total_sales:,.2f}")
+if not summary.empty:
+    col1, col2, col3, col4, col5 = st.columns(5)
 
-with col2:
-    total_profit = data['summary']['total_profit'].iloc[0]
-    st.metric("Total Profit", f"${total_profit:,.2f}")
+    with col1:
+        total_sales = summary['total_sales'].iloc[0]
+        st.metric("Total Sales", f"${total_sales:,.2f}")
 
-with col3:
-    total_qty = data['summary']['total_quantity'].iloc[0]
-    st.metric("Quantity Sold", f"{total_qty:,.0f}")
+    with col2:
+        total_profit = summary['total_profit'].iloc[0]
+        st.metric("Total Profit", f"${total_profit:,.2f}")
 
-with col4:
-    order_count = data['summary']['order_count'].iloc[0]
-    st.metric("Total Orders", f"{order_count:,.0f}")
+    with col3:
+        total_qty = summary['total_quantity'].iloc[0]
+        st.metric("Quantity Sold", f"{total_qty:,.0f}")
 
-with col5:
-    avg_margin = data['summary']['avg_margin'].iloc[0]
-    st.metric("Avg Profit Margin", f"{avg_margin:.1f}%")
+    with col4:
+        order_count = summary['order_count'].iloc[0]
+        st.metric("Total Orders", f"{order_count:,.0f}")
+
+    with col5:
+        avg_margin = summary['avg_margin'].iloc[0]
+        st.metric("Avg Profit Margin", f"{avg_margin:.1f}%")
 
 st.markdown("---")
 
@@ -210,34 +232,25 @@ st.subheader("📋 Detailed Data")
 
 tab1, tab2, tab3 = st.tabs(["📦 Products", "👥 Customers", "📈 Sales"])
 
+def show_table(df):
+    st.dataframe(df.head(MAX_TABLE_ROWS), use_container_width=True)
+    if len(df) > MAX_TABLE_ROWS:
+        st.caption(f"Showing {MAX_TABLE_ROWS:,} of {len(df):,} rows")
+
 with tab1:
-    st.dataframe(data['products'], use_container_width=True)
+    show_table(data['products'])
 
 with tab2:
-    st.dataframe(data['customers'], use_container_width=True)
+    show_table(data['customers'])
 
 with tab3:
-    st.dataframe(data['daily'], use_container_width=True)
-
-# Filters
-st.sidebar.title("🔍 Filters")
-st.sidebar.markdown("---")
-
-if not data['daily'].empty:
-    date_range = st.sidebar.date_input(
-        "Date Range",
-        [data['daily']['full_date'].min(), data['daily']['full_date'].max()]
-    )
-
-if not data['products'].empty:
-    categories = ['All'] + list(data['products']['category'].unique())
-    selected_category = st.sidebar.selectbox("Product Category", categories)
+    show_table(data['daily'])
 
 # Download options
 st.sidebar.markdown("---")
 st.sidebar.subheader("📥 Export Data")
 
-if st.sidebar.button("Export Summary Report"):
+if not summary.empty and st.sidebar.button("Export Summary Report"):
     summary_df = pd.DataFrame({
         'Metric': ['Total Sales', 'Total Profit', 'Quantity Sold', 'Total Orders', 'Avg Margin'],
         'Value': [total_sales, total_profit, total_qty, order_count, avg_margin]
@@ -250,14 +263,37 @@ if st.sidebar.button("Export Summary Report"):
         mime="text/csv"
     )
 
+if st.sidebar.button("Export Sales Detail"):
+    pool = get_connection_pool()
+    if pool is not None:
+        # Rows are streamed from the database to disk in chunks rather than built up in a DataFrame
+        remove_old_exports()
+        os.makedirs(EXPORT_DIR, exist_ok=True)
+        export_name = f"sales_detail_{uuid.uuid4().hex}.csv"
+        export_path = os.path.join(EXPORT_DIR, export_name)
+        try:
+            exported_rows = export_sales_csv(
+                pool, DashboardFilters(start_date, end_date, selected_category), export_path
+            )
+            st.sidebar.markdown(
+                f'<a href="app/static/exports/{export_name}" download="sales_detail.csv">'
+                f'Download CSV ({exported_rows:,} rows)</a>',
+                unsafe_allow_html=True
+            )
+            st.sidebar.caption("The link stays valid for an hour.")
+        except Exception as e:
+            if os.path.exists(export_path):
+                os.remove(export_path)
+            st.sidebar.error(f"Export failed: {e}")
+
 # About section
 st.sidebar.markdown("---")
 st.sidebar.info("""
 **Data Warehouse Dashboard**
 - Data Source: MySQL Sales DW
-- Last Updated: Real-time
+- Last Updated: {}
 - Total Records: {:,} sales
-""".format(len(data['daily'])))
+""".format(last_updated, len(data['daily'])))
 
 st.markdown("---")
 st.caption("Dashboard created with Streamlit | Data Warehouse Project")
@@ -0,0 +1,706 @@
+"""
+Data access layer for the Streamlit dashboard
+Builds parameterized queries with the sidebar filters pushed down into SQL
+"""
+import pandas as pd
+import numpy as np
+import csv
+import json
+import logging
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from datetime import datetime
+from mysql.connector import pooling
+from mysql.connector.constants import FieldType
+from config.database_config import DatabaseConfig
+from config.etl_config import ETLConfig
+
+
+def to_date_key(value):
+    """Convert a date/datetime/ISO string to the integer date_key (YYYYMMDD)"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.strptime(value[:10], '%Y-%m-%d').date()
+    return int(value.strftime('%Y%m%d'))
+
+
+def from_date_key(date_key):
+    """Convert an integer date_key (YYYYMMDD) back to a date"""
+    if date_key is None:
+        return None
+    return datetime.strptime(str(int(date_key)), '%Y%m%d').date()
+
+
+INTEGER_TYPES = {
+    FieldType.TINY, FieldType.SHORT, FieldType.INT24, FieldType.LONG,
+    FieldType.LONGLONG, FieldType.YEAR,
+}
+FLOAT_TYPES = {FieldType.DECIMAL, FieldType.NEWDECIMAL, FieldType.FLOAT, FieldType.DOUBLE}
+DATETIME_TYPES = {FieldType.DATETIME, FieldType.TIMESTAMP}
+
+
+def result_dtypes(description):
+    """Map a cursor description to pandas dtypes, using nullable dtypes for nullable columns"""
+    dtypes = {}
+    for column in description:
+        name, type_code, null_ok = column[0], column[1], column[6]
+        if type_code in INTEGER_TYPES:
+            dtypes[name] = 'Int64' if null_ok else 'int64'
+        elif type_code in FLOAT_TYPES:
+            # DECIMAL arrives as decimal.Decimal; float64 is exact enough for display and export
+            dtypes[name] = 'float64'
+        elif type_code in DATETIME_TYPES:
+            dtypes[name] = 'datetime64[ns]'
+        elif type_code in (FieldType.DATE, FieldType.NEWDATE):
+            # Keep datetime.date objects so st.date_input and plotly see calendar dates
+            dtypes[name] = 'object'
+        else:
+            dtypes[name] = 'string'
+    return dtypes
+
+
+def _column_array(values, dtype):
+    """Convert one column of fetched values into a typed array in a single pass"""
+    if dtype == 'float64':
+        return np.fromiter(
+            (np.nan if v is None else float(v) for v in values),
+            dtype=np.float64, count=len(values)
+        )
+    if dtype == 'int64':
+        return np.fromiter(values, dtype=np.int64, count=len(values))
+    if dtype == 'datetime64[ns]':
+        return pd.to_datetime(pd.Series(values, dtype=object))
+    if dtype == 'object':
+        return np.array(values, dtype=object)
+    return pd.array(values, dtype=dtype)
+
+
+def iter_query_frames(connection, query, params=None, chunk_size=None, dtypes=None):
+    """Stream a query result as typed DataFrame chunks
+
+    Uses an unbuffered cursor, so rows stay on the server until fetched and
+    memory is bounded by chunk_size rather than by the size of the result.
+    """
+    chunk_size = chunk_size or DatabaseConfig.CHUNK_SIZE
+    cursor = connection.cursor(buffered=False)
+    try:
+        cursor.execute(query, params or ())
+        columns = [column[0] for column in cursor.description]
+        column_dtypes = result_dtypes(cursor.description)
+        column_dtypes.update(dtypes or {})
+
+        yielded = False
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            # Transpose once, then convert column by column instead of row by row
+            column_values = list(zip(*rows))
+            yield pd.DataFrame({
+                name: _column_array(values, column_dtypes[name])
+                for name, values in zip(columns, column_values)
+            })
+            yielded = True
+
+        if not yielded:
+            # Empty result: still hand back the typed columns
+            yield pd.DataFrame({
+                name: pd.Series(dtype=column_dtypes[name]) for name in columns
+            })
+    finally:
+        # An abandoned unbuffered result must be drained before the connection is reused
+        if connection.unread_result:
+            connection.consume_results()
+        cursor.close()
+
+
+def fetch_dataframe(connection, query, params=None, chunk_size=None, dtypes=None, max_rows=None):
+    """Fetch a query result into one typed DataFrame, optionally capped at max_rows"""
+    frames = []
+    fetched = 0
+    chunks = iter_query_frames(connection, query, params, chunk_size, dtypes)
+    try:
+        for frame in chunks:
+            if max_rows is not None and fetched + len(frame) > max_rows:
+                frames.append(frame.iloc[:max_rows - fetched])
+                break
+            frames.append(frame)
+            fetched += len(frame)
+    finally:
+        chunks.close()
+
+    return pd.concat(frames, ignore_index=True)
+
+
+def stream_csv(connection, query, params, output, chunk_size=None):
+    """Write a query result to a text stream as CSV, one chunk at a time; returns the row count"""
+    total_rows = 0
+    header = True
+    for frame in iter_query_frames(connection, query, params, chunk_size):
+        frame.to_csv(output, index=False, header=header, quoting=csv.QUOTE_MINIMAL)
+        header = False
+        total_rows += len(frame)
+    return total_rows
+
+
+class DashboardConnectionPool:
+    """Bounded, health-checked pool of DW connections shared by all dashboard sessions"""
+
+    def __init__(self, pool_size=None, checkout_timeout=None, pool_name='dashboard_pool'):
+        config = DatabaseConfig()
+        self.pool_size = pool_size or config.DASHBOARD_POOL_SIZE
+        self.checkout_timeout = (
+            checkout_timeout if checkout_timeout is not None else config.DASHBOARD_POOL_TIMEOUT
+        )
+        if not 0 < self.pool_size <= pooling.CNX_POOL_MAXSIZE:
+            raise ValueError(
+                f"Dashboard pool size must be between 1 and {pooling.CNX_POOL_MAXSIZE}"
+            )
+
+        self._pool = pooling.MySQLConnectionPool(
+            pool_name=pool_name,
+            pool_size=self.pool_size,
+            pool_reset_session=True,
+            host=config.DW_HOST,
+            port=config.DW_PORT,
+            user=config.DW_USER,
+            password=config.DW_PASSWORD,
+            database=config.DW_DATABASE
+        )
+
+    def _checkout(self):
+        """Take a connection from the pool, waiting up to checkout_timeout when it is exhausted"""
+        deadline = time.monotonic() + self.checkout_timeout
+        while True:
+            try:
+                return self._pool.get_connection()
+            except pooling.PoolError:
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.05)
+
+    @contextmanager
+    def connection(self):
+        """Check out a connection for one query and return it to the pool afterwards"""
+        conn = self._checkout()
+        try:
+            # Idle connections may have been dropped by wait_timeout; reconnect if stale
+            conn.ping(reconnect=True, attempts=2, delay=1)
+            yield conn
+        finally:
+            # close() on a pooled connection hands it back instead of disconnecting
+            conn.close()
+
+    def query_dataframe(self, query, params, timeout=None):
+        """Run one query on its own connection, bounded server-side by MAX_EXECUTION_TIME"""
+        with self.connection() as conn:
+            if timeout:
+                cursor = conn.cursor()
+                try:
+                    cursor.execute("SET SESSION MAX_EXECUTION_TIME = %s", (int(timeout * 1000),))
+                finally:
+                    cursor.close()
+            return fetch_dataframe(conn, query, params)
+
+    def stream_csv(self, query, params, output, chunk_size=None):
+        with self.connection() as conn:
+            return stream_csv(conn, query, params, output, chunk_size)
+
+
+class OLAPMirrorPool:
+    """Serves dashboard queries from the DuckDB mirror, falling back to MySQL
+
+    The dashboard queries are plain SQL that DuckDB runs unchanged apart
+    from the placeholder style. Each query opens its own read-only
+    connection, so a mirror refresh is never blocked for long; while the
+    mirror is missing or being written, queries go to the MySQL pool.
+    """
+
+    def __init__(self, path=None, fallback_pool=None):
+        import duckdb
+
+        self.duckdb = duckdb
+        self.path = path or ETLConfig.OLAP_MIRROR_PATH
+        self._fallback_pool = fallback_pool
+        self.pool_size = DatabaseConfig.DASHBOARD_POOL_SIZE
+
+    @property
+    def fallback_pool(self):
+        if self._fallback_pool is None:
+            self._fallback_pool = DashboardConnectionPool()
+        return self._fallback_pool
+
+    @contextmanager
+    def connection(self):
+        """Read-only DuckDB connection; its cursors follow the DB-API like MySQL's"""
+        conn = self.duckdb.connect(self.path, read_only=True)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _frames(self, query, params, chunk_size=None):
+        chunk_size = chunk_size or DatabaseConfig.CHUNK_SIZE
+        with self.connection() as conn:
+            cursor = conn.execute(query.replace('%s', '?'), list(params or ()))
+            # DATE columns stay datetime.date objects, as with the MySQL pool
+            date_columns = [column[0] for column in cursor.description if str(column[1]) == 'DATE']
+            # fetch_df_chunk counts in vectors of 2048 rows; an empty first chunk still carries the columns
+            vectors = max(1, chunk_size // 2048)
+            frame = cursor.fetch_df_chunk(vectors)
+            while True:
+                for name in date_columns:
+                    frame[name] = frame[name].dt.date
+                yield frame
+                frame = cursor.fetch_df_chunk(vectors)
+                if frame.empty:
+                    break
+
+    def query_dataframe(self, query, params, timeout=None):
+        try:
+            return pd.concat(self._frames(query, params), ignore_index=True)
+        except (self.duckdb.IOException, self.duckdb.CatalogException) as e:
+            logging.warning(f"OLAP mirror unavailable ({e}); querying MySQL")
+            return self.fallback_pool.query_dataframe(query, params, timeout)
+
+    def stream_csv(self, query, params, output, chunk_size=None):
+        total_rows = 0
+        header = True
+        for frame in self._frames(query, params, chunk_size):
+            frame.to_csv(output, index=False, header=header, quoting=csv.QUOTE_MINIMAL)
+            header = False
+            total_rows += len(frame)
+        return total_rows
+
+
+def create_dashboard_pool():
+    """Pool for the configured DASHBOARD_BACKEND"""
+    if DatabaseConfig.DASHBOARD_BACKEND == 'duckdb':
+        if os.path.exists(ETLConfig.OLAP_MIRROR_PATH):
+            return OLAPMirrorPool()
+        logging.warning(f"OLAP mirror {ETLConfig.OLAP_MIRROR_PATH} not found; using MySQL")
+    return DashboardConnectionPool()
+
+
+class DashboardFilters:
+    """Sidebar filter state that is pushed into every dashboard query"""
+
+    def __init__(self, start_date=None, end_date=None, category=None):
+        self.start_date = start_date
+        self.end_date = end_date
+        self.category = None if category in (None, '', 'All') else category
+
+    @property
+    def has_category(self):
+        return self.category is not None
+
+    def date_predicate(self, column):
+        """Return (clauses, params) restricting `column` to the selected date_key range"""
+        clauses = []
+        params = []
+        start_key = to_date_key(self.start_date)
+        end_key = to_date_key(self.end_date)
+        if start_key is not None and end_key is not None:
+            clauses.append(f"{column} BETWEEN %s AND %s")
+            params.extend([start_key, end_key])
+        elif start_key is not None:
+            clauses.append(f"{column} >= %s")
+            params.append(start_key)
+        elif end_key is not None:
+            clauses.append(f"{column} <= %s")
+            params.append(end_key)
+        return clauses, params
+
+    def category_predicate(self, column):
+        """Return (clauses, params) restricting `column` to the selected category"""
+        if not self.has_category:
+            return [], []
+        return [f"{column} = %s"], [self.category]
+
+
+def _where(*predicates):
+    """Combine (clauses, params) pairs into a WHERE clause and a parameter list"""
+    clauses = []
+    params = []
+    for predicate_clauses, predicate_params in predicates:
+        clauses.extend(predicate_clauses)
+        params.extend(predicate_params)
+    if not clauses:
+        return "", []
+    return "WHERE " + "\n          AND ".join(clauses), params
+
+
+# agg_sales_daily stores three grains in one table, distinguished by which keys are NULL
+AGG_DAILY_GRAIN = (["a.customer_key IS NULL", "a.product_key IS NULL"], [])
+AGG_CUSTOMER_GRAIN = (["a.customer_key IS NOT NULL", "a.product_key IS NULL"], [])
+AGG_PRODUCT_GRAIN = (["a.customer_key IS NULL", "a.product_key IS NOT NULL"], [])
+
+
+def summary_query(filters):
+    """KPI totals; served from the daily aggregate unless a category is selected"""
+    if not filters.has_category:
+        where, params = _where(AGG_DAILY_GRAIN, filters.date_predicate('a.date_key'))
+        query = f"""
+        SELECT
+            SUM(a.total_amount) as total_sales,
+            SUM(a.total_profit) as total_profit,
+            SUM(a.total_quantity) as total_quantity,
+            SUM(a.order_count) as order_count,
+            SUM(a.sum_profit_margin) / NULLIF(SUM(a.line_count), 0) as avg_margin
+        FROM agg_sales_daily a
+        {where}
+        """
+        return query, params
+
+    where, params = _where(
+        filters.date_predicate('fs.date_key'),
+        filters.category_predicate('p.category')
+    )
+    query = f"""
+        SELECT
+            SUM(fs.total_amount) as total_sales,
+            SUM(fs.profit_amount) as total_profit,
+            SUM(fs.quantity) as total_quantity,
+            COUNT(DISTINCT fs.order_key) as order_count,
+            AVG(fs.profit_margin) as avg_margin
+        FROM fact_sales fs
+        JOIN dim_product p ON fs.product_key = p.product_key
+        {where}
+        """
+    return query, params
+
+
+def daily_query(filters):
+    """Daily sales trend"""
+    if not filters.has_category:
+        where, params = _where(AGG_DAILY_GRAIN, filters.date_predicate('a.date_key'))
+        query = f"""
+        SELECT
+            d.full_date,
+            d.day_name,
+            d.month_name,
+            d.year,
+            SUM(a.total_amount) as daily_sales,
+            SUM(a.total_profit) as daily_profit,
+            SUM(a.total_quantity) as daily_quantity,
+            SUM(a.order_count) as daily_orders
+        FROM agg_sales_daily a
+        JOIN dim_date d ON a.date_key = d.date_key
+        {where}
+        GROUP BY d.full_date, d.day_name, d.month_name, d.year
+        ORDER BY d.full_date
+        """
+        return query, params
+
+    where, params = _where(
+        filters.date_predicate('fs.date_key'),
+        filters.category_predicate('p.category')
+    )
+    query = f"""
+        SELECT
+            d.full_date,
+            d.day_name,
+            d.month_name,
+            d.year,
+            SUM(fs.total_amount) as daily_sales,
+            SUM(fs.profit_amount) as daily_profit,
+            SUM(fs.quantity) as daily_quantity,
+            COUNT(DISTINCT fs.order_key) as daily_orders
+        FROM fact_sales fs
+        JOIN dim_product p ON fs.product_key = p.product_key
+        JOIN dim_date d ON fs.date_key = d.date_key
+        {where}
+        GROUP BY d.full_date, d.day_name, d.month_name, d.year
+        ORDER BY d.full_date
+        """
+    return query, params
+
+
+def products_query(filters, limit=20):
+    """Top products; the product grain of the aggregate covers every filter combination"""
+    where, params = _where(
+        AGG_PRODUCT_GRAIN,
+        filters.date_predicate('a.date_key'),
+        filters.category_predicate('p.category')
+    )
+    query = f"""
+        SELECT
+            p.product_name,
+            p.category,
+            SUM(a.total_quantity) as total_quantity,
+            SUM(a.total_amount) as revenue,
+            SUM(a.total_profit) as profit,
+            SUM(a.sum_profit_margin) / NULLIF(SUM(a.line_count), 0) as avg_margin
+        FROM agg_sales_daily a
+        JOIN dim_product p ON a.product_key = p.product_key
+        {where}
+        GROUP BY p.product_name, p.category
+        ORDER BY revenue DESC
+        LIMIT {int(limit)}
+        """
+    return query, params
+
+
+def customers_query(filters):
+    """Customer analysis by city, country and segment"""
+    if not filters.has_category:
+        where, params = _where(AGG_CUSTOMER_GRAIN, filters.date_predicate('a.date_key'))
+        query = f"""
+        SELECT
+            c.city,
+            c.country,
+            c.customer_segment,
+            COUNT(DISTINCT c.customer_key) as customer_count,
+            SUM(a.total_amount) as total_sales,
+            SUM(a.order_count) as order_count,
+            SUM(a.total_amount) / NULLIF(SUM(a.line_count), 0) as avg_order_value
+        FROM agg_sales_daily a
+        JOIN dim_customer c ON a.customer_key = c.customer_key
+        {where}
+        GROUP BY c.city, c.country, c.customer_segment
+        """
+        return query, params
+
+    where, params = _where(
+        filters.date_predicate('fs.date_key'),
+        filters.category_predicate('p.category')
+    )
+    query = f"""
+        SELECT
+            c.city,
+            c.country,
+            c.customer_segment,
+            COUNT(DISTINCT c.customer_key) as customer_count,
+            SUM(fs.total_amount) as total_sales,
+            COUNT(DISTINCT fs.order_key) as order_count,
+            AVG(fs.total_amount) as avg_order_value
+        FROM fact_sales fs
+        JOIN dim_product p ON fs.product_key = p.product_key
+        JOIN dim_customer c ON fs.customer_key = c.customer_key
+        {where}
+        GROUP BY c.city, c.country, c.customer_segment
+        """
+    return query, params
+
+
+def monthly_query(filters):
+    """Monthly trends; the customer grain keeps COUNT(DISTINCT customer_key) exact"""
+    if not filters.has_category:
+        where, params = _where(AGG_CUSTOMER_GRAIN, filters.date_predicate('a.date_key'))
+        query = f"""
+        SELECT
+            d.year,
+            d.month,
+            d.month_name,
+            SUM(a.total_amount) as monthly_sales,
+            SUM(a.total_profit) as monthly_profit,
+            SUM(a.order_count) as order_count,
+            COUNT(DISTINCT a.customer_key) as customer_count
+        FROM agg_sales_daily a
+        JOIN dim_date d ON a.date_key = d.date_key
+        {where}
+        GROUP BY d.year, d.month, d.month_name
+        ORDER BY d.year, d.month
+        """
+        return query, params
+
+    where, params = _where(
+        filters.date_predicate('fs.date_key'),
+        filters.category_predicate('p.category')
+    )
+    query = f"""
+        SELECT
+            d.year,
+            d.month,
+            d.month_name,
+            SUM(fs.total_amount) as monthly_sales,
+            SUM(fs.profit_amount) as monthly_profit,
+            COUNT(DISTINCT fs.order_key) as order_count,
+            COUNT(DISTINCT fs.customer_key) as customer_count
+        FROM fact_sales fs
+        JOIN dim_product p ON fs.product_key = p.product_key
+        JOIN dim_date d ON fs.date_key = d.date_key
+        {where}
+        GROUP BY d.year, d.month, d.month_name
+        ORDER BY d.year, d.month
+        """
+    return query, params
+
+
+def sales_detail_query(filters):
+    """Line-level sales with their dimensions, for the CSV export"""
+    where, params = _where(
+        filters.date_predicate('fs.date_key'),
+        filters.category_predicate('p.category')
+    )
+    query = f"""
+        SELECT
+            d.full_date,
+            o.order_id,
+            c.customer_id,
+            c.customer_name,
+            c.city,
+            c.country,
+            c.customer_segment,
+            p.product_id,
+            p.product_name,
+            p.category,
+            fs.quantity,
+            fs.unit_price,
+            fs.total_amount,
+            fs.cost_amount,
+            fs.profit_amount,
+            fs.profit_margin
+        FROM fact_sales fs
+        JOIN dim_date d ON fs.date_key = d.date_key
+        JOIN dim_customer c ON fs.customer_key = c.customer_key
+        JOIN dim_product p ON fs.product_key = p.product_key
+        JOIN dim_order o ON fs.order_key = o.order_key
+        {where}
+        """
+    return query, params
+
+
+DASHBOARD_QUERIES = {
+    'summary': summary_query,
+    'daily': daily_query,
+    'products': products_query,
+    'customers': customers_query,
+    'monthly': monthly_query,
+}
+
+
+def build_queries(filters):
+    """Return {view_name: (query, params)} for every dashboard view"""
+    return {name: builder(filters) for name, builder in DASHBOARD_QUERIES.items()}
+
+
+def load_filter_options(connection):
+    """Fetch the available date range and product categories for the sidebar"""
+    cursor = connection.cursor()
+    try:
+        # MIN/MAX on the indexed date_key is resolved from the index alone
+        cursor.execute("SELECT MIN(date_key), MAX(date_key) FROM fact_sales")
+        min_key, max_key = cursor.fetchone()
+
+        cursor.execute("""
+            SELECT DISTINCT category
+            FROM dim_product
+            WHERE is_current = TRUE AND category IS NOT NULL
+            ORDER BY category
+        """)
+        categories = [row[0] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+    return {
+        'min_date': from_date_key(min_key),
+        'max_date': from_date_key(max_key),
+        'categories': categories,
+    }
+
+
+def run_query(pool, query, params, timeout=None):
+    """Run one query on the pool's backend, bounded by `timeout` seconds where the backend supports it"""
+    return pool.query_dataframe(query, params, timeout)
+
+
+def load_dashboard_data(pool, filters, timeout=None, max_workers=None):
+    """Run the independent dashboard queries concurrently
+
+    Returns (data, errors): views that finished in time are in `data`, the
+    others map to the error or timeout that stopped them in `errors`.
+    """
+    timeout = timeout if timeout is not None else DatabaseConfig.DASHBOARD_QUERY_TIMEOUT
+    queries = build_queries(filters)
+    max_workers = max_workers or min(len(queries), pool.pool_size)
+
+    # Queries beyond the worker count wait for a free worker, so allow one timeout per wave
+    deadline = timeout * math.ceil(len(queries) / max_workers) + 1
+
+    data = {}
+    errors = {}
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='dashboard_query')
+    try:
+        futures = {
+            executor.submit(run_query, pool, query, params, timeout): name
+            for name, (query, params) in queries.items()
+        }
+        done, not_done = wait(futures, timeout=deadline)
+
+        for future in done:
+            name = futures[future]
+            try:
+                data[name] = future.result()
+            except Exception as e:
+                logging.error(f"Dashboard query '{name}' failed: {e}")
+                errors[name] = str(e)
+
+        for future in not_done:
+            name = futures[future]
+            logging.error(f"Dashboard query '{name}' timed out after {timeout}s")
+            errors[name] = f"Timed out after {timeout}s"
+    finally:
+        # Don't block the page on stragglers; MAX_EXECUTION_TIME stops them server-side
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return data, errors
+
+
+def export_sales_csv(pool, filters, path, chunk_size=None):
+    """Stream the filtered sales detail to a CSV file in constant memory; returns the row count"""
+    query, params = sales_detail_query(filters)
+    with open(path, 'w', newline='', encoding='utf-8') as output:
+        return pool.stream_csv(query, params, output, chunk_size)
+
+
+def load_snapshot(path=None):
+    """Load the latest pre-rendered snapshot written by the ETL run, or None if there is none
+
+    Returns {'version', 'generated_at', 'filter_options', 'data'} where `data`
+    has the same views as load_dashboard_data, so no database query is needed.
+    """
+    path = path or os.path.join(ETLConfig.SNAPSHOT_DIR, 'latest.json')
+    if not os.path.exists(path):
+        return None
+
+    with open(path, 'r', encoding='utf-8') as snapshot_file:
+        snapshot = json.load(snapshot_file)
+
+    data = {}
+    for name, records in snapshot['datasets'].items():
+        df = pd.DataFrame.from_records(records)
+        if 'full_date' in df.columns:
+            df['full_date'] = pd.to_datetime(df['full_date']).dt.date
+        data[name] = df
+
+    filter_options = snapshot['filter_options']
+    for key in ('min_date', 'max_date'):
+        if filter_options.get(key):
+            filter_options[key] = datetime.strptime(filter_options[key], '%Y-%m-%d').date()
+
+    return {
+        'version': snapshot['version'],
+        'generated_at': snapshot['generated_at'],
+        'filter_options': filter_options,
+        'data': data,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export filtered sales detail to CSV")
+    parser.add_argument('output', help="CSV file to write")
+    parser.add_argument('--start-date', help="First order date (YYYY-MM-DD)")
+    parser.add_argument('--end-date', help="Last order date (YYYY-MM-DD)")
+    parser.add_argument('--category', help="Product category")
+    args = parser.parse_args()
+
+    export_filters = DashboardFilters(args.start_date, args.end_date, args.category)
+    exported = export_sales_csv(DashboardConnectionPool(pool_size=1), export_filters, args.output)
+    print(f"Exported {exported:,} rows to {args.output}")
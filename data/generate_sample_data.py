@@ -1,136 +1,331 @@
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
-import random
+from datetime import datetime
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import gzip
 import os
 
-def generate_customers(num_customers=1000):
+FORMATS = ('csv', 'csv.gz', 'parquet')
+
+CITIES = ['Hanoi', 'Ho Chi Minh', 'Da Nang', 'Hai Phong', 'Can Tho', 'Nha Trang', 'Hue', 'Vung Tau']
+COUNTRIES = ['Vietnam', 'USA', 'UK', 'Japan', 'Korea', 'Singapore', 'Australia']
+SUBCATEGORIES = {
+    'Electronics': ['Phone', 'Laptop', 'Tablet', 'Accessories'],
+    'Clothing': ['Men', 'Women', 'Kids', 'Shoes'],
+    'Food': ['Snacks', 'Beverages', 'Frozen', 'Fresh'],
+    'Books': ['Fiction', 'Non-fiction', 'Educational', 'Children'],
+    'Home': ['Furniture', 'Kitchen', 'Decor', 'Gardening'],
+    'Sports': ['Fitness', 'Outdoor', 'Team Sports', 'Equipment'],
+    'Beauty': ['Skincare', 'Makeup', 'Haircare', 'Fragrance']
+}
+
+# Sales are generated and written in chunks of this many rows
+SALES_CHUNK_SIZE = 200000
+
+# Invalid rows break exactly one of the rules checked by validate_and_clean_sales
+INVALID_KINDS = ('quantity_low', 'quantity_high', 'price_low', 'price_high', 'total_mismatch', 'date_out_of_range')
+
+# Reference data shared with sales worker processes, set once per process
+_sales_reference = {}
+
+
+def make_seed_sequence(seed=None):
+    """Root of every random stream; the same seed always produces the same files"""
+    return np.random.SeedSequence(seed)
+
+
+def prefixed_ids(prefix, start, count, width):
+    """Vectorized 'PREFIX000123' identifiers for start..start+count-1"""
+    numbers = np.arange(start, start + count).astype(str)
+    return np.char.add(prefix, np.char.zfill(numbers, width))
+
+
+def output_path(output_dir, name, fmt):
+    return os.path.join(output_dir, f"{name}.{fmt}")
+
+
+def require_pyarrow():
+    """Parquet support is optional; fail with an install hint instead of a pandas traceback"""
+    try:
+        import pyarrow
+    except ImportError:
+        raise SystemExit("Parquet output requires pyarrow: pip install pyarrow")
+    return pyarrow
+
+
+def write_table(df, output_dir, name, fmt):
+    """Write a small table in one go in the requested format"""
+    path = output_path(output_dir, name, fmt)
+    if fmt == 'parquet':
+        require_pyarrow()
+        df.to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+    return path
+
+
+def read_table(output_dir, name, fmt):
+    path = output_path(output_dir, name, fmt)
+    if fmt == 'parquet':
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+
+def popularity_weights(count, skew):
+    """Zipf-like draw weights; skew 0 is uniform, larger values concentrate on a few hot keys"""
+    if skew <= 0:
+        return None
+    weights = 1.0 / np.arange(1, count + 1) ** skew
+    return weights / weights.sum()
+
+
+def generate_customers(num_customers=1000, output_dir='data', reference_date=None, seed=None, fmt='csv'):
     """Generate sample customer data"""
-    cities = ['Hanoi', 'Ho Chi Minh', 'Da Nang', 'Hai Phong', 'Can Tho', 'Nha Trang', 'Hue', 'Vung Tau']
-    countries = ['Vietnam', 'USA', 'UK', 'Japan', 'Korea', 'Singapore', 'Australia']
-    
-    customers = []
-    for i in range(1, num_customers + 1):
-        customer = {
-            'customer_id': f'CUST{str(i).zfill(6)}',
-            'customer_name': f'Customer {i}',
-            'email': f'customer{i}@example.com',
-            'phone': f'0987{str(random.randint(100000, 999999))}',
-            'address': f'{random.randint(1, 999)} Street',
-            'city': random.choice(cities),
-            'country': random.choice(countries),
-            'registration_date': (datetime.now() - timedelta(days=random.randint(1, 1000))).strftime('%Y-%m-%d')
-        }
-        customers.append(customer)
-    
-    df = pd.DataFrame(customers)
-    df.to_csv('data/customers.csv', index=False)
-    print(f"Generated {len(customers)} customers")
-
-def generate_products(num_products=100):
+    rng = np.random.default_rng(make_seed_sequence(seed).spawn(3)[0])
+    reference_date = np.datetime64((reference_date or datetime.now()).date(), 'D')
+    numbers = np.arange(1, num_customers + 1).astype(str)
+
+    df = pd.DataFrame({
+        'customer_id': prefixed_ids('CUST', 1, num_customers, 6),
+        'customer_name': np.char.add('Customer ', numbers),
+        'email': np.char.add(np.char.add('customer', numbers), '@example.com'),
+        'phone': np.char.add('0987', rng.integers(100000, 1000000, num_customers).astype(str)),
+        'address': np.char.add(rng.integers(1, 1000, num_customers).astype(str), ' Street'),
+        'city': rng.choice(CITIES, num_customers),
+        'country': rng.choice(COUNTRIES, num_customers),
+        'registration_date': (reference_date - rng.integers(1, 1001, num_customers)).astype(str)
+    })
+
+    write_table(df, output_dir, 'customers', fmt)
+    print(f"Generated {len(df)} customers")
+    return df
+
+
+def generate_products(num_products=100, output_dir='data', seed=None, fmt='csv'):
     """Generate sample product data"""
-    categories = ['Electronics', 'Clothing', 'Food', 'Books', 'Home', 'Sports', 'Beauty']
-    
-    products = []
-    for i in range(1, num_products + 1):
-        category = random.choice(categories)
-        subcategories = {
-            'Electronics': ['Phone', 'Laptop', 'Tablet', 'Accessories'],
-            'Clothing': ['Men', 'Women', 'Kids', 'Shoes'],
-            'Food': ['Snacks', 'Beverages', 'Frozen', 'Fresh'],
-            'Books': ['Fiction', 'Non-fiction', 'Educational', 'Children'],
-            'Home': ['Furniture', 'Kitchen', 'Decor', 'Gardening'],
-            'Sports': ['Fitness', 'Outdoor', 'Team Sports', 'Equipment'],
-            'Beauty': ['Skincare', 'Makeup', 'Haircare', 'Fragrance']
-        }
-        
-        cost_price = round(random.uniform(10, 500), 2)
-        msrp = round(cost_price * random.uniform(1.2, 2.5), 2)
-        
-        product = {
-            'product_id': f'PROD{str(i).zfill(6)}',
-            'product_name': f'Product {i} {category}',
-            'category': category,
-            'subcategory': random.choice(subcategories[category]),
-            'supplier': f'Supplier {random.randint(1, 20)}',
-            'cost_price': cost_price,
-            'msrp': msrp
-        }
-        products.append(product)
-    
-    df = pd.DataFrame(products)
-    df.to_csv('data/products.csv', index=False)
-    print(f"Generated {len(products)} products")
-
-def generate_sales(num_records=1000000):
-    """Generate sample sales data"""
+    rng = np.random.default_rng(make_seed_sequence(seed).spawn(3)[1])
+    categories = np.array(list(SUBCATEGORIES))
+    category = rng.choice(categories, num_products)
+
+    # Each category has four subcategories; pick one index per product
+    subcategory_index = rng.integers(0, 4, num_products)
+    subcategory = np.array([SUBCATEGORIES[c][i] for c, i in zip(category, subcategory_index)])
+
+    cost_price = np.round(rng.uniform(10, 500, num_products), 2)
+    msrp = np.round(cost_price * rng.uniform(1.2, 2.5, num_products), 2)
+
+    df = pd.DataFrame({
+        'product_id': prefixed_ids('PROD', 1, num_products, 6),
+        'product_name': np.char.add(
+            np.char.add('Product ', np.arange(1, num_products + 1).astype(str)),
+            np.char.add(' ', category)
+        ),
+        'category': category,
+        'subcategory': subcategory,
+        'supplier': np.char.add('Supplier ', rng.integers(1, 21, num_products).astype(str)),
+        'cost_price': cost_price,
+        'msrp': msrp
+    })
+
+    write_table(df, output_dir, 'products', fmt)
+    print(f"Generated {len(df)} products")
+    return df
+
+
+def _init_sales_worker(reference):
+    _sales_reference.update(reference)
+
+
+def generate_sales_chunk(task):
+    """Build one chunk of sales rows from its own seed; rows depend only on the task"""
+    start_row, num_rows, seed_sequence, options = task
+    reference = _sales_reference
+    rng = np.random.default_rng(seed_sequence)
+
+    customer_index = rng.choice(
+        len(reference['customer_ids']), num_rows, p=reference['customer_weights']
+    )
+    product_index = rng.choice(
+        len(reference['product_ids']), num_rows, p=reference['product_weights']
+    )
+
+    quantity = rng.integers(1, 11, num_rows)
+    unit_price = np.round(reference['msrp'][product_index] * rng.uniform(0.8, 1.2, num_rows), 2)
+    total_amount = np.round(quantity * unit_price, 2)
+    order_date = reference['start_date'] + rng.integers(0, reference['days'] + 1, num_rows)
+    order_id = prefixed_ids('ORD', start_row + 1, num_rows, 8)
+
+    # Duplicates repeat an earlier row of the chunk, the case the staging dedupe removes
+    # Row 0 has nothing earlier to repeat, so at most num_rows - 1 rows are duplicates
+    num_duplicates = min(int(num_rows * options['duplicate_rate']), num_rows - 1)
+    if num_duplicates and num_rows > 1:
+        targets = rng.choice(np.arange(1, num_rows), num_duplicates, replace=False)
+        sources = (rng.random(num_duplicates) * targets).astype(np.int64)
+        for column in (customer_index, product_index, quantity, unit_price, total_amount, order_date, order_id):
+            column[targets] = column[sources]
+
+    # Invalid rows each break one validation rule, spread evenly across the rules
+    num_invalid = min(int(num_rows * options['invalid_rate']), num_rows)
+    if num_invalid:
+        rows = rng.choice(num_rows, num_invalid, replace=False)
+        kinds = rng.integers(0, len(INVALID_KINDS), num_invalid)
+        for kind_index, kind in enumerate(INVALID_KINDS):
+            selected = rows[kinds == kind_index]
+            if kind == 'quantity_low':
+                quantity[selected] = 0
+            elif kind == 'quantity_high':
+                quantity[selected] = 1001
+            elif kind == 'price_low':
+                unit_price[selected] = 0
+            elif kind == 'price_high':
+                unit_price[selected] = 10001
+            elif kind == 'total_mismatch':
+                total_amount[selected] += 1
+                continue
+            elif kind == 'date_out_of_range':
+                order_date[selected] = np.datetime64('2019-12-31')
+                continue
+            total_amount[selected] = np.round(quantity[selected] * unit_price[selected], 2)
+
+    df = pd.DataFrame({
+        'order_id': order_id,
+        'order_date': order_date.astype(str),
+        'customer_id': reference['customer_ids'][customer_index],
+        'product_id': reference['product_ids'][product_index],
+        'quantity': quantity,
+        'unit_price': unit_price,
+        'total_amount': total_amount
+    })
+
+    if options['fmt'] == 'parquet':
+        return df
+    # Rendered in the worker so the parent only appends text
+    return df.to_csv(index=False, header=start_row == 0)
+
+
+def generate_sales(num_records=1000000, output_dir='data', reference_date=None, seed=None, fmt='csv',
+                   chunk_size=SALES_CHUNK_SIZE, workers=1, skew=0.0, duplicate_rate=0.0, invalid_rate=0.0):
+    """Generate sample sales data, streamed to disk chunk by chunk
+
+    Chunks draw from independent seeds, so the output is identical for any
+    number of workers. At most two chunks per worker are held in memory.
+    """
     print("Generating sales data...")
-    
-    # Read existing customers and products
-    customers = pd.read_csv('data/customers.csv')
-    products = pd.read_csv('data/products.csv')
-    
-    sales = []
-    order_id_counter = 1
-    
-    # Generate dates for the last 2 years
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=730)
-    
-    for _ in range(num_records):
-        # Random date within range
-        days_diff = (end_date - start_date).days
-        random_days = random.randint(0, days_diff)
-        order_date = start_date + timedelta(days=random_days)
-        
-        # Random customer and product
-        customer = customers.sample(1).iloc[0]
-        product = products.sample(1).iloc[0]
-        
-        # Generate order details
-        quantity = random.randint(1, 10)
-        unit_price = product['msrp'] * random.uniform(0.8, 1.2)
-        total_amount = round(quantity * unit_price, 2)
-        
-        sale = {
-            'order_id': f'ORD{str(order_id_counter).zfill(8)}',
-            'order_date': order_date.strftime('%Y-%m-%d'),
-            'customer_id': customer['customer_id'],
-            'product_id': product['product_id'],
-            'quantity': quantity,
-            'unit_price': round(unit_price, 2),
-            'total_amount': total_amount
-        }
-        sales.append(sale)
-        
-        order_id_counter += 1
-        
-        if len(sales) % 100000 == 0:
-            print(f"Generated {len(sales)} sales records")
-    
-    # Create DataFrame and save
-    df = pd.DataFrame(sales)
-    
-    # Shuffle data
-    df = df.sample(frac=1).reset_index(drop=True)
-    
-    # Save in chunks to manage memory
-    chunk_size = 200000
-    for i in range(0, len(df), chunk_size):
-        chunk = df[i:i + chunk_size]
-        if i == 0:
-            chunk.to_csv('data/sales.csv', index=False)
+
+    customers = read_table(output_dir, 'customers', fmt)
+    products = read_table(output_dir, 'products', fmt)
+
+    # Generate dates for the two years before the reference date
+    end_date = np.datetime64((reference_date or datetime.now()).date(), 'D')
+    days = 730
+
+    reference = {
+        'customer_ids': customers['customer_id'].to_numpy(dtype=str),
+        'product_ids': products['product_id'].to_numpy(dtype=str),
+        'msrp': products['msrp'].to_numpy(dtype=float),
+        'customer_weights': popularity_weights(len(customers), skew),
+        'product_weights': popularity_weights(len(products), skew),
+        'start_date': end_date - days,
+        'days': days,
+    }
+    options = {'fmt': fmt, 'duplicate_rate': duplicate_rate, 'invalid_rate': invalid_rate}
+
+    starts = range(0, num_records, chunk_size)
+    chunk_seeds = make_seed_sequence(seed).spawn(3)[2].spawn(len(starts))
+    tasks = (
+        (start, min(chunk_size, num_records - start), chunk_seed, options)
+        for start, chunk_seed in zip(starts, chunk_seeds)
+    )
+
+    path = output_path(output_dir, 'sales', fmt)
+    parquet_writer = None
+    if fmt == 'parquet':
+        pa = require_pyarrow()
+        import pyarrow.parquet as pq
+    elif fmt == 'csv.gz':
+        sales_file = gzip.open(path, 'wt', encoding='utf-8', newline='')
+    else:
+        sales_file = open(path, 'w', encoding='utf-8', newline='')
+
+    def write_chunk(chunk):
+        nonlocal parquet_writer
+        if fmt == 'parquet':
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            parquet_writer = parquet_writer or pq.ParquetWriter(path, table.schema)
+            parquet_writer.write_table(table)
+        else:
+            sales_file.write(chunk)
+
+    generated = 0
+    window = 2 * max(1, workers)
+    try:
+        with ProcessPoolExecutor(
+            max_workers=max(1, workers), initializer=_init_sales_worker, initargs=(reference,)
+        ) as executor:
+            # Keep a bounded window of chunks in flight and write them back in order
+            pending = deque()
+            for task in tasks:
+                pending.append((task[1], executor.submit(generate_sales_chunk, task)))
+                if len(pending) < window:
+                    continue
+                num_rows, future = pending.popleft()
+                write_chunk(future.result())
+                generated += num_rows
+                print(f"Generated {generated} sales records")
+
+            while pending:
+                num_rows, future = pending.popleft()
+                write_chunk(future.result())
+                generated += num_rows
+                print(f"Generated {generated} sales records")
+    finally:
+        if fmt == 'parquet':
+            if parquet_writer is not None:
+                parquet_writer.close()
         else:
-            chunk.to_csv('data/sales.csv', mode='a', header=False, index=False)
-    
-    print(f"Generated {len(sales)} sales records")
+            sales_file.close()
+
+    print(f"Generated {generated} sales records")
+
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate sample sales data")
+    parser.add_argument('--seed', type=int, help="seed for reproducible output")
+    parser.add_argument('--customers', type=int, default=5000)
+    parser.add_argument('--products', type=int, default=200)
+    parser.add_argument('--sales', type=int, default=1000000)
+    parser.add_argument('--output-dir', default='data')
+    parser.add_argument('--format', choices=FORMATS, default='csv',
+                        help="the ETL reads csv; csv.gz and parquet are for other load tests")
+    parser.add_argument('--chunk-size', type=int, default=SALES_CHUNK_SIZE)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--skew', type=float, default=0.0,
+                        help="Zipf exponent for hot customers/products (0 = uniform)")
+    parser.add_argument('--duplicate-rate', type=float, default=0.0,
+                        help="fraction of sales rows that repeat an earlier order line")
+    parser.add_argument('--invalid-rate', type=float, default=0.0,
+                        help="fraction of sales rows that fail validation")
+    parser.add_argument('--reference-date', type=lambda value: datetime.strptime(value, '%Y-%m-%d'),
+                        help="last order date (YYYY-MM-DD), default today")
+    args = parser.parse_args()
+    for option, rate in (('--duplicate-rate', args.duplicate_rate), ('--invalid-rate', args.invalid_rate)):
+        if not 0 <= rate < 1:
+            parser.error(f"{option} must be at least 0 and below 1, got {rate}")
+
     # Create data directory if not exists
-    os.makedirs('data', exist_ok=True)
-    
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    # Without --seed every run differs, but the three files still share one seed
+    seed = args.seed if args.seed is not None else make_seed_sequence().entropy
+
     print("Generating sample data...")
-    generate_customers(5000)
-    generate_products(200)
-    generate_sales(1000000)  # 1 million records
-    print("Sample data generation completed!")
\ No newline at end of file
+    generate_customers(args.customers, args.output_dir, args.reference_date, seed, args.format)
+    generate_products(args.products, args.output_dir, seed, args.format)
+    generate_sales(
+        args.sales, args.output_dir, args.reference_date, seed, args.format,
+        chunk_size=args.chunk_size, workers=args.workers, skew=args.skew,
+        duplicate_rate=args.duplicate_rate, invalid_rate=args.invalid_rate
+    )
@@ -25,7 +25,7 @@ fi
 
 # Run the ETL pipeline
 echo "Running ETL pipeline..."
-python scripts/etl_pipeline.py
+python scripts/etl_pipeline.py "$@"
 
 if [ $? -eq 0 ]; then
     echo "ETL pipeline completed successfully!"
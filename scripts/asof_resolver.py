@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Point-in-time dimension key resolution
+Maps (business id, order date) to the dimension version valid on that
+date, so a backfill of old orders gets the customer or product as it was
+then instead of as it is today. Every version of the dimension is read
+once into valid_from arrays sorted per business id; each lookup is a
+bisect, with no query per fact row.
+"""
+import bisect
+
+
+class AsOfKeyResolver:
+    """In-memory interval index over the SCD2 versions of one dimension"""
+
+    def __init__(self, dimension, business_key, columns):
+        self.dimension = dimension
+        self.business_key = business_key
+        # Returned for each version, surrogate key first
+        self.columns = tuple(columns)
+        # business id -> sorted valid_from dates, and the versions in the same order
+        self.valid_from = {}
+        self.versions = {}
+
+    def query(self, business_ids=()):
+        """(SQL, params) selecting the versions of `business_ids`, or of every id"""
+        id_filter = ""
+        if business_ids:
+            id_filter = f"WHERE {self.business_key} IN ({', '.join(['%s'] * len(business_ids))})"
+        query = f"""
+            SELECT {self.business_key}, valid_from, {', '.join(self.columns)}
+            FROM {self.dimension}
+            {id_filter}
+            ORDER BY {self.business_key}, valid_from
+        """
+        return query, tuple(business_ids)
+
+    def load(self, cursor, business_ids=()):
+        """Add the versions of `business_ids` (default: the whole dimension); returns the count"""
+        cursor.execute(*self.query(business_ids))
+        rows = cursor.fetchall()
+        for business_id, valid_from, *version in rows:
+            self.add(business_id, valid_from, tuple(version))
+        return len(rows)
+
+    def add(self, business_id, valid_from, version):
+        dates = self.valid_from.setdefault(business_id, [])
+        versions = self.versions.setdefault(business_id, [])
+        position = bisect.bisect_left(dates, valid_from)
+        if position < len(dates) and dates[position] == valid_from:
+            versions[position] = version
+            return
+        dates.insert(position, valid_from)
+        versions.insert(position, version)
+
+    def resolve(self, business_id, as_of):
+        """The version valid on `as_of`, i.e. the newest one starting on or before it
+
+        A dimension row is dated from the day it was loaded, so orders older
+        than the first version get the first version. Returns None for a
+        business id the dimension does not have.
+        """
+        dates = self.valid_from.get(business_id)
+        if not dates:
+            return None
+        position = bisect.bisect_right(dates, as_of) - 1
+        return self.versions[business_id][max(position, 0)]
+
+    def __contains__(self, business_id):
+        return business_id in self.valid_from
+
+    def __len__(self):
+        return len(self.valid_from)
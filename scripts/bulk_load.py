@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Bulk-load mode for fact_sales
+For initial and historical loads the secondary indexes and the unique_order
+key are dropped before the load and rebuilt afterwards in a single ALTER
+TABLE, so InnoDB sorts each index once instead of maintaining it row by
+row. The dropped definitions are recorded in etl_deferred_index first, so
+an interrupted load can always be completed with `restore`. Before
+unique_order comes back, duplicate order lines are removed the way INSERT
+IGNORE would have (the first row loaded wins), and a verification query
+checks that every dimension key exists.
+
+    python scripts/bulk_load.py load --from 2022-01-01 --to 2022-12-31
+    python scripts/bulk_load.py restore
+    python scripts/bulk_load.py verify
+"""
+import sys
+import os
+
+# Thêm thư mục gốc vào đường dẫn Python
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import logging
+from contextlib import contextmanager
+from config.etl_config import ETLConfig
+from connection_manager import ConnectionManager
+from partition_manager import date_key
+
+# Dimension keys of fact_sales, checked for orphans since the table has no foreign keys
+FACT_DIMENSIONS = (
+    ('date_key', 'dim_date'),
+    ('customer_key', 'dim_customer'),
+    ('product_key', 'dim_product'),
+)
+UNIQUE_ORDER_COLUMNS = ('order_key', 'product_key', 'date_key')
+
+
+class BulkLoad:
+    """Defers index maintenance on fact_sales for the duration of a bulk load"""
+
+    def __init__(self, connection_manager=None, table='fact_sales'):
+        self.connections = connection_manager or ConnectionManager.shared()
+        self.table = table
+
+    def secondary_indexes(self, cursor):
+        """{index: (unique, column list)} for every index but the primary key"""
+        cursor.execute("""
+            SELECT INDEX_NAME, NON_UNIQUE, COLUMN_NAME, SUB_PART
+            FROM information_schema.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE()
+            AND TABLE_NAME = %s
+            AND INDEX_NAME != 'PRIMARY'
+            ORDER BY INDEX_NAME, SEQ_IN_INDEX
+        """, (self.table,))
+        indexes = {}
+        for name, non_unique, column, sub_part in cursor.fetchall():
+            unique, columns = indexes.setdefault(name, (not non_unique, []))
+            columns.append(f"{column}({sub_part})" if sub_part else column)
+        return {name: (unique, ', '.join(columns)) for name, (unique, columns) in indexes.items()}
+
+    def defer_indexes(self):
+        """Record and drop the secondary indexes; returns their names
+
+        Indexes already deferred by an interrupted load stay recorded and
+        are not looked up again.
+        """
+        with self.connections.connection('dw') as connection:
+            cursor = connection.cursor()
+            try:
+                indexes = self.secondary_indexes(cursor)
+                if not indexes:
+                    return []
+                cursor.executemany("""
+                    INSERT IGNORE INTO etl_deferred_index
+                    (table_name, index_name, is_unique, column_list)
+                    VALUES (%s, %s, %s, %s)
+                """, [(self.table, name, unique, columns) for name, (unique, columns) in indexes.items()])
+                connection.commit()
+
+                drops = ', '.join(f"DROP INDEX {name}" for name in indexes)
+                cursor.execute(f"ALTER TABLE {self.table} {drops}")
+                logging.info(f"Bulk load: dropped {len(indexes)} {self.table} indexes: {', '.join(indexes)}")
+                return list(indexes)
+            finally:
+                cursor.close()
+
+    def remove_duplicates(self, cursor, date_from=None, date_to=None):
+        """Delete all but the first-loaded row of each order line; returns the rows deleted"""
+        range_filter = ""
+        params = ()
+        if date_from and date_to:
+            range_filter = "WHERE date_key BETWEEN %s AND %s"
+            params = (date_key(date_from), date_key(date_to))
+        keys = ', '.join(UNIQUE_ORDER_COLUMNS)
+        join = ' AND '.join(f"f.{column} = d.{column}" for column in UNIQUE_ORDER_COLUMNS)
+        cursor.execute(f"""
+            DELETE f FROM {self.table} f
+            JOIN (
+                SELECT {keys}, MIN(sales_key) AS first_key
+                FROM {self.table}
+                {range_filter}
+                GROUP BY {keys}
+                HAVING COUNT(*) > 1
+            ) d ON {join}
+            WHERE f.sales_key > d.first_key
+        """, params)
+        return cursor.rowcount
+
+    def rebuild_indexes(self, date_from=None, date_to=None):
+        """Add every deferred index back in one ALTER TABLE; returns their names"""
+        with self.connections.connection('dw') as connection:
+            cursor = connection.cursor()
+            try:
+                cursor.execute("""
+                    SELECT index_name, is_unique, column_list
+                    FROM etl_deferred_index
+                    WHERE table_name = %s
+                """, (self.table,))
+                deferred = cursor.fetchall()
+                existing = self.secondary_indexes(cursor)
+                missing = [index for index in deferred if index[0] not in existing]
+
+                if any(unique for _, unique, _ in missing):
+                    removed = self.remove_duplicates(cursor, date_from, date_to)
+                    connection.commit()
+                    if removed:
+                        logging.warning(f"Bulk load: removed {removed} duplicate {self.table} order lines")
+
+                if missing:
+                    additions = ', '.join(
+                        f"ADD {'UNIQUE ' if unique else ''}INDEX {name} ({columns})"
+                        for name, unique, columns in missing
+                    )
+                    cursor.execute(f"ALTER TABLE {self.table} {additions}")
+                    logging.info(f"Bulk load: rebuilt {len(missing)} {self.table} indexes")
+
+                cursor.execute("DELETE FROM etl_deferred_index WHERE table_name = %s", (self.table,))
+                connection.commit()
+                return [name for name, _, _ in missing]
+            finally:
+                cursor.close()
+
+    def verify(self, date_from=None, date_to=None):
+        """Raise RuntimeError if fact rows reference missing dimension rows or repeat an order line"""
+        range_filter = ""
+        params = ()
+        if date_from and date_to:
+            range_filter = "AND f.date_key BETWEEN %s AND %s"
+            params = (date_key(date_from), date_key(date_to))
+
+        problems = []
+        with self.connections.connection('dw') as connection:
+            cursor = connection.cursor()
+            try:
+                for column, dimension in FACT_DIMENSIONS:
+                    cursor.execute(f"""
+                        SELECT COUNT(*)
+                        FROM {self.table} f
+                        LEFT JOIN {dimension} d ON f.{column} = d.{column}
+                        WHERE d.{column} IS NULL
+                        {range_filter}
+                    """, params)
+                    orphans = cursor.fetchone()[0]
+                    if orphans:
+                        problems.append(f"{orphans} rows with a {column} missing from {dimension}")
+
+                keys = ', '.join(f"f.{column}" for column in UNIQUE_ORDER_COLUMNS)
+                cursor.execute(f"""
+                    SELECT COUNT(*) FROM (
+                        SELECT {keys}
+                        FROM {self.table} f
+                        WHERE TRUE {range_filter}
+                        GROUP BY {keys}
+                        HAVING COUNT(*) > 1
+                    ) duplicates
+                """, params)
+                duplicates = cursor.fetchone()[0]
+                if duplicates:
+                    problems.append(f"{duplicates} duplicated order lines")
+            finally:
+                cursor.close()
+
+        if problems:
+            raise RuntimeError(f"{self.table} failed verification: {'; '.join(problems)}")
+        logging.info(f"Bulk load: {self.table} verified, no orphan keys or duplicates")
+
+    @contextmanager
+    def session(self, date_from=None, date_to=None):
+        """Run the enclosed load without index maintenance, then rebuild and verify
+
+        The indexes come back even when the load fails, so the table is
+        never left without its keys; a failed load is not verified.
+        """
+        self.defer_indexes()
+        try:
+            yield self
+        finally:
+            self.rebuild_indexes(date_from, date_to)
+        self.verify(date_from, date_to)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Bulk-load fact_sales with deferred index maintenance")
+    commands = parser.add_subparsers(dest='command', required=True)
+    load_parser = commands.add_parser('load', help="load (or with --reload, reload) a date range in bulk mode")
+    load_parser.add_argument('--from', dest='date_from', help="YYYY-MM-DD; default: everything staged")
+    load_parser.add_argument('--to', dest='date_to', help="YYYY-MM-DD")
+    load_parser.add_argument('--reload', action='store_true', help="empty the range first")
+    commands.add_parser('restore', help="rebuild indexes left deferred by an interrupted load")
+    verify_parser = commands.add_parser('verify', help="check for orphan keys and duplicate order lines")
+    verify_parser.add_argument('--from', dest='date_from')
+    verify_parser.add_argument('--to', dest='date_to')
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        filename=ETLConfig.LOG_FILE,
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+
+    if args.command == 'load':
+        from load_sales import DataLoader
+
+        loader = DataLoader()
+        loader.load_fact_sales(date_from=args.date_from, date_to=args.date_to,
+                               reload=args.reload, bulk=True)
+        loader.create_aggregates()
+    elif args.command == 'restore':
+        print(f"Rebuilt: {BulkLoad().rebuild_indexes() or 'nothing deferred'}")
+    else:
+        BulkLoad().verify(args.date_from, args.date_to)
+        print("fact_sales verified")
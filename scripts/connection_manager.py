@@ -0,0 +1,146 @@
+"""
+Shared MySQL connection manager
+Keeps one connection pool per database for the whole ETL run so every
+step borrows an open session instead of reconnecting
+"""
+import sys
+import os
+
+# Thêm thư mục gốc vào đường dẫn Python
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from mysql.connector import pooling, Error
+from config.database_config import DatabaseConfig
+from config.etl_config import ETLConfig
+from etl_metrics import InstrumentedConnection
+
+
+class ConnectionManager:
+    """Pooled staging/DW connections with session settings for bulk ETL work"""
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, pool_size=None, checkout_timeout=None):
+        self.config = DatabaseConfig()
+        # Every parallel stage may hold one session per database at a time
+        self.pool_size = pool_size or max(self.config.ETL_POOL_SIZE, ETLConfig.MAX_PARALLEL_STAGES + 1)
+        self.checkout_timeout = (
+            checkout_timeout if checkout_timeout is not None else self.config.ETL_POOL_TIMEOUT
+        )
+        if not 0 < self.pool_size <= pooling.CNX_POOL_MAXSIZE:
+            raise ValueError(f"ETL pool size must be between 1 and {pooling.CNX_POOL_MAXSIZE}")
+
+        self._pools = {}
+        self._pools_lock = threading.Lock()
+
+    @classmethod
+    def shared(cls):
+        """Process-wide manager, so all steps of a run reuse the same pools"""
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def _connection_settings(self, database):
+        """Credentials for the staging or DW database"""
+        config = self.config
+        if database == 'staging':
+            return {
+                'host': config.STAGING_HOST,
+                'port': config.STAGING_PORT,
+                'user': config.STAGING_USER,
+                'password': config.STAGING_PASSWORD,
+                'database': config.STAGING_DATABASE,
+            }
+        if database == 'dw':
+            return {
+                'host': config.DW_HOST,
+                'port': config.DW_PORT,
+                'user': config.DW_USER,
+                'password': config.DW_PASSWORD,
+                'database': config.DW_DATABASE,
+            }
+        raise ValueError(f"Unknown database '{database}'")
+
+    def _pool(self, database):
+        """Create the pool for a database on first use"""
+        with self._pools_lock:
+            if database not in self._pools:
+                self._pools[database] = pooling.MySQLConnectionPool(
+                    pool_name=f"etl_{database}_pool",
+                    pool_size=self.pool_size,
+                    # Session variables changed by a step are reset when it hands the connection back
+                    pool_reset_session=True,
+                    # Steps commit per batch; nothing is written until they say so
+                    autocommit=False,
+                    allow_local_infile=True,
+                    # Streamed (unbuffered) result sets left unread are discarded before the next statement
+                    consume_results=True,
+                    **self._connection_settings(database)
+                )
+                logging.info(f"Opened {database} connection pool ({self.pool_size} connections)")
+            return self._pools[database]
+
+    def get_connection(self, database='staging'):
+        """Check out a live connection; close() returns it to the pool
+
+        Waits up to checkout_timeout when every connection is in use. The
+        connection reports its statements to the running stage's metrics.
+        """
+        try:
+            pool = self._pool(database)
+            deadline = time.monotonic() + self.checkout_timeout
+            while True:
+                try:
+                    connection = pool.get_connection()
+                    break
+                except pooling.PoolError:
+                    if time.monotonic() >= deadline:
+                        raise
+                    time.sleep(0.05)
+
+            connection = InstrumentedConnection(connection)
+            try:
+                # Idle connections may have been dropped by wait_timeout; reconnect if stale
+                connection.ping(reconnect=True, attempts=2, delay=1)
+            except Error:
+                connection.close()
+                raise
+            return connection
+        except Error as e:
+            logging.error(f"Error connecting to {database} database: {e}")
+            raise
+
+    @contextmanager
+    def connection(self, database='staging'):
+        """Borrow a connection for the duration of a with-block"""
+        connection = self.get_connection(database)
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    @contextmanager
+    def bulk_session(self, connection, unique_checks=False, foreign_key_checks=False):
+        """Relax per-row constraint checks on `connection` for a bulk write
+
+        Only switch off a check when the caller already guarantees what it
+        verifies; both are restored afterwards, and the pool resets the
+        session anyway when the connection is returned.
+        """
+        cursor = connection.cursor()
+        try:
+            cursor.execute(
+                "SET SESSION unique_checks = %s, foreign_key_checks = %s",
+                (int(unique_checks), int(foreign_key_checks))
+            )
+            yield connection
+        finally:
+            if connection.is_connected():
+                cursor.execute("SET SESSION unique_checks = 1, foreign_key_checks = 1")
+            cursor.close()
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Date dimension builder
+Builds calendar rows for a whole date range at once with pandas, including
+fiscal periods and holidays from a pluggable holiday calendar, and inserts
+only the date_keys dim_date is missing. The range always covers the
+configured ETL dates and the order dates waiting in staging.
+"""
+import sys
+import os
+
+# Thêm thư mục gốc vào đường dẫn Python
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import importlib
+import logging
+import pandas as pd
+from pandas.tseries.holiday import AbstractHolidayCalendar, Holiday
+from config.etl_config import ETLConfig
+from connection_manager import ConnectionManager
+from retry import executemany_with_retry
+from etl_metrics import record, timed
+
+DIM_DATE_COLUMNS = [
+    'date_key', 'full_date', 'day', 'month', 'quarter', 'year',
+    'day_of_week', 'day_name', 'month_name', 'is_weekend', 'is_holiday',
+    'holiday_name', 'fiscal_year', 'fiscal_quarter', 'fiscal_month',
+]
+
+
+# Order dates of the validated staging sales, which dim_date has to cover
+STAGING_DATE_RANGE_QUERY = """
+    SELECT MIN(order_date), MAX(order_date)
+    FROM staging_sales
+    WHERE processed_flag = TRUE
+"""
+
+class VietnamHolidayCalendar(AbstractHolidayCalendar):
+    """Fixed-date Vietnamese public holidays
+
+    Lunar holidays (Tết, Hùng Kings' day) move every year and are not
+    included; add them as dated Holiday rules or plug in another calendar.
+    """
+    rules = [
+        Holiday("New Year's Day", month=1, day=1),
+        Holiday('Reunification Day', month=4, day=30),
+        Holiday('International Labour Day', month=5, day=1),
+        Holiday('National Day', month=9, day=2),
+    ]
+
+
+class NoHolidayCalendar(AbstractHolidayCalendar):
+    rules = []
+
+
+def load_holiday_calendar(path=None):
+    """Instantiate a holiday calendar from a dotted path, e.g.
+    'pandas.tseries.holiday.USFederalHolidayCalendar'
+
+    Any pandas AbstractHolidayCalendar subclass can be plugged in.
+    """
+    path = path or ETLConfig.HOLIDAY_CALENDAR
+    if '.' not in path:
+        # Short names refer to calendars defined in this module
+        return globals()[path]()
+    module_name, class_name = path.rsplit('.', 1)
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+def build_calendar(start_date, end_date, holiday_calendar=None, fiscal_start_month=None):
+    """dim_date rows for start_date..end_date as a DataFrame, computed column-wise"""
+    holiday_calendar = holiday_calendar or load_holiday_calendar()
+    fiscal_start_month = fiscal_start_month or ETLConfig.FISCAL_YEAR_START_MONTH
+
+    dates = pd.date_range(start_date, end_date, freq='D')
+    if dates.empty:
+        raise ValueError(f"Empty date range {start_date}..{end_date}")
+    holidays = holiday_calendar.holidays(dates[0], dates[-1], return_name=True)
+    # Two holidays on one day: keep the first name
+    holidays = holidays[~holidays.index.duplicated()]
+
+    months = dates.month
+    # Fiscal months count from the start month; the fiscal year is named after the year it ends in
+    fiscal_month = (months - fiscal_start_month) % 12 + 1
+    fiscal_year = dates.year + (months >= fiscal_start_month).astype(int) * (fiscal_start_month > 1)
+
+    holiday_names = pd.Series(holidays.reindex(dates).to_numpy(), index=dates)
+    return pd.DataFrame({
+        'date_key': dates.year * 10000 + months * 100 + dates.day,
+        'full_date': dates.date,
+        'day': dates.day,
+        'month': months,
+        'quarter': dates.quarter,
+        'year': dates.year,
+        'day_of_week': dates.dayofweek + 1,
+        'day_name': dates.day_name(),
+        'month_name': dates.month_name(),
+        'is_weekend': (dates.dayofweek >= 5).astype(int),
+        'is_holiday': holiday_names.notna().to_numpy().astype(int),
+        'holiday_name': holiday_names.where(holiday_names.notna(), None).to_numpy(),
+        'fiscal_year': fiscal_year,
+        'fiscal_quarter': (fiscal_month - 1) // 3 + 1,
+        'fiscal_month': fiscal_month,
+    }, columns=DIM_DATE_COLUMNS)
+
+
+def to_rows(calendar):
+    """DataFrame rows as tuples of plain Python values for executemany"""
+    columns = [calendar[name].tolist() for name in DIM_DATE_COLUMNS]
+    return list(zip(*columns))
+
+
+class DateDimension:
+    """Keeps dim_date covering every date the fact load can reference"""
+
+    def __init__(self, connection_manager=None, holiday_calendar=None):
+        self.connections = connection_manager or ConnectionManager.shared()
+        self.holiday_calendar = holiday_calendar or load_holiday_calendar()
+
+    def staging_date_range(self):
+        """(min, max) order_date of the staging sales that can still be loaded"""
+        with self.connections.connection('staging') as connection:
+            cursor = connection.cursor()
+            try:
+                cursor.execute(STAGING_DATE_RANGE_QUERY)
+                return cursor.fetchone()
+            finally:
+                cursor.close()
+
+    def required_range(self):
+        """The configured ETL range, widened to the staging order dates"""
+        start = pd.Timestamp(ETLConfig.START_DATE)
+        end = pd.Timestamp(ETLConfig.END_DATE)
+        staging_min, staging_max = self.staging_date_range()
+        if staging_min is not None:
+            start = min(start, pd.Timestamp(staging_min))
+            end = max(end, pd.Timestamp(staging_max))
+        return start, end
+
+    def populate(self, start_date=None, end_date=None, refresh=False):
+        """Insert the dim_date rows missing for the range; returns the number written
+
+        Without an explicit range the required range is used. With
+        refresh=True existing rows are rewritten too, e.g. after changing the
+        holiday calendar or the fiscal year start.
+        """
+        if start_date is None or end_date is None:
+            start_date, end_date = self.required_range()
+        start_date, end_date = pd.Timestamp(start_date), pd.Timestamp(end_date)
+
+        with timed('transform'):
+            calendar = build_calendar(start_date, end_date, self.holiday_calendar)
+
+        with self.connections.connection('dw') as connection:
+            cursor = connection.cursor()
+            try:
+                if not refresh:
+                    cursor.execute(
+                        "SELECT date_key FROM dim_date WHERE date_key BETWEEN %s AND %s",
+                        (int(calendar['date_key'].iloc[0]), int(calendar['date_key'].iloc[-1]))
+                    )
+                    existing = [row[0] for row in cursor.fetchall()]
+                    calendar = calendar[~calendar['date_key'].isin(existing)]
+
+                if calendar.empty:
+                    logging.info(f"Date dimension already covers {start_date:%Y-%m-%d}..{end_date:%Y-%m-%d}")
+                    return 0
+
+                placeholders = ', '.join(['%s'] * len(DIM_DATE_COLUMNS))
+                updates = ', '.join(f"{name} = VALUES({name})" for name in DIM_DATE_COLUMNS[1:])
+                insert_query = f"""
+                    INSERT INTO dim_date
+                    ({', '.join(DIM_DATE_COLUMNS)})
+                    VALUES ({placeholders})
+                    ON DUPLICATE KEY UPDATE {updates}
+                """
+                executemany_with_retry(
+                    connection, cursor, insert_query, to_rows(calendar),
+                    description="dim_date insert"
+                )
+                record(rows=len(calendar), batches=1)
+                logging.info(
+                    f"Date dimension: wrote {len(calendar)} dates between "
+                    f"{calendar['full_date'].iloc[0]} and {calendar['full_date'].iloc[-1]}"
+                )
+                return len(calendar)
+            finally:
+                cursor.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build or extend the date dimension")
+    parser.add_argument('--start-date', help="first date (YYYY-MM-DD); default covers config and staging")
+    parser.add_argument('--end-date', help="last date (YYYY-MM-DD)")
+    parser.add_argument('--refresh', action='store_true',
+                        help="rewrite existing dates too, e.g. after changing the holiday calendar")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        filename=ETLConfig.LOG_FILE,
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    start = pd.Timestamp(args.start_date) if args.start_date else None
+    end = pd.Timestamp(args.end_date) if args.end_date else None
+    written = DateDimension().populate(start, end, refresh=args.refresh)
+    print(f"Wrote {written} dim_date rows")
@@ -0,0 +1,330 @@
+"""
+Per-stage ETL performance telemetry
+Counts rows, bytes, batches, DB round-trips and retries, splits wall time
+into parse / transform / DB wait, and writes one record per stage to the
+etl_stage_metrics table and a JSON-lines log
+"""
+import sys
+import os
+
+# Thêm thư mục gốc vào đường dẫn Python
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from mysql.connector import Error
+from config.etl_config import ETLConfig
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+PHASES = ('parse', 'transform', 'db_wait')
+
+# Metrics of the stage running on the current thread; stages run on scheduler worker threads
+_local = threading.local()
+_exhausted = object()
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of `values`, or None when there are none"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MB"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return round(peak / divisor, 1)
+
+
+class StageMetrics:
+    """Counters and phase timers for one run of one stage"""
+
+    def __init__(self, run_id, stage_name):
+        self.run_id = run_id
+        self.stage_name = stage_name
+        self.status = 'RUNNING'
+        self.started_at = datetime.now()
+        self.duration_seconds = 0.0
+        self.rows = 0
+        self.bytes_read = 0
+        self.batches = 0
+        self.round_trips = 0
+        self.retries = 0
+        self.phase_seconds = dict.fromkeys(PHASES, 0.0)
+        # Wall time between consecutive batch completions, for latency percentiles
+        self.batch_seconds = []
+        self._last_batch_mark = time.perf_counter()
+        self.peak_rss_mb = None
+        self.error_message = None
+        # Open phase timers, innermost last: [phase, start, seconds spent in nested phases]
+        self._timers = []
+
+    def count(self, rows=0, bytes_read=0, batches=0, round_trips=0, retries=0):
+        self.rows += rows
+        self.bytes_read += bytes_read
+        self.batches += batches
+        if batches:
+            now = time.perf_counter()
+            latency = (now - self._last_batch_mark) / batches
+            self.batch_seconds.extend([latency] * batches)
+            self._last_batch_mark = now
+        self.round_trips += round_trips
+        self.retries += retries
+
+    def start_phase(self, phase):
+        self._timers.append([phase, time.perf_counter(), 0.0])
+
+    def end_phase(self):
+        """Close the innermost phase; time spent in nested phases is not counted twice"""
+        phase, start, nested = self._timers.pop()
+        elapsed = time.perf_counter() - start
+        self.phase_seconds[phase] += elapsed - nested
+        if self._timers:
+            self._timers[-1][2] += elapsed
+
+    @property
+    def rows_per_second(self):
+        if not self.duration_seconds:
+            return None
+        return round(self.rows / self.duration_seconds, 2)
+
+    def batch_percentile(self, pct):
+        value = percentile(self.batch_seconds, pct)
+        return None if value is None else round(value, 4)
+
+    def as_dict(self):
+        return {
+            'run_id': self.run_id,
+            'stage_name': self.stage_name,
+            'status': self.status,
+            'started_at': self.started_at.isoformat(),
+            'duration_seconds': round(self.duration_seconds, 3),
+            'rows': self.rows,
+            'rows_per_second': self.rows_per_second,
+            'bytes_read': self.bytes_read,
+            'batches': self.batches,
+            'batch_p50_seconds': self.batch_percentile(50),
+            'batch_p95_seconds': self.batch_percentile(95),
+            'batch_p99_seconds': self.batch_percentile(99),
+            'round_trips': self.round_trips,
+            'retries': self.retries,
+            'parse_seconds': round(self.phase_seconds['parse'], 3),
+            'transform_seconds': round(self.phase_seconds['transform'], 3),
+            'db_wait_seconds': round(self.phase_seconds['db_wait'], 3),
+            'peak_rss_mb': self.peak_rss_mb,
+            'error_message': self.error_message,
+        }
+
+
+def current_metrics():
+    """Metrics of the stage running on this thread, or None outside a tracked stage"""
+    return getattr(_local, 'metrics', None)
+
+
+def record(rows=0, bytes_read=0, batches=0, round_trips=0, retries=0):
+    """Add to the current stage's counters; a no-op outside a tracked stage"""
+    metrics = current_metrics()
+    if metrics is not None:
+        metrics.count(rows, bytes_read, batches, round_trips, retries)
+
+
+@contextmanager
+def timed(phase):
+    """Attribute the time spent in the block to `phase` of the current stage"""
+    metrics = current_metrics()
+    if metrics is None:
+        yield
+        return
+    metrics.start_phase(phase)
+    try:
+        yield
+    finally:
+        metrics.end_phase()
+
+
+def timed_iter(iterable, phase):
+    """Yield from `iterable`, attributing the time spent producing each item to `phase`"""
+    iterator = iter(iterable)
+    while True:
+        with timed(phase):
+            item = next(iterator, _exhausted)
+        if item is _exhausted:
+            return
+        yield item
+
+
+class InstrumentedCursor:
+    """Cursor proxy that counts statements as round-trips and times them as DB wait"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def _call(self, method, *args, **kwargs):
+        with timed('db_wait'):
+            return getattr(self._cursor, method)(*args, **kwargs)
+
+    def execute(self, *args, **kwargs):
+        record(round_trips=1)
+        return self._call('execute', *args, **kwargs)
+
+    def executemany(self, *args, **kwargs):
+        # mysql.connector sends an INSERT executemany as one multi-row statement
+        record(round_trips=1)
+        return self._call('executemany', *args, **kwargs)
+
+    def fetchone(self):
+        return self._call('fetchone')
+
+    def fetchmany(self, *args, **kwargs):
+        return self._call('fetchmany', *args, **kwargs)
+
+    def fetchall(self):
+        return self._call('fetchall')
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class InstrumentedConnection:
+    """Connection proxy whose cursors and commits feed the current stage's metrics"""
+
+    def __init__(self, connection):
+        self._connection = connection
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self._connection.cursor(*args, **kwargs))
+
+    def commit(self):
+        record(round_trips=1)
+        with timed('db_wait'):
+            self._connection.commit()
+
+    def rollback(self):
+        record(round_trips=1)
+        with timed('db_wait'):
+            self._connection.rollback()
+
+    def close(self):
+        """Hand the connection back to its pool, even after the server dropped it
+
+        Only close() returns a pooled connection, so callers close it
+        unconditionally. Resetting the session of a dropped connection
+        fails, but the pool still takes it back and the next checkout's
+        ping reconnects it, so that error is logged rather than raised.
+        """
+        try:
+            self._connection.close()
+        except Error as e:
+            logging.warning(f"Connection returned to the pool without a session reset: {e}")
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+
+class MetricsRecorder:
+    """Tracks stages and publishes their metrics to etl_stage_metrics and a JSON-lines log"""
+
+    def __init__(self, connection_manager=None, run_id=None, log_path=None):
+        self.connections = connection_manager
+        self.run_id = run_id or datetime.now().strftime('%Y%m%dT%H%M%S')
+        self.log_path = log_path or ETLConfig.METRICS_LOG
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def track(self, stage_name):
+        """Collect metrics for the stage run on this thread inside the block"""
+        metrics = StageMetrics(self.run_id, stage_name)
+        previous = current_metrics()
+        _local.metrics = metrics
+        start = time.perf_counter()
+        try:
+            yield metrics
+            metrics.status = 'COMPLETED'
+        except Exception as e:
+            metrics.status = 'FAILED'
+            metrics.error_message = str(e)
+            raise
+        finally:
+            _local.metrics = previous
+            metrics.duration_seconds = time.perf_counter() - start
+            # Process-wide high-water mark; parallel stages share it
+            metrics.peak_rss_mb = peak_rss_mb()
+            self.publish(metrics)
+
+    def publish(self, metrics):
+        """Write one stage record; telemetry failures never fail the stage"""
+        try:
+            self.append_log(metrics.as_dict())
+        except OSError as e:
+            logging.warning(f"Could not write stage metrics log: {e}")
+
+        if self.connections is None:
+            return
+        try:
+            self.insert_row(metrics)
+        except Exception as e:
+            logging.warning(f"Could not store metrics for stage {metrics.stage_name}: {e}")
+
+    def append_log(self, record_dict):
+        directory = os.path.dirname(self.log_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            with open(self.log_path, 'a', encoding='utf-8') as log_file:
+                log_file.write(json.dumps(record_dict) + '\n')
+
+    def insert_row(self, metrics):
+        record_dict = metrics.as_dict()
+        try:
+            connection = self.connections.get_connection('dw')
+            cursor = connection.cursor()
+            insert_query = """
+                INSERT INTO etl_stage_metrics
+                (run_id, stage_name, status, started_at, duration_seconds,
+                 rows_processed, rows_per_second, bytes_read, batches, round_trips, retries,
+                 parse_seconds, transform_seconds, db_wait_seconds, peak_rss_mb, error_message)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """
+            cursor.execute(insert_query, (
+                record_dict['run_id'],
+                record_dict['stage_name'],
+                record_dict['status'],
+                metrics.started_at,
+                record_dict['duration_seconds'],
+                record_dict['rows'],
+                record_dict['rows_per_second'],
+                record_dict['bytes_read'],
+                record_dict['batches'],
+                record_dict['round_trips'],
+                record_dict['retries'],
+                record_dict['parse_seconds'],
+                record_dict['transform_seconds'],
+                record_dict['db_wait_seconds'],
+                record_dict['peak_rss_mb'],
+                record_dict['error_message'],
+            ))
+            connection.commit()
+
+        finally:
+            if 'connection' in locals():
+                if connection.is_connected():
+                    cursor.close()
+                connection.close()
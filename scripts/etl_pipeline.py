@@ -14,7 +14,15 @@ from datetime import datetime
 from extract_sales import DataExtractor
 from transform_sales import DataTransformer
 from load_sales import DataLoader
-from config.database_config import DatabaseConfig
+from export_snapshot import SnapshotExporter
+from olap_mirror import OLAPMirror
+from staging_lifecycle import StagingLifecycle
+from stage_scheduler import PipelineStage, StageScheduler
+from connection_manager import ConnectionManager
+from etl_metrics import MetricsRecorder
+from etl_profiling import StageProfiler
+from memory_budget import log_peak_rss
+from mysql.connector import Error
 from config.etl_config import ETLConfig
 
 logging.basicConfig(
@@ -27,12 +35,98 @@ logging.basicConfig(
 )
 
 class ETLPipeline:
-    def __init__(self):
-        self.extractor = DataExtractor()
-        self.transformer = DataTransformer()
-        self.loader = DataLoader()
+    def __init__(self, resume=False, connection_manager=None, run_id=None):
+        # One set of pooled connections serves every step of the run
+        self.connections = connection_manager or ConnectionManager.shared()
+        # Per-stage telemetry, tagged with run_id so all stages of a run group together
+        self.metrics = MetricsRecorder(self.connections, run_id=run_id)
+        # Profiles only the stages named in ETL_PROFILE_STAGES
+        self.profiler = StageProfiler(run_id=self.metrics.run_id)
+        self.extractor = DataExtractor(self.connections)
+        self.transformer = DataTransformer(self.connections)
+        self.loader = DataLoader(self.connections)
+        self.snapshot_exporter = SnapshotExporter(connection_manager=self.connections)
+        self.olap_mirror = OLAPMirror(connection_manager=self.connections)
+        self.staging_lifecycle = StagingLifecycle(connection_manager=self.connections)
         self.data_dir = ETLConfig.DATA_DIR
+        self.stage_timings = {}
+        # Continue an interrupted fact load from its checkpoint instead of restarting
+        self.resume = resume
         
+    def build_stages(self):
+        """Declare the pipeline stages and the dependencies between them"""
+        stages = [
+            # Extraction: the three source files are independent
+            PipelineStage('extract_customers', lambda: self.extractor.extract_customers_data(
+                f"{self.data_dir}/{ETLConfig.CUSTOMERS_FILE}"
+            )),
+            PipelineStage('extract_products', lambda: self.extractor.extract_products_data(
+                f"{self.data_dir}/{ETLConfig.PRODUCTS_FILE}"
+            )),
+            PipelineStage('extract_sales', lambda: self.extractor.extract_sales_data(
+                f"{self.data_dir}/{ETLConfig.SALES_FILE}"
+            )),
+            
+            # Transformation
+            PipelineStage('transform_customers', self.transformer.transform_customers,
+                          depends_on=['extract_customers']),
+            PipelineStage('transform_products', self.transformer.transform_products,
+                          depends_on=['extract_products']),
+            PipelineStage('validate_and_clean_sales', self.transformer.validate_and_clean_sales,
+                          depends_on=['extract_sales']),
+            # Extends dim_date to the staged order dates, so it runs after validation
+            PipelineStage('populate_date_dimension', self.transformer.populate_date_dimension,
+                          depends_on=['validate_and_clean_sales']),
+            
+            # Loading
+            PipelineStage('load_dim_customers', self.loader.load_dim_customers,
+                          depends_on=['transform_customers']),
+            PipelineStage('load_dim_products', self.loader.load_dim_products,
+                          depends_on=['transform_products']),
+            PipelineStage('prepare_fact_partitions', self.loader.prepare_fact_partitions),
+            # Runs alongside the dimension loads: customers and products it
+            # meets first get inferred placeholder rows
+            PipelineStage('load_fact_sales',
+                          lambda: self.loader.load_fact_sales(resume=self.resume,
+                                                              bulk=self.loader.use_bulk_load()),
+                          depends_on=['validate_and_clean_sales', 'populate_date_dimension',
+                                      'prepare_fact_partitions']),
+            PipelineStage('reconcile_inferred_members', self.loader.reconcile_inferred_members,
+                          depends_on=['load_dim_customers', 'load_dim_products', 'load_fact_sales']),
+            PipelineStage('create_aggregates', self.loader.create_aggregates,
+                          depends_on=['reconcile_inferred_members']),
+        ]
+        
+        # Archive and delete the staging rows this run has finished with
+        if ETLConfig.STAGING_PURGE_ENABLED:
+            stages.append(PipelineStage('purge_staging', self.staging_lifecycle.purge,
+                                        depends_on=['create_aggregates']))
+        
+        # Analytical copy for the dashboard; it builds its own aggregates from the facts
+        if ETLConfig.OLAP_MIRROR_ENABLED:
+            stages.append(PipelineStage('refresh_olap_mirror', self.olap_mirror.refresh,
+                                        depends_on=['reconcile_inferred_members']))
+        return stages
+    
+    def run_stage(self, name):
+        """Run a single pipeline stage by name, without its dependencies"""
+        stages = {stage.name: stage for stage in self.build_stages()}
+        if name not in stages:
+            raise ValueError(f"Unknown pipeline stage: {name}")
+        
+        logging.info(f"Running stage {name}")
+        with self.metrics.track(name), self.profiler.profile(name):
+            stages[name].func()
+    
+    def publish_snapshot(self):
+        """Publish the dashboard snapshot; failures are logged, not raised"""
+        # The load itself succeeded; a failed snapshot only means the
+        # dashboard keeps serving the previous one or falls back to live queries
+        try:
+            self.snapshot_exporter.export_snapshot()
+        except Exception as e:
+            logging.warning(f"Dashboard snapshot not published: {e}")
+    
     def run_full_pipeline(self):
         """Execute complete ETL pipeline"""
         try:
@@ -42,37 +136,27 @@ class ETLPipeline:
             
             start_time = datetime.now()
             
-            # Phase 1: Extraction
-            logging.info("\nPHASE 1: EXTRACTION")
-            logging.info("-" * 40)
-            
-            self.extractor.extract_customers_data(
-                f"{self.data_dir}/{ETLConfig.CUSTOMERS_FILE}"
+            # Extract, transform and load: independent stages run concurrently
+            scheduler = StageScheduler(
+                self.build_stages(), ETLConfig.MAX_PARALLEL_STAGES,
+                metrics_recorder=self.metrics, profiler=self.profiler
             )
-            self.extractor.extract_products_data(
-                f"{self.data_dir}/{ETLConfig.PRODUCTS_FILE}"
-            )
-            self.extractor.extract_sales_data(
-                f"{self.data_dir}/{ETLConfig.SALES_FILE}"
+            logging.info(
+                f"Running {len(scheduler.stages)} stages on up to {scheduler.max_workers} workers"
             )
-            
-            # Phase 2: Transformation
-            logging.info("\nPHASE 2: TRANSFORMATION")
-            logging.info("-" * 40)
-            
-            self.transformer.transform_customers()
-            self.transformer.transform_products()
-            self.transformer.validate_and_clean_sales()
-            self.transformer.populate_date_dimension()
-            
-            # Phase 3: Loading
-            logging.info("\nPHASE 3: LOADING")
+            try:
+                scheduler.run()
+            finally:
+                self.stage_timings = scheduler.timings
+                logging.info("Stage timings:")
+                scheduler.log_summary()
+                log_peak_rss('pipeline stages')
+            
+            # Publish
+            logging.info("\nPUBLISH")
             logging.info("-" * 40)
             
-            self.loader.load_dim_customers()
-            self.loader.load_dim_products()
-            self.loader.load_fact_sales()
-            self.loader.create_aggregates()
+            self.publish_snapshot()
             
             # Calculate statistics
             end_time = datetime.now()
@@ -111,18 +195,7 @@ class ETLPipeline:
             logging.info("Validating ETL results...")
             
             # Connect to DW database
-            import mysql.connector
-            from mysql.connector import Error
-            
-            config = DatabaseConfig()
-            
-            connection = mysql.connector.connect(
-                host=config.DW_HOST,
-                port=config.DW_PORT,
-                user=config.DW_USER,
-                password=config.DW_PASSWORD,
-                database=config.DW_DATABASE
-            )
+            connection = self.connections.get_connection('dw')
             cursor = connection.cursor()
             
             validation_queries = [
@@ -131,7 +204,9 @@ class ETLPipeline:
                 ("Total Sales Records", "SELECT COUNT(*) FROM fact_sales"),
                 ("Total Sales Amount", "SELECT SUM(total_amount) FROM fact_sales"),
                 ("Date Range", "SELECT MIN(full_date), MAX(full_date) FROM dim_date"),
-                ("Unique Orders", "SELECT COUNT(DISTINCT order_id) FROM fact_sales")
+                ("Unique Orders", "SELECT COUNT(DISTINCT order_key) FROM fact_sales"),
+                ("Inferred Customers", "SELECT COUNT(*) FROM dim_customer WHERE is_inferred = TRUE"),
+                ("Inferred Products", "SELECT COUNT(*) FROM dim_product WHERE is_inferred = TRUE")
             ]
             
             results = {}
@@ -141,18 +216,28 @@ class ETLPipeline:
                 results[label] = result
                 logging.info(f"{label}: {result}")
             
-            cursor.close()
-            connection.close()
-            
             return results
             
         except Error as e:
             logging.error(f"Validation failed: {e}")
             return {}
+        
+        finally:
+            if 'connection' in locals():
+                if connection.is_connected():
+                    cursor.close()
+                connection.close()
 
 if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Run the sales ETL pipeline")
+    parser.add_argument('--resume', action='store_true',
+                        help="continue an interrupted fact load from its last checkpoint")
+    args = parser.parse_args()
+    
     # Create pipeline and run
-    pipeline = ETLPipeline()
+    pipeline = ETLPipeline(resume=args.resume)
     
     # Run full ETL
     success = pipeline.run_full_pipeline()
@@ -0,0 +1,172 @@
+"""
+Opt-in profiling for ETL stages
+Wraps the stages listed in ETL_PROFILE_STAGES in cProfile or a sampling
+profiler plus a tracemalloc snapshot, and writes the reports under
+logs/profiles/<run_id>/. Stages that are not selected run untouched.
+"""
+import sys
+import os
+
+# Thêm thư mục gốc vào đường dẫn Python
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cProfile
+import io
+import logging
+import pstats
+import re
+import threading
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from config.etl_config import ETLConfig
+
+PROFILERS = ('cprofile', 'sampling')
+
+# Only one cProfile profiler can be active at a time on Python 3.12+
+_cprofile_lock = threading.Lock()
+
+# tracemalloc is process-wide; parallel profiled stages share one tracing session
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_users = 0
+
+
+def _start_tracemalloc():
+    global _tracemalloc_users
+    with _tracemalloc_lock:
+        if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(ETLConfig.PROFILE_TRACEMALLOC_FRAMES)
+        _tracemalloc_users += 1
+
+
+def _stop_tracemalloc():
+    global _tracemalloc_users
+    with _tracemalloc_lock:
+        _tracemalloc_users -= 1
+        if _tracemalloc_users == 0 and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+
+class SamplingProfiler:
+    """Samples one thread's stack at a fixed interval and counts collapsed stacks
+
+    Overhead depends on the interval, not on how many calls the stage makes,
+    so it is the better choice for long row-by-row loops.
+    """
+
+    def __init__(self, thread_id, interval=None):
+        self.thread_id = thread_id
+        self.interval = interval or ETLConfig.PROFILE_SAMPLE_INTERVAL
+        self.stacks = Counter()
+        self._stopped = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, name='etl_profile_sampler', daemon=True)
+
+    def _sample(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self._sampler.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._sampler.join()
+
+    def write_collapsed(self, path):
+        """Write stacks in the collapsed format read by flamegraph.pl and speedscope"""
+        with open(path, 'w', encoding='utf-8') as report:
+            for stack, count in self.stacks.most_common():
+                report.write(f"{stack} {count}\n")
+
+
+class StageProfiler:
+    """Profiles the configured stages of one run"""
+
+    def __init__(self, run_id=None, stages=None, profiler=None, trace_memory=None, output_dir=None):
+        self.run_id = run_id or datetime.now().strftime('%Y%m%dT%H%M%S')
+        self.stages = set(ETLConfig.PROFILE_STAGES if stages is None else stages)
+        self.profiler = (profiler or ETLConfig.PROFILER).lower()
+        self.trace_memory = ETLConfig.PROFILE_MEMORY if trace_memory is None else trace_memory
+        base_dir = output_dir or os.path.join(os.path.dirname(ETLConfig.LOG_FILE), 'profiles')
+        self.output_dir = os.path.join(base_dir, self.run_id)
+        if self.profiler not in PROFILERS:
+            raise ValueError(f"Unknown profiler '{self.profiler}', expected one of {PROFILERS}")
+
+    def enabled_for(self, stage_name):
+        return 'all' in self.stages or stage_name in self.stages
+
+    def profile(self, stage_name, label=None):
+        """Context manager profiling `stage_name`, or a no-op when it is not selected"""
+        if not self.stages or not self.enabled_for(stage_name):
+            return nullcontext()
+        return self._profile(label or stage_name)
+
+    @contextmanager
+    def _profile(self, label):
+        os.makedirs(self.output_dir, exist_ok=True)
+        base_name = os.path.join(self.output_dir, re.sub(r'[^\w.-]+', '_', label))
+
+        if self.trace_memory:
+            _start_tracemalloc()
+
+        # A stage running while another one holds cProfile is sampled instead
+        use_cprofile = self.profiler == 'cprofile' and _cprofile_lock.acquire(blocking=False)
+        if use_cprofile:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        else:
+            profiler = SamplingProfiler(threading.get_ident())
+            profiler.start()
+
+        logging.info(f"Profiling stage {label} with {'cprofile' if use_cprofile else 'sampling'}")
+        try:
+            yield
+        finally:
+            if use_cprofile:
+                profiler.disable()
+                _cprofile_lock.release()
+            else:
+                profiler.stop()
+
+            # Allocations still alive at the end of the stage, plus the peak reached during it
+            snapshot = None
+            peak_traced = None
+            if self.trace_memory:
+                snapshot = tracemalloc.take_snapshot()
+                peak_traced = tracemalloc.get_traced_memory()[1]
+                _stop_tracemalloc()
+
+            try:
+                self.write_reports(base_name, profiler, snapshot, peak_traced)
+                logging.info(f"Profile for stage {label} written to {self.output_dir}")
+            except Exception as e:
+                logging.warning(f"Could not write profile for stage {label}: {e}")
+
+    def write_reports(self, base_name, profiler, snapshot=None, peak_traced=None):
+        if isinstance(profiler, cProfile.Profile):
+            profiler.dump_stats(f"{base_name}.pstats")
+            summary = io.StringIO()
+            stats = pstats.Stats(profiler, stream=summary)
+            stats.sort_stats('cumulative').print_stats(ETLConfig.PROFILE_TOP_N)
+            with open(f"{base_name}_pstats.txt", 'w', encoding='utf-8') as report:
+                report.write(summary.getvalue())
+        else:
+            profiler.write_collapsed(f"{base_name}.collapsed")
+
+        if snapshot is not None:
+            top_stats = snapshot.statistics('lineno')
+            with open(f"{base_name}_allocations.txt", 'w', encoding='utf-8') as report:
+                total = sum(stat.size for stat in top_stats)
+                report.write(f"Peak traced memory: {peak_traced / 1024 / 1024:.1f} MB\n")
+                report.write(f"Retained at stage end: {total / 1024 / 1024:.1f} MB\n")
+                for stat in top_stats[:ETLConfig.PROFILE_TOP_N]:
+                    report.write(f"{stat}\n")
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Dashboard snapshot export
+Renders the dashboard datasets from the aggregate tables into versioned
+JSON/HTML files so viewers can be served without querying MySQL
+"""
+import sys
+import os
+
+# Thêm thư mục gốc vào đường dẫn Python
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import glob
+import json
+import logging
+import tempfile
+from datetime import datetime
+from decimal import Decimal
+from config.etl_config import ETLConfig
+from connection_manager import ConnectionManager
+from dashboard_data import DashboardFilters, build_queries, fetch_dataframe, load_filter_options
+import pandas as pd
+
+SNAPSHOT_PREFIX = "dashboard_snapshot_"
+SNAPSHOT_PLACEHOLDER = "<!-- SNAPSHOT_DATA -->"
+
+
+def _to_json_value(value):
+    """json.dumps fallback for the DB types returned by mysql.connector"""
+    if isinstance(value, Decimal):
+        return float(value)
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+def atomic_write(path, content):
+    """Write content to path so readers never see a partially written file"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp_', suffix=os.path.basename(path))
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as tmp_file:
+            tmp_file.write(content)
+            tmp_file.flush()
+            os.fsync(tmp_file.fileno())
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class SnapshotExporter:
+    def __init__(self, snapshot_dir=None, template_path=None, keep=None, connection_manager=None):
+        self.connections = connection_manager or ConnectionManager.shared()
+        self.snapshot_dir = snapshot_dir or ETLConfig.SNAPSHOT_DIR
+        self.template_path = template_path or ETLConfig.SNAPSHOT_TEMPLATE
+        self.keep = keep or ETLConfig.SNAPSHOT_KEEP
+
+    def create_connection(self):
+        """Borrow a pooled connection to the data warehouse"""
+        return self.connections.get_connection('dw')
+
+    def build_snapshot(self, connection):
+        """Query every unfiltered dashboard view; without filters they are all served by agg_sales_daily"""
+        datasets = {}
+        for name, (query, params) in build_queries(DashboardFilters()).items():
+            df = fetch_dataframe(connection, query, params)
+            # NaN is not valid JSON; publish missing values as null
+            df = df.astype(object).where(pd.notnull(df), None)
+            datasets[name] = df.to_dict(orient='records')
+
+        cursor = connection.cursor()
+        try:
+            cursor.execute("""
+                SELECT COUNT(DISTINCT customer_key)
+                FROM agg_sales_daily
+                WHERE customer_key IS NOT NULL AND product_key IS NULL
+            """)
+            customer_count = cursor.fetchone()[0]
+        finally:
+            cursor.close()
+
+        filter_options = load_filter_options(connection)
+        generated_at = datetime.now()
+
+        return {
+            'version': generated_at.strftime('%Y%m%dT%H%M%S'),
+            'generated_at': generated_at,
+            'filter_options': filter_options,
+            'customer_count': customer_count,
+            'datasets': datasets,
+        }
+
+    def render_html(self, snapshot_json):
+        """Inject the snapshot into the static dashboard page"""
+        with open(self.template_path, 'r', encoding='utf-8') as template_file:
+            template = template_file.read()
+
+        # Keep "</script>" sequences inside string values from closing the tag
+        payload = snapshot_json.replace('</', '<\\/')
+        script = f"<script>window.SNAPSHOT_DATA = {payload};</script>"
+        return template.replace(SNAPSHOT_PLACEHOLDER, script, 1)
+
+    def prune_snapshots(self):
+        """Remove all but the newest `keep` snapshot versions"""
+        versions = sorted(
+            glob.glob(os.path.join(self.snapshot_dir, f"{SNAPSHOT_PREFIX}*.json")),
+            reverse=True
+        )
+        for json_path in versions[self.keep:]:
+            for path in (json_path, json_path[:-len('.json')] + '.html'):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def export_snapshot(self):
+        """Export the current dashboard datasets to versioned JSON/HTML files"""
+        try:
+            logging.info("Exporting dashboard snapshot")
+
+            connection = self.create_connection()
+            snapshot = self.build_snapshot(connection)
+            snapshot_json = json.dumps(snapshot, default=_to_json_value)
+            snapshot_html = self.render_html(snapshot_json)
+
+            os.makedirs(self.snapshot_dir, exist_ok=True)
+            base_name = os.path.join(self.snapshot_dir, f"{SNAPSHOT_PREFIX}{snapshot['version']}")
+
+            # Versioned files first, then swap the "latest" pointers readers use
+            atomic_write(f"{base_name}.json", snapshot_json)
+            atomic_write(f"{base_name}.html", snapshot_html)
+            atomic_write(os.path.join(self.snapshot_dir, 'latest.json'), snapshot_json)
+            atomic_write(os.path.join(self.snapshot_dir, 'latest.html'), snapshot_html)
+
+            self.prune_snapshots()
+
+            logging.info(f"Dashboard snapshot {snapshot['version']} written to {self.snapshot_dir}")
+            return f"{base_name}.json"
+
+        except Exception as e:
+            logging.error(f"Error exporting dashboard snapshot: {e}")
+            raise
+
+        finally:
+            if 'connection' in locals():
+                connection.close()
+
+if __name__ == "__main__":
+    exporter = SnapshotExporter()
+    exporter.export_snapshot()
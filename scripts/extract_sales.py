@@ -1,7 +1,4 @@
 import pandas as pd
-import mysql.connector
-from mysql.connector import Error
-from config.database_config import DatabaseConfig
 from config.etl_config import ETLConfig
 import logging
 from datetime import datetime
@@ -11,6 +8,11 @@ import sys
 # Thêm thư mục gốc vào đường dẫn Python
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from connection_manager import ConnectionManager
+from retry import executemany_with_retry
+from etl_metrics import record, timed, timed_iter
+from memory_budget import csv_chunk_rows
+
 logging.basicConfig(
     filename=ETLConfig.LOG_FILE,
     level=logging.INFO,
@@ -18,24 +20,13 @@ logging.basicConfig(
 )
 
 class DataExtractor:
-    def __init__(self):
-        self.staging_config = DatabaseConfig()
+    def __init__(self, connection_manager=None):
+        self.connections = connection_manager or ConnectionManager.shared()
         self.batch_size = ETLConfig.BATCH_SIZE
         
     def create_staging_connection(self):
-        """Create connection to staging database"""
-        try:
-            connection = mysql.connector.connect(
-                host=self.staging_config.STAGING_HOST,
-                port=self.staging_config.STAGING_PORT,
-                user=self.staging_config.STAGING_USER,
-                password=self.staging_config.STAGING_PASSWORD,
-                database=self.staging_config.STAGING_DATABASE
-            )
-            return connection
-        except Error as e:
-            logging.error(f"Error connecting to staging database: {e}")
-            raise
+        """Borrow a pooled connection to the staging database"""
+        return self.connections.get_connection('staging')
     
     def extract_sales_data(self, file_path):
         """Extract sales data from CSV and load to staging"""
@@ -73,8 +64,11 @@ class DataExtractor:
             process_id = cursor.lastrowid
             connection.commit()
             
-            # Process CSV in chunks
-            for chunk in pd.read_csv(file_path, chunksize=self.batch_size):
+            record(bytes_read=os.path.getsize(file_path))
+            
+            # Process CSV in chunks sized to the memory budget
+            chunk_rows = csv_chunk_rows(file_path, maximum=self.batch_size)
+            for chunk in timed_iter(pd.read_csv(file_path, chunksize=chunk_rows), 'parse'):
                 chunk_count += 1
                 records_in_chunk = len(chunk)
                 total_records += records_in_chunk
@@ -82,18 +76,19 @@ class DataExtractor:
                 logging.info(f"Processing chunk {chunk_count}: {records_in_chunk} records")
                 
                 # Prepare data for insertion
-                data_to_insert = []
-                for _, row in chunk.iterrows():
-                    data_to_insert.append((
-                        row['order_id'],
-                        row['order_date'],
-                        row['customer_id'],
-                        row['product_id'],
-                        row['quantity'],
-                        row['unit_price'],
-                        row['total_amount'],
-                        file_name
-                    ))
+                with timed('transform'):
+                    data_to_insert = []
+                    for _, row in chunk.iterrows():
+                        data_to_insert.append((
+                            row['order_id'],
+                            row['order_date'],
+                            row['customer_id'],
+                            row['product_id'],
+                            row['quantity'],
+                            row['unit_price'],
+                            row['total_amount'],
+                            file_name
+                        ))
                 
                 # Insert into staging
                 insert_query = """
@@ -103,8 +98,11 @@ class DataExtractor:
                     VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
                 """
                 
-                cursor.executemany(insert_query, data_to_insert)
-                connection.commit()
+                executemany_with_retry(
+                    connection, cursor, insert_query, data_to_insert,
+                    description=f"staging_sales chunk {chunk_count}"
+                )
+                record(rows=records_in_chunk, batches=1)
                 
                 logging.info(f"Chunk {chunk_count} loaded: {records_in_chunk} records")
             
@@ -137,8 +135,9 @@ class DataExtractor:
             raise
             
         finally:
-            if 'connection' in locals() and connection.is_connected():
-                cursor.close()
+            if 'connection' in locals():
+                if connection.is_connected():
+                    cursor.close()
                 connection.close()
     
     def extract_customers_data(self, file_path):
@@ -146,7 +145,7 @@ class DataExtractor:
         try:
             logging.info(f"Extracting customers from {file_path}")
             
-            df = pd.read_csv(file_path)
+            total_records = 0
             file_name = os.path.basename(file_path)
             
             connection = self.create_staging_connection()
@@ -175,22 +174,8 @@ class DataExtractor:
             process_id = cursor.lastrowid
             connection.commit()
             
-            # Prepare data
-            data_to_insert = []
-            for _, row in df.iterrows():
-                data_to_insert.append((
-                    row['customer_id'],
-                    row['customer_name'],
-                    row['email'],
-                    row['phone'],
-                    row['address'],
-                    row['city'],
-                    row['country'],
-                    row['registration_date'],
-                    file_name
-                ))
-            
-            # Insert into staging
+            record(bytes_read=os.path.getsize(file_path))
+            
             insert_query = """
                 INSERT INTO staging_customers 
                 (customer_id, customer_name, email, phone, address, 
@@ -198,8 +183,32 @@ class DataExtractor:
                 VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
             """
             
-            cursor.executemany(insert_query, data_to_insert)
-            connection.commit()
+            # Read in chunks sized to the memory budget instead of the whole file
+            chunk_rows = csv_chunk_rows(file_path, maximum=self.batch_size)
+            for chunk_count, chunk in enumerate(
+                timed_iter(pd.read_csv(file_path, chunksize=chunk_rows), 'parse'), start=1
+            ):
+                with timed('transform'):
+                    data_to_insert = []
+                    for _, row in chunk.iterrows():
+                        data_to_insert.append((
+                            row['customer_id'],
+                            row['customer_name'],
+                            row['email'],
+                            row['phone'],
+                            row['address'],
+                            row['city'],
+                            row['country'],
+                            row['registration_date'],
+                            file_name
+                        ))
+                
+                executemany_with_retry(
+                    connection, cursor, insert_query, data_to_insert,
+                    description=f"staging_customers chunk {chunk_count}"
+                )
+                total_records += len(chunk)
+                record(rows=len(chunk), batches=1)
             
             # Update metadata
             end_time = datetime.now()
@@ -209,18 +218,19 @@ class DataExtractor:
                     records_extracted = %s
                 WHERE process_id = %s
             """
-            cursor.execute(update_query, (end_time, len(df), process_id))
+            cursor.execute(update_query, (end_time, total_records, process_id))
             connection.commit()
             
-            logging.info(f"Customers extracted: {len(df)} records")
+            logging.info(f"Customers extracted: {total_records} records")
             
         except Exception as e:
             logging.error(f"Error extracting customers: {e}")
             raise
             
         finally:
-            if 'connection' in locals() and connection.is_connected():
-                cursor.close()
+            if 'connection' in locals():
+                if connection.is_connected():
+                    cursor.close()
                 connection.close()
     
     def extract_products_data(self, file_path):
@@ -228,7 +238,7 @@ class DataExtractor:
         try:
             logging.info(f"Extracting products from {file_path}")
             
-            df = pd.read_csv(file_path)
+            total_records = 0
             file_name = os.path.basename(file_path)
             
             connection = self.create_staging_connection()
@@ -257,21 +267,8 @@ class DataExtractor:
             process_id = cursor.lastrowid
             connection.commit()
             
-            # Prepare data
-            data_to_insert = []
-            for _, row in df.iterrows():
-                data_to_insert.append((
-                    row['product_id'],
-                    row['product_name'],
-                    row['category'],
-                    row['subcategory'],
-                    row['supplier'],
-                    row['cost_price'],
-                    row['msrp'],
-                    file_name
-                ))
-            
-            # Insert into staging
+            record(bytes_read=os.path.getsize(file_path))
+            
             insert_query = """
                 INSERT INTO staging_products 
                 (product_id, product_name, category, subcategory, 
@@ -279,8 +276,31 @@ class DataExtractor:
                 VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
             """
             
-            cursor.executemany(insert_query, data_to_insert)
-            connection.commit()
+            # Read in chunks sized to the memory budget instead of the whole file
+            chunk_rows = csv_chunk_rows(file_path, maximum=self.batch_size)
+            for chunk_count, chunk in enumerate(
+                timed_iter(pd.read_csv(file_path, chunksize=chunk_rows), 'parse'), start=1
+            ):
+                with timed('transform'):
+                    data_to_insert = []
+                    for _, row in chunk.iterrows():
+                        data_to_insert.append((
+                            row['product_id'],
+                            row['product_name'],
+                            row['category'],
+                            row['subcategory'],
+                            row['supplier'],
+                            row['cost_price'],
+                            row['msrp'],
+                            file_name
+                        ))
+                
+                executemany_with_retry(
+                    connection, cursor, insert_query, data_to_insert,
+                    description=f"staging_products chunk {chunk_count}"
+                )
+                total_records += len(chunk)
+                record(rows=len(chunk), batches=1)
             
             # Update metadata
             end_time = datetime.now()
@@ -290,18 +310,19 @@ class DataExtractor:
                     records_extracted = %s
                 WHERE process_id = %s
             """
-            cursor.execute(update_query, (end_time, len(df), process_id))
+            cursor.execute(update_query, (end_time, total_records, process_id))
             connection.commit()
             
-            logging.info(f"Products extracted: {len(df)} records")
+            logging.info(f"Products extracted: {total_records} records")
             
         except Exception as e:
             logging.error(f"Error extracting products: {e}")
             raise
             
         finally:
-            if 'connection' in locals() and connection.is_connected():
-                cursor.close()
+            if 'connection' in locals():
+                if connection.is_connected():
+                    cursor.close()
                 connection.close()
 
 if __name__ == "__main__":
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+Index advisor and query-plan regression check
+Runs EXPLAIN FORMAT=JSON for the queries the pipeline and the dashboard run
+most, flags full scans, filesorts and temporary tables, suggests composite
+(covering where possible) indexes for the scanned tables and lists indexes
+made redundant by a longer one. Plans can be saved as a baseline and
+checked against it; the benchmark stores them with every result.
+
+    python scripts/index_advisor.py report
+    python scripts/index_advisor.py baseline
+    python scripts/index_advisor.py check --baseline benchmarks/plan_baseline.json
+"""
+import sys
+import os
+
+# Thêm thư mục gốc vào đường dẫn Python
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+import logging
+import re
+from config.etl_config import ETLConfig
+from connection_manager import ConnectionManager
+
+DEFAULT_BASELINE = 'benchmarks/plan_baseline.json'
+
+# Scans estimated below this many rows (small dimensions, empty staging) are not flagged
+FULL_SCAN_MIN_ROWS = 1000
+# Longer suggested indexes are not made covering
+MAX_INDEX_COLUMNS = 5
+
+# Join types from best to worst; a query regresses when a table moves down this list
+ACCESS_RANK = {
+    'system': 0, 'const': 0, 'eq_ref': 1, 'ref': 2, 'fulltext': 2, 'ref_or_null': 3,
+    'unique_subquery': 3, 'index_subquery': 3, 'index_merge': 4, 'range': 5, 'index': 6, 'ALL': 7,
+}
+
+EQUALITY = re.compile(
+    r"(?:`?(\w+)`?\.)?`?(\w+)`?\s*(?:=|<=>|\s+is\s+null\b|\s+in\s*\()", re.IGNORECASE
+)
+RANGE = re.compile(
+    r"(?:`?(\w+)`?\.)?`?(\w+)`?\s*(?:<=|>=|<(?!=|>)|>|\s+between\s)", re.IGNORECASE
+)
+# Right-hand side of a join equality, e.g. `fs`.`product_key` = `p`.`product_key`
+JOINED = re.compile(r"=\s*`?(\w+)`?\.`?(\w+)`?")
+TABLE_REFERENCE = re.compile(r"\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?", re.IGNORECASE)
+SQL_KEYWORDS = {'where', 'join', 'on', 'group', 'order', 'left', 'inner', 'union', 'limit', 'using'}
+
+
+def workload(category='ELECTRONICS'):
+    """(name, database, query, params) for every registered query
+
+    Parameter values are representative only: equality lookups plan the
+    same for any key, and the dashboard is checked both unfiltered and
+    with a date range and category, as the sidebar sends them.
+    """
+    # Imported here so comparing saved plans needs neither the loaders nor their log file
+    from dashboard_data import DashboardFilters, build_queries, sales_detail_query
+    from date_dimension import STAGING_DATE_RANGE_QUERY
+    from load_sales import (
+        AGGREGATE_SELECT, FACT_BATCH_SELECT, FACT_MONTHS_QUERY, customer_versions, product_versions,
+    )
+
+    queries = [
+        ('load.fact_batch', 'staging', FACT_BATCH_SELECT.format(date_filter='', limit=5000), (0,)),
+        ('load.fact_months', 'staging', FACT_MONTHS_QUERY, ()),
+        ('date_dimension.staging_range', 'staging', STAGING_DATE_RANGE_QUERY, ()),
+        ('load.customer_versions', 'dw') + customer_versions().query(),
+        ('load.product_versions', 'dw') + product_versions().query(),
+        ('load.aggregates', 'dw', AGGREGATE_SELECT, ()),
+    ]
+    filter_sets = (
+        ('all', DashboardFilters()),
+        ('filtered', DashboardFilters(ETLConfig.START_DATE, ETLConfig.END_DATE, category)),
+    )
+    for label, filters in filter_sets:
+        for view, (query, params) in build_queries(filters).items():
+            queries.append((f"dashboard.{view}.{label}", 'dw', query, tuple(params)))
+        query, params = sales_detail_query(filters)
+        queries.append((f"dashboard.export.{label}", 'dw', query, tuple(params)))
+    return queries
+
+
+def table_aliases(query):
+    """{alias or name: table} for the tables a query reads"""
+    aliases = {}
+    for table, alias in TABLE_REFERENCE.findall(query):
+        aliases[table] = table
+        if alias and alias.lower() not in SQL_KEYWORDS:
+            aliases[alias] = table
+    return aliases
+
+
+def summarize_plan(plan):
+    """Tables with their access, plus filesort/temporary flags, from a MySQL or MariaDB JSON plan"""
+    summary = {'tables': [], 'filesort': False, 'temporary': False}
+
+    def visit(node):
+        if isinstance(node, list):
+            for item in node:
+                visit(item)
+            return
+        if not isinstance(node, dict):
+            return
+        # MySQL sets using_* flags; MariaDB nests filesort/temporary_table nodes
+        if node.get('using_filesort') or 'filesort' in node:
+            summary['filesort'] = True
+        if node.get('using_temporary_table') or 'temporary_table' in node:
+            summary['temporary'] = True
+        table = node.get('table')
+        if isinstance(table, dict) and 'access_type' in table:
+            summary['tables'].append({
+                'table': table.get('table_name'),
+                'access_type': table['access_type'],
+                'key': table.get('key'),
+                'rows': table.get('rows_examined_per_scan', table.get('rows')) or 0,
+                'used_columns': table.get('used_columns', []),
+                'condition': table.get('attached_condition'),
+            })
+        for value in node.values():
+            visit(value)
+
+    visit(plan)
+    return summary
+
+
+def condition_columns(condition, alias):
+    """(equality columns, range columns) of `alias` in an attached condition, in order of appearance"""
+    equality, ranges = [], []
+    if not condition:
+        return equality, ranges
+    matches = [(m.start(), m.group(1), m.group(2), equality) for m in EQUALITY.finditer(condition)]
+    matches += [(m.start(), m.group(1), m.group(2), ranges) for m in RANGE.finditer(condition)]
+    matches += [(m.start(), m.group(1), m.group(2), equality) for m in JOINED.finditer(condition)]
+    for _, qualifier, column, target in sorted(matches, key=lambda match: match[0]):
+        if qualifier in (None, alias) and column not in equality and column not in ranges:
+            target.append(column)
+    return equality, ranges
+
+
+def suggest_index(alias, scan):
+    """Columns for an index serving a scanned table, or None without usable predicates
+
+    Equality columns come first, then one range column; the other columns
+    the query reads are appended when the index stays short enough to cover it.
+    """
+    equality, ranges = condition_columns(scan['condition'], alias)
+    columns = equality + ranges[:1]
+    if not columns:
+        return None
+    rest = [column for column in scan['used_columns'] if column not in columns]
+    if rest and len(columns) + len(rest) <= MAX_INDEX_COLUMNS:
+        columns += rest
+    return columns
+
+
+def plan_signature(summary):
+    """The parts of a plan compared against the baseline; row estimates vary with the data"""
+    return {
+        'tables': [[scan['table'], scan['access_type'], scan['key']] for scan in summary['tables']],
+        'filesort': summary['filesort'],
+        'temporary': summary['temporary'],
+    }
+
+
+def compare_plans(base, head):
+    """(query, change) for every plan in `head` that is worse than in `base`"""
+    regressions = []
+    for name, head_plan in head.items():
+        base_plan = base.get(name)
+        if base_plan is None:
+            continue
+        base_access = {table: access for table, access, _ in base_plan['tables']}
+        for table, access, key in head_plan['tables']:
+            before = base_access.get(table)
+            if before and ACCESS_RANK.get(access, 0) > ACCESS_RANK.get(before, 0):
+                regressions.append((name, f"{table}: {before} -> {access} (key {key})"))
+        for flag in ('filesort', 'temporary'):
+            if head_plan[flag] and not base_plan[flag]:
+                regressions.append((name, f"now uses a {flag}"))
+    return regressions
+
+
+def redundant_indexes(indexes):
+    """(table, index, covering index) for indexes whose columns lead a longer or equal index
+
+    A unique index is only redundant next to another unique index on the
+    same columns, since it also enforces uniqueness.
+    """
+    redundant = []
+    for table, table_indexes in indexes.items():
+        for name, (columns, unique) in table_indexes.items():
+            if name == 'PRIMARY':
+                continue
+            for other, (other_columns, other_unique) in table_indexes.items():
+                if other == name or other_columns[:len(columns)] != columns:
+                    continue
+                if unique and not (other_unique and other_columns == columns):
+                    continue
+                # Of two identical indexes, report only one
+                if other_columns == columns and unique == other_unique and other > name and other != 'PRIMARY':
+                    continue
+                redundant.append((table, name, other))
+                break
+    return redundant
+
+
+class IndexAdvisor:
+    """Explains the registered workload and reports on its plans and indexes"""
+
+    def __init__(self, connection_manager=None, queries=None):
+        self.connections = connection_manager or ConnectionManager.shared()
+        self.queries = queries if queries is not None else workload()
+
+    def load_indexes(self, cursor):
+        """{table: {index: (columns, unique)}} for the current schema"""
+        cursor.execute("""
+            SELECT TABLE_NAME, INDEX_NAME, COLUMN_NAME, NON_UNIQUE
+            FROM information_schema.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE()
+            ORDER BY TABLE_NAME, INDEX_NAME, SEQ_IN_INDEX
+        """)
+        indexes = {}
+        for table, name, column, non_unique in cursor.fetchall():
+            columns, _ = indexes.setdefault(table, {}).setdefault(name, ([], not non_unique))
+            columns.append(column)
+        return indexes
+
+    def explain(self, cursor, query, params=()):
+        cursor.execute(f"EXPLAIN FORMAT=JSON {query}", params or None)
+        return json.loads(cursor.fetchone()[0])
+
+    def analyze(self):
+        """Explain every registered query; returns one result dict per query, plus the schemas' indexes"""
+        results = []
+        indexes = {}
+        for database in ('staging', 'dw'):
+            queries = [query for query in self.queries if query[1] == database]
+            with self.connections.connection(database) as connection:
+                cursor = connection.cursor()
+                try:
+                    indexes[database] = self.load_indexes(cursor)
+                    for name, _, query, params in queries:
+                        summary = summarize_plan(self.explain(cursor, query, params))
+                        results.append(self.review(name, database, query, summary, indexes[database]))
+                finally:
+                    cursor.close()
+        return results, indexes
+
+    def review(self, name, database, query, summary, indexes):
+        """Findings and index suggestions for one explained query"""
+        aliases = table_aliases(query)
+        findings = []
+        suggestions = []
+        for scan in summary['tables']:
+            alias = scan['table']
+            if alias.startswith('<') or scan['access_type'] not in ('ALL', 'index'):
+                continue
+            if scan['rows'] < FULL_SCAN_MIN_ROWS:
+                continue
+            kind = 'full scan' if scan['access_type'] == 'ALL' else 'full index scan'
+            findings.append(f"{kind} of {alias} (~{scan['rows']} rows)")
+
+            table = aliases.get(alias, alias)
+            columns = suggest_index(alias, scan)
+            existing = indexes.get(table, {}).values()
+            if columns and not any(index[:len(columns)] == columns for index, _ in existing):
+                suggestions.append(
+                    f"CREATE INDEX idx_{table}_{'_'.join(columns)} ON {table}({', '.join(columns)});"
+                )
+        if summary['filesort']:
+            findings.append('filesort')
+        if summary['temporary']:
+            findings.append('temporary table')
+        return {
+            'name': name,
+            'database': database,
+            'findings': findings,
+            'suggestions': suggestions,
+            'plan': plan_signature(summary),
+        }
+
+    def plans(self):
+        """{query name: plan signature} for the whole workload"""
+        results, _ = self.analyze()
+        return {result['name']: result['plan'] for result in results}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Review the query plans of the registered workload")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('report', help="flag scans, filesorts and temporary tables; suggest indexes")
+    baseline_parser = commands.add_parser('baseline', help="save the current plans")
+    baseline_parser.add_argument('--output', default=DEFAULT_BASELINE)
+    check_parser = commands.add_parser('check', help="exit 1 if a plan is worse than the baseline")
+    check_parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        filename=ETLConfig.LOG_FILE,
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    advisor = IndexAdvisor()
+
+    if args.command == 'report':
+        results, indexes = advisor.analyze()
+        for result in results:
+            status = '; '.join(result['findings']) or 'ok'
+            print(f"{result['name']:<40} {status}")
+            for suggestion in result['suggestions']:
+                print(f"    suggest: {suggestion}")
+        for database, schema_indexes in indexes.items():
+            for table, name, covered_by in redundant_indexes(schema_indexes):
+                print(f"redundant ({database}): {table}.{name} is covered by {covered_by}")
+    elif args.command == 'baseline':
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as baseline_file:
+            json.dump(advisor.plans(), baseline_file, indent=2, sort_keys=True)
+        print(f"Plans written to {args.output}")
+    else:
+        with open(args.baseline, encoding='utf-8') as baseline_file:
+            baseline = json.load(baseline_file)
+        found = compare_plans(baseline, advisor.plans())
+        for name, change in found:
+            print(f"PLAN REGRESSION {name}: {change}")
+        sys.exit(1 if found else 0)
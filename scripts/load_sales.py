@@ -1,8 +1,7 @@
-import mysql.connector
 from mysql.connector import Error
+import calendar
 import logging
 from datetime import datetime
-from config.database_config import DatabaseConfig
 from config.etl_config import ETLConfig
 import sys
 import os
@@ -10,40 +9,175 @@ import os
 # Thêm thư mục gốc vào đường dẫn Python
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from connection_manager import ConnectionManager
+from retry import executemany_with_retry, run_with_retry
+from etl_metrics import record, timed
+from memory_budget import batch_rows, STAGING_ROW_BYTES
+from partition_manager import PartitionManager
+from bulk_load import BulkLoad
+from asof_resolver import AsOfKeyResolver
+from contextlib import nullcontext
+
 logging.basicConfig(
     filename=ETLConfig.LOG_FILE,
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
+# Daily aggregates at three grains, told apart by which keys are NULL; also
+# used by the OLAP mirror to rebuild its copy of agg_sales_daily
+AGGREGATE_SELECT = """
+    SELECT 
+        fs.date_key,
+        NULL as customer_key,
+        NULL as product_key,
+        SUM(fs.quantity) as total_quantity,
+        SUM(fs.total_amount) as total_amount,
+        AVG(fs.unit_price) as avg_unit_price,
+        COUNT(DISTINCT fs.order_key) as order_count,
+        COUNT(DISTINCT fs.customer_key) as unique_customers,
+        SUM(fs.profit_amount) as total_profit,
+        COUNT(*) as line_count,
+        SUM(fs.profit_margin) as sum_profit_margin
+    FROM fact_sales fs
+    GROUP BY fs.date_key
+    
+    UNION ALL
+    
+    SELECT 
+        fs.date_key,
+        fs.customer_key,
+        NULL as product_key,
+        SUM(fs.quantity) as total_quantity,
+        SUM(fs.total_amount) as total_amount,
+        AVG(fs.unit_price) as avg_unit_price,
+        COUNT(DISTINCT fs.order_key) as order_count,
+        1 as unique_customers,
+        SUM(fs.profit_amount) as total_profit,
+        COUNT(*) as line_count,
+        SUM(fs.profit_margin) as sum_profit_margin
+    FROM fact_sales fs
+    GROUP BY fs.date_key, fs.customer_key
+    
+    UNION ALL
+    
+    SELECT 
+        fs.date_key,
+        NULL as customer_key,
+        fs.product_key,
+        SUM(fs.quantity) as total_quantity,
+        SUM(fs.total_amount) as total_amount,
+        AVG(fs.unit_price) as avg_unit_price,
+        COUNT(DISTINCT fs.order_key) as order_count,
+        COUNT(DISTINCT fs.customer_key) as unique_customers,
+        SUM(fs.profit_amount) as total_profit,
+        COUNT(*) as line_count,
+        SUM(fs.profit_margin) as sum_profit_margin
+    FROM fact_sales fs
+    GROUP BY fs.date_key, fs.product_key
+"""
+
+# Staging sales ready for the fact load, in staging_id order; {date_filter} narrows a partition
+FACT_BATCH_SELECT = """
+    SELECT 
+        s.staging_id,
+        s.order_id,
+        s.order_date,
+        s.customer_id,
+        s.product_id,
+        s.quantity,
+        s.unit_price,
+        s.total_amount
+    FROM staging_sales s
+    WHERE s.staging_id > %s
+    AND s.processed_flag = TRUE
+    {date_filter}
+    ORDER BY s.staging_id
+    LIMIT {limit}
+"""
+
+# Validated staging sales a reload of order_date %s..%s would load again
+STAGED_RANGE_COUNT = """
+    SELECT COUNT(*)
+    FROM staging_sales
+    WHERE processed_flag = TRUE
+    AND order_date BETWEEN %s AND %s
+"""
+
+# Months of validated staging sales, one fact load partition each
+FACT_MONTHS_QUERY = """
+    SELECT DISTINCT YEAR(order_date), MONTH(order_date)
+    FROM staging_sales
+    WHERE processed_flag = TRUE
+    ORDER BY 1, 2
+"""
+
+
+def customer_versions():
+    """As-of index of dim_customer for the fact load's customer_key lookups"""
+    return AsOfKeyResolver('dim_customer', 'customer_id', ('customer_key',))
+
+
+def product_versions():
+    """As-of index of dim_product; the cost is read with the key and stored as unit_cost"""
+    return AsOfKeyResolver('dim_product', 'product_id', ('product_key', 'cost_price'))
+
+
 class DataLoader:
-    def __init__(self):
-        self.staging_config = DatabaseConfig()
-        self.dw_config = DatabaseConfig()
-        self.batch_size = 5000
+    def __init__(self, connection_manager=None):
+        self.connections = connection_manager or ConnectionManager.shared()
+        # Rows held in memory per fetch/insert batch, within the memory budget
+        self.batch_size = batch_rows(STAGING_ROW_BYTES, maximum=ETLConfig.LOAD_BATCH_SIZE)
+        self.partitions = PartitionManager(self.connections)
+        self.bulk_load = BulkLoad(self.connections)
+        # Dimension versions for the fact load, read once per load_fact_sales call
+        self.customer_versions = customer_versions()
+        self.product_versions = product_versions()
         
     def create_connection(self, database='staging'):
-        """Create database connection"""
-        try:
-            if database == 'staging':
-                config = self.staging_config
-                db_name = config.STAGING_DATABASE
-            else:
-                config = self.dw_config
-                db_name = config.DW_DATABASE
-            
-            connection = mysql.connector.connect(
-                host=config.STAGING_HOST,
-                port=config.STAGING_PORT,
-                user=config.STAGING_USER,
-                password=config.STAGING_PASSWORD,
-                database=db_name,
-                allow_local_infile=True  # Allow LOAD DATA LOCAL INFILE
+        """Borrow a pooled connection to the staging or DW database"""
+        return self.connections.get_connection(database)
+    
+    def upsert_streamed(self, staging_cursor, dw_conn, dw_cursor, insert_query, description,
+                        fill_query=None, inferred=()):
+        """Stream the staging result set into `insert_query` one batch at a time
+        
+        `staging_cursor` must be unbuffered, so the server sends rows as they
+        are fetched and at most one batch is held in memory. Rows whose
+        business key (first column) is in `inferred` fill in that
+        placeholder row through `fill_query` instead of adding a version.
+        Returns the affected row count.
+        """
+        loaded_count = 0
+        batch_number = 0
+        while True:
+            rows = staging_cursor.fetchmany(self.batch_size)
+            if not rows:
+                break
+            batch_number += 1
+            record(rows=len(rows), batches=1)
+            if inferred:
+                # fill_query takes the business key last, in its WHERE clause
+                fills = [row[1:] + row[:1] for row in rows if row[0] in inferred]
+                rows = [row for row in rows if row[0] not in inferred]
+                if fills:
+                    loaded_count += executemany_with_retry(
+                        dw_conn, dw_cursor, fill_query, fills,
+                        description=f"{description} batch {batch_number} inferred members"
+                    )
+            if not rows:
+                continue
+            # The upsert is idempotent, so a transient failure can replay the batch
+            loaded_count += executemany_with_retry(
+                dw_conn, dw_cursor, insert_query, rows,
+                description=f"{description} batch {batch_number}"
             )
-            return connection
-        except Error as e:
-            logging.error(f"Error connecting to {database} database: {e}")
-            raise
+        return loaded_count
+    
+    def inferred_members(self, dw_cursor, dimension, business_key):
+        """Business keys of the placeholder rows in `dimension` not reconciled yet"""
+        dw_cursor.execute(f"SELECT {business_key} FROM {dimension} WHERE is_inferred = TRUE")
+        return {row[0] for row in dw_cursor.fetchall()}
     
     def load_dim_customers(self):
         """Load data into dim_customer"""
@@ -52,7 +186,8 @@ class DataLoader:
             
             staging_conn = self.create_connection('staging')
             dw_conn = self.create_connection('dw')
-            staging_cursor = staging_conn.cursor()
+            # Unbuffered: rows are streamed from the server instead of fetched all at once
+            staging_cursor = staging_conn.cursor(buffered=False)
             dw_cursor = dw_conn.cursor()
             
             # Start metadata tracking
@@ -84,12 +219,8 @@ class DataLoader:
                     END as customer_segment
                 FROM staging_customers 
                 WHERE processed_flag = TRUE
-                AND error_message IS NULL
             """
             
-            staging_cursor.execute(select_query)
-            customers = staging_cursor.fetchall()
-            
             # Insert into dimension with SCD Type 2 logic
             insert_query = """
                 INSERT INTO dim_customer 
@@ -103,8 +234,12 @@ class DataLoader:
                     address = VALUES(address),
                     city = VALUES(city),
                     country = VALUES(country),
+                    registration_date = VALUES(registration_date),
                     customer_segment = VALUES(customer_segment),
+                    -- A placeholder inferred by a concurrent fact load is
+                    -- filled in, never closed as an SCD version
                     valid_to = CASE 
+                        WHEN is_inferred = TRUE THEN valid_to
                         WHEN customer_name != VALUES(customer_name) 
                         OR email != VALUES(email)
                         OR phone != VALUES(phone)
@@ -115,6 +250,7 @@ class DataLoader:
                         ELSE valid_to
                     END,
                     is_current = CASE 
+                        WHEN is_inferred = TRUE THEN TRUE
                         WHEN customer_name != VALUES(customer_name) 
                         OR email != VALUES(email)
                         OR phone != VALUES(phone)
@@ -126,10 +262,28 @@ class DataLoader:
                     END
             """
             
-            dw_cursor.executemany(insert_query, customers)
-            dw_conn.commit()
+            # Placeholders created by the fact load are completed in place,
+            # so their facts keep pointing at the filled-in row
+            fill_query = """
+                UPDATE dim_customer 
+                SET customer_name = %s,
+                    email = %s,
+                    phone = %s,
+                    address = %s,
+                    city = %s,
+                    country = %s,
+                    registration_date = %s,
+                    customer_segment = %s
+                WHERE customer_id = %s
+                AND is_inferred = TRUE
+            """
+            inferred = self.inferred_members(dw_cursor, 'dim_customer', 'customer_id')
             
-            loaded_count = dw_cursor.rowcount
+            staging_cursor.execute(select_query)
+            loaded_count = self.upsert_streamed(
+                staging_cursor, dw_conn, dw_cursor, insert_query, "dim_customer upsert",
+                fill_query=fill_query, inferred=inferred
+            )
             logging.info(f"Loaded {loaded_count} customers")
             
             # Update metadata
@@ -145,14 +299,18 @@ class DataLoader:
             
         except Exception as e:
             logging.error(f"Error loading dim_customers: {e}")
+            if 'process_id' in locals() and dw_conn.is_connected():
+                self.mark_failed(dw_cursor, dw_conn, process_id, e)
             raise
             
         finally:
-            if 'staging_conn' in locals() and staging_conn.is_connected():
-                staging_cursor.close()
+            if 'staging_conn' in locals():
+                if staging_conn.is_connected():
+                    staging_cursor.close()
                 staging_conn.close()
-            if 'dw_conn' in locals() and dw_conn.is_connected():
-                dw_cursor.close()
+            if 'dw_conn' in locals():
+                if dw_conn.is_connected():
+                    dw_cursor.close()
                 dw_conn.close()
     
     def load_dim_products(self):
@@ -162,7 +320,8 @@ class DataLoader:
             
             staging_conn = self.create_connection('staging')
             dw_conn = self.create_connection('dw')
-            staging_cursor = staging_conn.cursor()
+            # Unbuffered: rows are streamed from the server instead of fetched all at once
+            staging_cursor = staging_conn.cursor(buffered=False)
             dw_cursor = dw_conn.cursor()
             
             # Start metadata tracking
@@ -189,12 +348,8 @@ class DataLoader:
                     ROUND(((msrp - cost_price) / msrp) * 100, 2) as profit_margin
                 FROM staging_products 
                 WHERE processed_flag = TRUE
-                AND error_message IS NULL
             """
             
-            staging_cursor.execute(select_query)
-            products = staging_cursor.fetchall()
-            
             # Insert into dimension with SCD Type 2 logic
             insert_query = """
                 INSERT INTO dim_product 
@@ -209,7 +364,10 @@ class DataLoader:
                     cost_price = VALUES(cost_price),
                     msrp = VALUES(msrp),
                     profit_margin = VALUES(profit_margin),
+                    -- A placeholder inferred by a concurrent fact load is
+                    -- filled in, never closed as an SCD version
                     valid_to = CASE 
+                        WHEN is_inferred = TRUE THEN valid_to
                         WHEN product_name != VALUES(product_name) 
                         OR category != VALUES(category)
                         OR subcategory != VALUES(subcategory)
@@ -220,6 +378,7 @@ class DataLoader:
                         ELSE valid_to
                     END,
                     is_current = CASE 
+                        WHEN is_inferred = TRUE THEN TRUE
                         WHEN product_name != VALUES(product_name) 
                         OR category != VALUES(category)
                         OR subcategory != VALUES(subcategory)
@@ -231,10 +390,27 @@ class DataLoader:
                     END
             """
             
-            dw_cursor.executemany(insert_query, products)
-            dw_conn.commit()
+            # Placeholders created by the fact load are completed in place,
+            # so their facts keep pointing at the filled-in row
+            fill_query = """
+                UPDATE dim_product 
+                SET product_name = %s,
+                    category = %s,
+                    subcategory = %s,
+                    supplier = %s,
+                    cost_price = %s,
+                    msrp = %s,
+                    profit_margin = %s
+                WHERE product_id = %s
+                AND is_inferred = TRUE
+            """
+            inferred = self.inferred_members(dw_cursor, 'dim_product', 'product_id')
             
-            loaded_count = dw_cursor.rowcount
+            staging_cursor.execute(select_query)
+            loaded_count = self.upsert_streamed(
+                staging_cursor, dw_conn, dw_cursor, insert_query, "dim_product upsert",
+                fill_query=fill_query, inferred=inferred
+            )
             logging.info(f"Loaded {loaded_count} products")
             
             # Update metadata
@@ -250,137 +426,364 @@ class DataLoader:
             
         except Exception as e:
             logging.error(f"Error loading dim_products: {e}")
+            if 'process_id' in locals() and dw_conn.is_connected():
+                self.mark_failed(dw_cursor, dw_conn, process_id, e)
             raise
             
         finally:
-            if 'staging_conn' in locals() and staging_conn.is_connected():
-                staging_cursor.close()
+            if 'staging_conn' in locals():
+                if staging_conn.is_connected():
+                    staging_cursor.close()
                 staging_conn.close()
-            if 'dw_conn' in locals() and dw_conn.is_connected():
-                dw_cursor.close()
+            if 'dw_conn' in locals():
+                if dw_conn.is_connected():
+                    dw_cursor.close()
                 dw_conn.close()
     
-    def load_fact_sales(self):
-        """Load data into fact_sales"""
+    def list_fact_partitions(self):
+        """Return the month ranges of validated staging sales, one per fact load partition"""
         try:
-            logging.info("Loading fact_sales")
-            
             staging_conn = self.create_connection('staging')
-            dw_conn = self.create_connection('dw')
             staging_cursor = staging_conn.cursor()
-            dw_cursor = dw_conn.cursor()
             
-            # Start metadata tracking
-            start_time = datetime.now()
-            metadata_query = """
-                INSERT INTO etl_metadata 
-                (process_name, start_time, status)
-                VALUES (%s, %s, %s)
-            """
-            dw_cursor.execute(metadata_query, ('LOAD_FACT_SALES', start_time, 'RUNNING'))
-            process_id = dw_cursor.lastrowid
-            dw_conn.commit()
+            staging_cursor.execute(FACT_MONTHS_QUERY)
             
-            # Get valid sales records in batches
-            offset = 0
-            total_loaded = 0
-            
-            while True:
-                select_query = f"""
-                    SELECT 
-                        s.order_id,
-                        s.order_date,
-                        s.customer_id,
-                        s.product_id,
-                        s.quantity,
-                        s.unit_price,
-                        s.total_amount,
-                        p.cost_price
-                    FROM staging_sales s
-                    JOIN staging_products p ON s.product_id = p.product_id
-                    WHERE s.processed_flag = TRUE
-                    AND s.error_message IS NULL
-                    AND p.processed_flag = TRUE
-                    AND p.error_message IS NULL
-                    ORDER BY s.order_date
-                    LIMIT {self.batch_size} OFFSET {offset}
-                """
-                
-                staging_cursor.execute(select_query)
-                sales_batch = staging_cursor.fetchall()
+            partitions = []
+            for year, month in staging_cursor.fetchall():
+                last_day = calendar.monthrange(year, month)[1]
+                partitions.append({
+                    'date_from': f"{year:04d}-{month:02d}-01",
+                    'date_to': f"{year:04d}-{month:02d}-{last_day:02d}"
+                })
+            
+            logging.info(f"Found {len(partitions)} fact_sales partitions to load")
+            return partitions
+            
+        except Exception as e:
+            logging.error(f"Error listing fact_sales partitions: {e}")
+            raise
+            
+        finally:
+            if 'staging_conn' in locals():
+                if staging_conn.is_connected():
+                    staging_cursor.close()
+                staging_conn.close()
+    
+    def mark_failed(self, cursor, connection, process_id, error):
+        """Record a failed process in etl_metadata so it is not left RUNNING"""
+        try:
+            connection.rollback()
+            error_query = """
+                UPDATE etl_metadata 
+                SET end_time = %s, status = 'FAILED', 
+                    error_message = %s
+                WHERE process_id = %s
+            """
+            cursor.execute(error_query, (datetime.now(), str(error), process_id))
+            connection.commit()
+        except Error as e:
+            logging.error(f"Could not mark process {process_id} as FAILED: {e}")
+    
+    def find_checkpoint(self, dw_cursor, partition_key):
+        """Return (process_id, last_staging_id, records_loaded) of an unfinished fact load, or None
+        
+        A failed load that a later load of the same partition completed
+        after is superseded and not resumed.
+        """
+        checkpoint_query = """
+            SELECT c.process_id, c.last_staging_id, c.records_loaded
+            FROM etl_checkpoint c
+            JOIN etl_metadata m ON m.process_id = c.process_id
+            WHERE c.process_name = 'LOAD_FACT_SALES'
+            AND c.partition_key = %s
+            AND m.status IN ('RUNNING', 'FAILED')
+            AND NOT EXISTS (
+                SELECT 1
+                FROM etl_checkpoint c2
+                JOIN etl_metadata m2 ON m2.process_id = c2.process_id
+                WHERE c2.process_name = 'LOAD_FACT_SALES'
+                AND c2.partition_key = c.partition_key
+                AND m2.status = 'COMPLETED'
+                AND m2.process_id > c.process_id
+            )
+            ORDER BY c.process_id DESC
+            LIMIT 1
+        """
+        dw_cursor.execute(checkpoint_query, (partition_key,))
+        return dw_cursor.fetchone()
+    
+    def resolve_order_keys(self, dw_cursor, order_ids):
+        """Return {order_id: order_key}, adding the orders dim_order does not know yet
+        
+        Runs inside the batch transaction, so new orders commit or roll
+        back together with their fact lines.
+        """
+        order_ids = list(order_ids)
+        dw_cursor.executemany(
+            "INSERT IGNORE INTO dim_order (order_id) VALUES (%s)",
+            [(order_id,) for order_id in order_ids]
+        )
+        placeholders = ', '.join(['%s'] * len(order_ids))
+        dw_cursor.execute(
+            f"SELECT order_id, order_key FROM dim_order WHERE order_id IN ({placeholders})",
+            order_ids
+        )
+        return dict(dw_cursor.fetchall())
+    
+    def infer_members(self, dw_conn, dw_cursor, resolver, business_ids):
+        """Add a placeholder row for each business id `resolver`'s dimension does not have
+        
+        Placeholders are current, dated today like a dimension load's rows
+        and flagged is_inferred; their other attributes stay NULL until the
+        dimension load fills them in. They are committed at once, before
+        the batch's facts, so the resolver never holds a key that rolling
+        back the batch could remove.
+        """
+        # Empty ids are rejected in transform, never inferred: INSERT IGNORE would store NULL as ''
+        unknown = sorted(
+            business_id for business_id in business_ids
+            if business_id and business_id.strip() and business_id not in resolver
+        )
+        if not unknown:
+            return
+        dw_cursor.executemany(f"""
+            INSERT IGNORE INTO {resolver.dimension} ({resolver.business_key}, valid_from, is_inferred)
+            VALUES (%s, CURDATE(), TRUE)
+        """, [(business_id,) for business_id in unknown])
+        inferred = dw_cursor.rowcount
+        dw_conn.commit()
+        # Also picks up rows a concurrent dimension load added since the resolver was built
+        resolver.load(dw_cursor, unknown)
+        if inferred:
+            logging.warning(f"Inferred {inferred} {resolver.dimension} members for facts loaded ahead of them")
+    
+    def load_fact_batch(self, staging_cursor, dw_cursor, dw_conn, process_id, partition_key,
+                        last_staging_id, total_loaded, date_filter='', date_params=(),
+                        unique_checks=True):
+        """Load the next batch after last_staging_id and commit it with its checkpoint
+
+        Returns (last_staging_id, records_loaded) for the batch, or None when
+        there is nothing left. Apart from inferred dimension members, nothing
+        is committed before the final commit, so a failed batch can be
+        rolled back and replayed as a whole.
+        """
+        checkpoint_query = """
+            INSERT INTO etl_checkpoint 
+            (process_id, process_name, partition_key, last_staging_id, records_loaded)
+            VALUES (%s, 'LOAD_FACT_SALES', %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                last_staging_id = VALUES(last_staging_id),
+                records_loaded = VALUES(records_loaded)
+        """
+        
+        select_query = FACT_BATCH_SELECT.format(date_filter=date_filter, limit=self.batch_size)
+        
+        staging_cursor.execute(select_query, (last_staging_id,) + date_params)
+        sales_batch = staging_cursor.fetchall()
+        
+        if not sales_batch:
+            return None
+        
+        # Late-arriving dimension rows get placeholders instead of losing the facts
+        self.infer_members(dw_conn, dw_cursor, self.customer_versions, {row[3] for row in sales_batch})
+        self.infer_members(dw_conn, dw_cursor, self.product_versions, {row[4] for row in sales_batch})
+        
+        # Prepare data for insertion; key lookups are in memory, with no query per row
+        with timed('transform'):
+            data_to_insert = []
+            for row in sales_batch:
+                staging_id, order_id, order_date, customer_id, product_id, quantity, unit_price, total_amount = row
                 
-                if not sales_batch:
-                    break
+                # Get dimension keys
+                date_key = int(order_date.strftime('%Y%m%d'))
                 
-                # Prepare data for insertion
-                data_to_insert = []
-                for row in sales_batch:
-                    order_id, order_date, customer_id, product_id, quantity, unit_price, total_amount, cost_price = row
-                    
-                    # Get dimension keys
-                    date_key = int(order_date.strftime('%Y%m%d'))
-                    
-                    # Get customer key (latest valid version)
-                    customer_key_query = """
-                        SELECT customer_key 
-                        FROM dim_customer 
-                        WHERE customer_id = %s 
-                        AND is_current = TRUE
-                        LIMIT 1
-                    """
-                    dw_cursor.execute(customer_key_query, (customer_id,))
-                    customer_result = dw_cursor.fetchone()
-                    customer_key = customer_result[0] if customer_result else None
-                    
-                    # Get product key (latest valid version)
-                    product_key_query = """
-                        SELECT product_key 
-                        FROM dim_product 
-                        WHERE product_id = %s 
-                        AND is_current = TRUE
-                        LIMIT 1
-                    """
-                    dw_cursor.execute(product_key_query, (product_id,))
-                    product_result = dw_cursor.fetchone()
-                    product_key = product_result[0] if product_result else None
-                    
-                    if customer_key and product_key:
-                        cost_amount = quantity * cost_price
-                        profit_amount = total_amount - cost_amount
-                        profit_margin = (profit_amount / total_amount * 100) if total_amount > 0 else 0
-                        
-                        data_to_insert.append((
-                            date_key,
-                            customer_key,
-                            product_key,
-                            order_id,
-                            quantity,
-                            unit_price,
-                            total_amount,
-                            round(cost_amount, 2),
-                            round(profit_amount, 2),
-                            round(profit_margin, 2),
-                            order_date
-                        ))
+                # Customer and product versions valid on the order date; staging_products
+                # may already be purged, so the cost comes from the dimension
+                customer = self.customer_versions.resolve(customer_id, order_date)
+                product = self.product_versions.resolve(product_id, order_date)
+                if customer is None or product is None:
+                    # Only rows with an empty id, validated before the reject rules caught them
+                    logging.warning(f"Skipping staging_id {staging_id}: missing customer_id or product_id")
+                    continue
+                customer_key, = customer
+                product_key, cost_price = product
                 
-                # Insert into fact table
-                if data_to_insert:
-                    insert_query = """
-                        INSERT IGNORE INTO fact_sales 
-                        (date_key, customer_key, product_key, order_id, 
-                         quantity, unit_price, total_amount, cost_amount, 
-                         profit_amount, profit_margin, order_timestamp)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    """
-                    
-                    dw_cursor.executemany(insert_query, data_to_insert)
-                    dw_conn.commit()
+                data_to_insert.append((
+                    date_key,
+                    customer_key,
+                    product_key,
+                    order_id,
+                    quantity,
+                    unit_price,
+                    total_amount,
+                    cost_price
+                ))
+        
+        last_staging_id = sales_batch[-1][0]
+        
+        # Insert into fact table
+        batch_loaded = 0
+        if data_to_insert:
+            # Swap each order_id for its dim_order key; cost, profit and
+            # margin are generated columns computed from unit_cost
+            order_keys = self.resolve_order_keys(dw_cursor, {row[3] for row in data_to_insert})
+            data_to_insert = [row[:3] + (order_keys[row[3]],) + row[4:] for row in data_to_insert]
+            
+            insert_query = """
+                INSERT IGNORE INTO fact_sales 
+                (date_key, customer_key, product_key, order_key, 
+                 quantity, unit_price, total_amount, unit_cost)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            """
+            
+            # fact_sales is partitioned and has no foreign keys: the keys were
+            # just resolved from the dimensions and order dates are validated
+            # into the dim_date range. Unique checks stay on because INSERT
+            # IGNORE dedupes on unique_order, except in bulk mode, where the
+            # key is dropped and duplicates are removed before it is rebuilt
+            with self.connections.bulk_session(dw_conn, unique_checks=unique_checks):
+                dw_cursor.executemany(insert_query, data_to_insert)
+            batch_loaded = dw_cursor.rowcount
+        
+        # The batch and its checkpoint commit in the same transaction
+        dw_cursor.execute(
+            checkpoint_query,
+            (process_id, partition_key, last_staging_id, total_loaded + batch_loaded)
+        )
+        dw_conn.commit()
+        
+        return last_staging_id, batch_loaded
+    
+    def prepare_fact_partitions(self):
+        """Create the monthly fact_sales partitions the load may write to
+
+        Also restores indexes left deferred by an interrupted bulk load,
+        since the regular load relies on unique_order to skip duplicates.
+        """
+        restored = self.bulk_load.rebuild_indexes()
+        if restored:
+            logging.warning(f"Restored fact_sales indexes left by an interrupted bulk load: {restored}")
+        self.partitions.ensure_partitions(date_from=ETLConfig.START_DATE, date_to=ETLConfig.END_DATE)
+    
+    def use_bulk_load(self):
+        """Whether the pipeline's fact load runs in bulk mode (ETLConfig.FACT_BULK_LOAD)
+
+        'auto' picks it for the initial load, while fact_sales is empty.
+        """
+        if ETLConfig.FACT_BULK_LOAD != 'auto':
+            return ETLConfig.FACT_BULK_LOAD == '1'
+        with self.connections.connection('dw') as connection:
+            cursor = connection.cursor()
+            try:
+                cursor.execute("SELECT 1 FROM fact_sales LIMIT 1")
+                return cursor.fetchone() is None
+            finally:
+                cursor.close()
+    
+    def load_fact_sales(self, date_from=None, date_to=None, resume=False, reload=False, bulk=False):
+        """Load data into fact_sales, optionally only orders dated date_from..date_to
+
+        Batches are read in staging_id order and each batch commits together
+        with its checkpoint, so with resume=True an interrupted load continues
+        after the last committed batch instead of starting over. With
+        reload=True the date range is emptied first, by partition, and
+        loaded again from the start; the reload is refused when staging_sales
+        no longer holds validated rows for the range. With bulk=True the
+        secondary indexes are dropped for the load and rebuilt and verified
+        afterwards; only one load may run at a time in that mode.
+        """
+        try:
+            if date_from and date_to:
+                logging.info(f"Loading fact_sales for {date_from} to {date_to}")
+            else:
+                logging.info("Loading fact_sales")
+            
+            staging_conn = self.create_connection('staging')
+            dw_conn = self.create_connection('dw')
+            staging_cursor = staging_conn.cursor()
+            dw_cursor = dw_conn.cursor()
+            
+            partition_key = f"{date_from}..{date_to}" if date_from and date_to else ''
+            checkpoint = self.find_checkpoint(dw_cursor, partition_key) if resume and not reload else None
+            
+            if reload:
+                if not (date_from and date_to):
+                    raise ValueError("A fact_sales reload needs date_from and date_to")
+                # Facts are only rebuilt from staging, so never empty a range it no longer holds
+                staging_cursor.execute(STAGED_RANGE_COUNT, (date_from, date_to))
+                staged, = staging_cursor.fetchone()
+                if not staged:
+                    raise ValueError(
+                        f"staging_sales holds no validated rows for {date_from}..{date_to}; "
+                        "refusing to clear fact_sales for a reload"
+                    )
+                logging.info(f"Reloading {staged} staged rows for {date_from}..{date_to}")
+                self.partitions.clear_range(date_from, date_to)
+            
+            if checkpoint:
+                # Resume the interrupted process from its last committed batch
+                process_id, last_staging_id, total_loaded = checkpoint
+                dw_cursor.execute("""
+                    UPDATE etl_metadata 
+                    SET status = 'RUNNING', end_time = NULL, error_message = NULL
+                    WHERE process_id = %s
+                """, (process_id,))
+                dw_conn.commit()
+                logging.info(
+                    f"Resuming process {process_id} after staging_id {last_staging_id} "
+                    f"({total_loaded} records already loaded)"
+                )
+            else:
+                # Start metadata tracking
+                start_time = datetime.now()
+                metadata_query = """
+                    INSERT INTO etl_metadata 
+                    (process_name, start_time, status)
+                    VALUES (%s, %s, %s)
+                """
+                dw_cursor.execute(metadata_query, ('LOAD_FACT_SALES', start_time, 'RUNNING'))
+                process_id = dw_cursor.lastrowid
+                dw_conn.commit()
+                last_staging_id = 0
+                total_loaded = 0
+            
+            # Every dimension version, so facts get the customer and product as of their order date
+            self.customer_versions = customer_versions()
+            self.product_versions = product_versions()
+            with timed('transform'):
+                versions = self.customer_versions.load(dw_cursor) + self.product_versions.load(dw_cursor)
+            logging.info(f"Indexed {versions} dimension versions for as-of key lookups")
+            
+            # Restrict to one date partition when called for a slice of the load
+            date_filter = ""
+            date_params = ()
+            if date_from and date_to:
+                date_filter = "AND s.order_date BETWEEN %s AND %s"
+                date_params = (date_from, date_to)
+            
+            # Get valid sales records in batches, walking the primary key;
+            # a transient error rolls back and replays only the current batch
+            with self.bulk_load.session(date_from, date_to) if bulk else nullcontext():
+                while True:
+                    batch = run_with_retry(
+                        lambda: self.load_fact_batch(
+                            staging_cursor, dw_cursor, dw_conn, process_id, partition_key,
+                            last_staging_id, total_loaded, date_filter, date_params,
+                            unique_checks=not bulk
+                        ),
+                        connections=(staging_conn, dw_conn),
+                        description=f"fact_sales batch after staging_id {last_staging_id}"
+                    )
+                    if batch is None:
+                        break
                     
-                    batch_loaded = dw_cursor.rowcount
+                    last_staging_id, batch_loaded = batch
                     total_loaded += batch_loaded
-                    logging.info(f"Loaded batch: {batch_loaded} records (Total: {total_loaded})")
-                
-                offset += self.batch_size
+                    record(rows=batch_loaded, batches=1)
+                    logging.info(
+                        f"Loaded batch: {batch_loaded} records (Total: {total_loaded}, "
+                        f"checkpoint staging_id {last_staging_id})"
+                    )
             
             # Update metadata
             end_time = datetime.now()
@@ -391,22 +794,85 @@ class DataLoader:
                 WHERE process_id = %s
             """
             dw_cursor.execute(update_query, (end_time, total_loaded, process_id))
+            # Earlier unfinished loads of this partition are superseded now
+            dw_cursor.execute("""
+                DELETE FROM etl_checkpoint 
+                WHERE process_name = 'LOAD_FACT_SALES'
+                AND partition_key = %s
+                AND process_id < %s
+            """, (partition_key, process_id))
             dw_conn.commit()
             
             logging.info(f"Fact sales loading completed: {total_loaded} records")
             
         except Exception as e:
             logging.error(f"Error loading fact_sales: {e}")
+            if 'process_id' in locals() and dw_conn.is_connected():
+                self.mark_failed(dw_cursor, dw_conn, process_id, e)
             raise
             
         finally:
-            if 'staging_conn' in locals() and staging_conn.is_connected():
-                staging_cursor.close()
+            if 'staging_conn' in locals():
+                if staging_conn.is_connected():
+                    staging_cursor.close()
                 staging_conn.close()
-            if 'dw_conn' in locals() and dw_conn.is_connected():
-                dw_cursor.close()
+            if 'dw_conn' in locals():
+                if dw_conn.is_connected():
+                    dw_cursor.close()
                 dw_conn.close()
     
+    def reconcile_inferred_members(self):
+        """Complete the placeholder rows that the dimension loads have filled in
+        
+        A placeholder counts as filled once it has a name. Facts loaded
+        against a placeholder product have no unit_cost yet, so it is taken
+        from the filled-in row before the is_inferred flag is cleared.
+        Placeholders still waiting for their source rows are logged.
+        Returns {dimension: members reconciled}.
+        """
+        reconciled = {}
+        with self.connections.connection('dw') as connection:
+            cursor = connection.cursor()
+            try:
+                cursor.execute("""
+                    SELECT product_key FROM dim_product
+                    WHERE is_inferred = TRUE AND product_name IS NOT NULL
+                """)
+                product_keys = [row[0] for row in cursor.fetchall()]
+                if product_keys:
+                    placeholders = ', '.join(['%s'] * len(product_keys))
+                    cursor.execute(f"""
+                        UPDATE fact_sales fs
+                        JOIN dim_product p ON fs.product_key = p.product_key
+                        SET fs.unit_cost = p.cost_price
+                        WHERE fs.product_key IN ({placeholders})
+                        AND fs.unit_cost IS NULL
+                    """, product_keys)
+                    record(rows=cursor.rowcount)
+                    cursor.execute(f"""
+                        UPDATE dim_product SET is_inferred = FALSE
+                        WHERE product_key IN ({placeholders})
+                    """, product_keys)
+                reconciled['dim_product'] = len(product_keys)
+                
+                cursor.execute("""
+                    UPDATE dim_customer SET is_inferred = FALSE
+                    WHERE is_inferred = TRUE AND customer_name IS NOT NULL
+                """)
+                reconciled['dim_customer'] = cursor.rowcount
+                connection.commit()
+                
+                for dimension in ('dim_customer', 'dim_product'):
+                    cursor.execute(f"SELECT COUNT(*) FROM {dimension} WHERE is_inferred = TRUE")
+                    pending = cursor.fetchone()[0]
+                    if pending:
+                        logging.warning(f"{pending} inferred {dimension} members still wait for their source rows")
+            finally:
+                cursor.close()
+        
+        logging.info(f"Reconciled inferred members: {reconciled}")
+        return reconciled
+    
     def create_aggregates(self):
         """Create aggregate tables for reporting"""
         try:
@@ -420,56 +886,20 @@ class DataLoader:
             dw_cursor.execute(truncate_query)
             
             # Create daily aggregates
-            aggregate_query = """
+            aggregate_query = f"""
                 INSERT INTO agg_sales_daily 
                 (date_key, customer_key, product_key, 
                  total_quantity, total_amount, avg_unit_price, 
-                 order_count, unique_customers)
-                SELECT 
-                    fs.date_key,
-                    NULL as customer_key,
-                    NULL as product_key,
-                    SUM(fs.quantity) as total_quantity,
-                    SUM(fs.total_amount) as total_amount,
-                    AVG(fs.unit_price) as avg_unit_price,
-                    COUNT(DISTINCT fs.order_id) as order_count,
-                    COUNT(DISTINCT fs.customer_key) as unique_customers
-                FROM fact_sales fs
-                GROUP BY fs.date_key
-                
-                UNION ALL
-                
-                SELECT 
-                    fs.date_key,
-                    fs.customer_key,
-                    NULL as product_key,
-                    SUM(fs.quantity) as total_quantity,
-                    SUM(fs.total_amount) as total_amount,
-                    AVG(fs.unit_price) as avg_unit_price,
-                    COUNT(DISTINCT fs.order_id) as order_count,
-                    1 as unique_customers
-                FROM fact_sales fs
-                GROUP BY fs.date_key, fs.customer_key
-                
-                UNION ALL
-                
-                SELECT 
-                    fs.date_key,
-                    NULL as customer_key,
-                    fs.product_key,
-                    SUM(fs.quantity) as total_quantity,
-                    SUM(fs.total_amount) as total_amount,
-                    AVG(fs.unit_price) as avg_unit_price,
-                    COUNT(DISTINCT fs.order_id) as order_count,
-                    COUNT(DISTINCT fs.customer_key) as unique_customers
-                FROM fact_sales fs
-                GROUP BY fs.date_key, fs.product_key
+                 order_count, unique_customers,
+                 total_profit, line_count, sum_profit_margin)
+                {AGGREGATE_SELECT}
             """
             
             dw_cursor.execute(aggregate_query)
             dw_conn.commit()
             
             aggregate_count = dw_cursor.rowcount
+            record(rows=aggregate_count)
             logging.info(f"Aggregates created: {aggregate_count} rows")
             
         except Exception as e:
@@ -477,8 +907,9 @@ class DataLoader:
             raise
             
         finally:
-            if 'dw_conn' in locals() and dw_conn.is_connected():
-                dw_cursor.close()
+            if 'dw_conn' in locals():
+                if dw_conn.is_connected():
+                    dw_cursor.close()
                 dw_conn.close()
 
 if __name__ == "__main__":
@@ -488,4 +919,5 @@ if __name__ == "__main__":
     loader.load_dim_customers()
     loader.load_dim_products()
     loader.load_fact_sales()
+    loader.reconcile_inferred_members()
     loader.create_aggregates()
\ No newline at end of file
@@ -0,0 +1,74 @@
+"""
+Memory budget for ETL stages
+Turns ETLConfig.MEMORY_BUDGET_MB into batch and chunk sizes, so a stage
+holds a bounded number of rows in memory whatever the input size
+"""
+import sys
+import os
+
+# Thêm thư mục gốc vào đường dẫn Python
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import gzip
+import logging
+from config.etl_config import ETLConfig
+from etl_metrics import peak_rss_mb
+
+# In-memory size of a parsed CSV row relative to its text: the pandas chunk plus the insert tuples
+CSV_EXPANSION = 12
+
+# Rough in-memory size of one fetched staging row plus its insert tuple, Decimals and dates included
+STAGING_ROW_BYTES = 2048
+
+# Lines read from the head of a file to estimate its row size
+SAMPLE_LINES = 1000
+
+
+def budget_bytes():
+    return ETLConfig.MEMORY_BUDGET_MB * 1024 * 1024
+
+
+def stage_budget_bytes():
+    """Bytes one stage may spend on batch data
+
+    Parallel stages split the batch share of the budget evenly; the rest is
+    headroom for the interpreter, imported libraries and connection buffers.
+    """
+    share = budget_bytes() * ETLConfig.MEMORY_BATCH_FRACTION
+    return share / max(1, ETLConfig.MAX_PARALLEL_STAGES)
+
+
+def batch_rows(bytes_per_row, maximum=None):
+    """Rows per batch that fit the stage budget, capped at `maximum`"""
+    rows = int(stage_budget_bytes() // max(1, bytes_per_row))
+    rows = max(ETLConfig.MIN_BATCH_ROWS, rows)
+    if maximum:
+        rows = min(rows, maximum)
+    return rows
+
+
+def csv_row_bytes(file_path, sample_lines=SAMPLE_LINES):
+    """Average line length of a CSV file, measured on its first lines"""
+    opener = gzip.open if file_path.endswith('.gz') else open
+    with opener(file_path, 'rb') as csv_file:
+        csv_file.readline()  # header
+        sizes = [len(line) for _, line in zip(range(sample_lines), csv_file)]
+    return sum(sizes) / len(sizes) if sizes else 1
+
+
+def csv_chunk_rows(file_path, maximum=None):
+    """read_csv chunksize for `file_path` that fits the stage budget"""
+    return batch_rows(csv_row_bytes(file_path) * CSV_EXPANSION, maximum)
+
+
+def log_peak_rss(label):
+    """Log peak RSS against the budget; warns when the budget was exceeded"""
+    peak = peak_rss_mb()
+    if peak is None:
+        return None
+    message = f"Peak RSS after {label}: {peak:.1f} MB of {ETLConfig.MEMORY_BUDGET_MB} MB budget"
+    if peak > ETLConfig.MEMORY_BUDGET_MB:
+        logging.warning(f"{message} (over budget)")
+    else:
+        logging.info(message)
+    return peak
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+DuckDB mirror of the star schema for analytical queries
+After each load the dimensions are copied in full, dim_order only from
+its newest mirrored key on, and fact_sales month by month, only for months
+whose row count or newest sales_key changed in MySQL; agg_sales_daily is
+rebuilt inside DuckDB from the mirrored facts.
+Needs the optional duckdb package.
+
+    python scripts/olap_mirror.py refresh
+    python scripts/olap_mirror.py query sql/sample_queries.sql --compare-mysql
+"""
+import sys
+import os
+
+# Thêm thư mục gốc vào đường dẫn Python
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import logging
+import time
+from config.database_config import DatabaseConfig
+from config.etl_config import ETLConfig
+from connection_manager import ConnectionManager
+from dashboard_data import iter_query_frames
+from etl_metrics import record, timed
+from load_sales import AGGREGATE_SELECT
+
+try:
+    import duckdb
+except ImportError:  # Optional: only needed when the mirror is enabled
+    duckdb = None
+
+# Dimensions are small and updated in place (SCD), so they are replaced on every refresh
+MIRRORED_DIMENSIONS = ('dim_date', 'dim_customer', 'dim_product')
+
+# MySQL functions used by the sample queries that DuckDB spells differently
+COMPAT_MACROS = (
+    "CREATE OR REPLACE MACRO curdate() AS current_date",
+)
+
+
+def require_duckdb():
+    if duckdb is None:
+        raise RuntimeError("The OLAP mirror needs the duckdb package: pip install duckdb")
+
+
+def split_statements(sql_text):
+    """(label, statement) pairs from a SQL file; the label is the comment above each statement"""
+    statements = []
+    label = None
+    lines = []
+    for line in sql_text.splitlines():
+        stripped = line.strip()
+        if not stripped and not lines:
+            continue
+        if stripped.startswith('--'):
+            if not lines:
+                label = stripped.lstrip('- ').strip()
+            continue
+        lines.append(line)
+        if stripped.endswith(';'):
+            statement = '\n'.join(lines).strip().rstrip(';').strip()
+            if statement and not statement.upper().startswith('USE '):
+                statements.append((label or f"statement {len(statements) + 1}", statement))
+            label = None
+            lines = []
+    return statements
+
+
+class OLAPMirror:
+    """Incrementally refreshed DuckDB copy of the DW star schema"""
+
+    def __init__(self, path=None, connection_manager=None):
+        self.path = path or ETLConfig.OLAP_MIRROR_PATH
+        self.connections = connection_manager or ConnectionManager.shared()
+
+    def connect(self, read_only=False):
+        """Open the mirror; a writer waits while dashboard readers hold the file lock"""
+        require_duckdb()
+        if read_only:
+            return duckdb.connect(self.path, read_only=True)
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        attempt = 0
+        while True:
+            try:
+                return duckdb.connect(self.path)
+            except duckdb.IOException as e:
+                if attempt >= DatabaseConfig.MAX_RETRIES:
+                    raise
+                attempt += 1
+                logging.warning(f"OLAP mirror is locked ({e}); retry {attempt}/{DatabaseConfig.MAX_RETRIES}")
+                time.sleep(DatabaseConfig.RETRY_DELAY)
+
+    def copy_query(self, connection, duck, table, query, params=(), create=False):
+        """Stream a MySQL result into a DuckDB table in typed chunks; returns the row count
+
+        With create=True the table is (re)created from the first chunk's columns.
+        """
+        rows = 0
+        for frame in iter_query_frames(connection, query, params):
+            duck.register('mirror_chunk', frame)
+            try:
+                with timed('transform'):
+                    if create:
+                        duck.execute(f"CREATE OR REPLACE TABLE {table} AS SELECT * FROM mirror_chunk")
+                        create = False
+                    else:
+                        duck.execute(f"INSERT INTO {table} BY NAME SELECT * FROM mirror_chunk")
+            finally:
+                duck.unregister('mirror_chunk')
+            rows += len(frame)
+            record(batches=1)
+        return rows
+
+    def table_exists(self, duck, table):
+        duck.execute(
+            "SELECT COUNT(*) FROM information_schema.tables WHERE table_name = ?", [table]
+        )
+        return duck.fetchone()[0] > 0
+
+    def fact_months(self, cursor, month_expression):
+        """{yyyymm: (rows, newest sales_key, rows with a unit_cost)} for fact_sales"""
+        cursor.execute(f"""
+            SELECT {month_expression} AS month_key, COUNT(*), MAX(sales_key), COUNT(unit_cost)
+            FROM fact_sales
+            GROUP BY month_key
+        """)
+        return {
+            int(month): (int(rows), int(max_key), int(costed))
+            for month, rows, max_key, costed in cursor.fetchall()
+        }
+
+    def refresh_facts(self, connection, duck):
+        """Copy the months of fact_sales that changed since the last refresh; returns them
+
+        A month that was appended to or reloaded in MySQL has a different row
+        count or newest sales_key, and one whose unit_cost was backfilled by
+        reconcile_inferred_members has more rows with a cost, so it is
+        deleted from the mirror and copied again. Each month reads a single
+        MySQL partition.
+        """
+        cursor = connection.cursor()
+        try:
+            # One pass over fact_sales; unit_cost is not in the date_key index
+            source = self.fact_months(cursor, 'date_key DIV 100')
+        finally:
+            cursor.close()
+
+        exists = self.table_exists(duck, 'fact_sales')
+        mirrored = self.fact_months(duck, 'date_key // 100') if exists else {}
+        changed = sorted(
+            month for month in set(source) | set(mirrored) if source.get(month) != mirrored.get(month)
+        )
+
+        for month in changed:
+            first_key, last_key = month * 100, month * 100 + 99
+            duck.begin()
+            try:
+                if exists:
+                    duck.execute(
+                        "DELETE FROM fact_sales WHERE date_key BETWEEN ? AND ?", [first_key, last_key]
+                    )
+                if month in source:
+                    copied = self.copy_query(
+                        connection, duck, 'fact_sales',
+                        "SELECT * FROM fact_sales WHERE date_key BETWEEN %s AND %s",
+                        (first_key, last_key), create=not exists
+                    )
+                    exists = True
+                    record(rows=copied)
+                duck.commit()
+            except Exception:
+                duck.rollback()
+                raise
+            logging.info(f"OLAP mirror: refreshed fact_sales month {month}")
+        return changed
+
+    def refresh_orders(self, connection, duck):
+        """Append the dim_order rows added since the last refresh; returns the rows copied
+
+        Orders are only ever added, never updated, so the table grows with
+        the facts without being copied in full each time.
+        """
+        exists = self.table_exists(duck, 'dim_order')
+        last_key = 0
+        if exists:
+            duck.execute("SELECT COALESCE(MAX(order_key), 0) FROM dim_order")
+            last_key = int(duck.fetchone()[0])
+        duck.begin()
+        try:
+            copied = self.copy_query(
+                connection, duck, 'dim_order',
+                "SELECT * FROM dim_order WHERE order_key > %s", (last_key,), create=not exists
+            )
+            duck.commit()
+        except Exception:
+            duck.rollback()
+            raise
+        record(rows=copied)
+        logging.info(f"OLAP mirror: appended {copied} rows of dim_order")
+        return copied
+
+    def refresh(self):
+        """Bring the mirror up to date with the DW; returns the fact months copied"""
+        logging.info(f"Refreshing OLAP mirror {self.path}")
+        duck = self.connect()
+        try:
+            with self.connections.connection('dw') as connection:
+                for table in MIRRORED_DIMENSIONS:
+                    duck.begin()
+                    try:
+                        copied = self.copy_query(connection, duck, table, f"SELECT * FROM {table}", create=True)
+                        duck.commit()
+                    except Exception:
+                        duck.rollback()
+                        raise
+                    record(rows=copied)
+                    logging.info(f"OLAP mirror: copied {copied} rows of {table}")
+
+                self.refresh_orders(connection, duck)
+                changed = self.refresh_facts(connection, duck)
+
+            if changed or not self.table_exists(duck, 'agg_sales_daily'):
+                with timed('transform'):
+                    duck.execute(f"CREATE OR REPLACE TABLE agg_sales_daily AS {AGGREGATE_SELECT}")
+            for macro in COMPAT_MACROS:
+                duck.execute(macro)
+
+            logging.info(f"OLAP mirror refreshed: {len(changed)} fact months copied")
+            return changed
+        finally:
+            duck.close()
+
+    def run_queries(self, sql_path, compare_mysql=False):
+        """Run every statement of a SQL file on the mirror, timing it; returns [(label, seconds, rows)]"""
+        with open(sql_path, 'r', encoding='utf-8') as sql_file:
+            statements = split_statements(sql_file.read())
+
+        results = []
+        duck = self.connect(read_only=True)
+        try:
+            for label, statement in statements:
+                start = time.perf_counter()
+                try:
+                    rows = len(duck.execute(statement).fetchall())
+                except duckdb.Error as e:
+                    logging.warning(f"OLAP mirror could not run '{label}': {e}")
+                    rows = None
+                results.append([label, time.perf_counter() - start, rows])
+        finally:
+            duck.close()
+
+        if compare_mysql:
+            with self.connections.connection('dw') as connection:
+                cursor = connection.cursor()
+                try:
+                    for result, (_, statement) in zip(results, statements):
+                        start = time.perf_counter()
+                        cursor.execute(statement)
+                        cursor.fetchall()
+                        result.append(time.perf_counter() - start)
+                finally:
+                    cursor.close()
+        return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Maintain and query the DuckDB mirror of the DW")
+    commands = parser.add_subparsers(dest='command', required=True)
+    refresh_parser = commands.add_parser('refresh', help="copy new and changed data from MySQL")
+    refresh_parser.add_argument('--rebuild', action='store_true',
+                                help="delete the mirror first, e.g. after a schema change")
+    query_parser = commands.add_parser('query', help="time the statements of a SQL file on the mirror")
+    query_parser.add_argument('sql_file', nargs='?', default='sql/sample_queries.sql')
+    query_parser.add_argument('--compare-mysql', action='store_true',
+                              help="also time each statement on MySQL")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        filename=ETLConfig.LOG_FILE,
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    mirror = OLAPMirror()
+
+    if args.command == 'refresh':
+        if args.rebuild and os.path.exists(mirror.path):
+            os.remove(mirror.path)
+        months = mirror.refresh()
+        print(f"Mirror {mirror.path} refreshed, {len(months)} fact months copied")
+    else:
+        for label, seconds, rows, *mysql_seconds in mirror.run_queries(args.sql_file, args.compare_mysql):
+            outcome = 'failed' if rows is None else f"{rows} rows"
+            line = f"{label[:50]:<50} duckdb {seconds * 1000:>9.1f} ms  {outcome}"
+            if mysql_seconds:
+                line += f"  mysql {mysql_seconds[0] * 1000:>9.1f} ms"
+            print(line)
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Monthly range partitions of fact_sales
+fact_sales is partitioned by RANGE on date_key with one partition per
+month (p202401 holds date_keys below 20240201), between a p_history
+catch-all for older dates and a p_future catch-all for newer ones. This
+module splits new months out of p_future ahead of the data, empties a
+date range before a reload, and archives or drops expired months.
+"""
+import sys
+import os
+
+# Thêm thư mục gốc vào đường dẫn Python
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import logging
+import re
+from datetime import date, datetime
+from config.etl_config import ETLConfig
+from connection_manager import ConnectionManager
+
+MONTH_PARTITION = re.compile(r'^p(\d{4})(\d{2})$')
+FUTURE_PARTITION = 'p_future'
+
+
+def to_date(value):
+    """Accept a date, datetime or ISO date string"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
+
+
+def month_start(value):
+    value = to_date(value)
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def date_key(value):
+    return int(to_date(value).strftime('%Y%m%d'))
+
+
+def partition_name(month):
+    return f"p{month:%Y%m}"
+
+
+def partition_month(name):
+    """First day of the month held by a monthly partition, or None for the catch-alls"""
+    match = MONTH_PARTITION.match(name)
+    return date(int(match.group(1)), int(match.group(2)), 1) if match else None
+
+
+class PartitionManager:
+    """Creates, empties, archives and drops the monthly partitions of fact_sales"""
+
+    def __init__(self, connection_manager=None, table='fact_sales'):
+        self.connections = connection_manager or ConnectionManager.shared()
+        self.table = table
+
+    def list_partitions(self, cursor):
+        """(name, upper bound, approximate rows) per partition, in range order"""
+        cursor.execute("""
+            SELECT PARTITION_NAME, PARTITION_DESCRIPTION, TABLE_ROWS
+            FROM information_schema.PARTITIONS
+            WHERE TABLE_SCHEMA = DATABASE()
+            AND TABLE_NAME = %s
+            AND PARTITION_NAME IS NOT NULL
+            ORDER BY PARTITION_ORDINAL_POSITION
+        """, (self.table,))
+        return cursor.fetchall()
+
+    def monthly_partitions(self, cursor):
+        """{month: partition name} for the monthly partitions"""
+        months = {}
+        for name, _, _ in self.list_partitions(cursor):
+            month = partition_month(name)
+            if month:
+                months[month] = name
+        return months
+
+    def ensure_partitions(self, date_from=None, date_to=None, months_ahead=None):
+        """Create monthly partitions through date_to and months_ahead months past today
+
+        New months are split off p_future with REORGANIZE PARTITION, which is
+        a metadata change while p_future is empty. Months are only added
+        after the newest monthly partition; dates before the first one stay
+        in p_history. Returns the names of the partitions created.
+        """
+        months_ahead = ETLConfig.FACT_PARTITIONS_AHEAD if months_ahead is None else months_ahead
+        last_month = add_months(month_start(date.today()), months_ahead)
+        if date_to:
+            last_month = max(last_month, month_start(date_to))
+
+        with self.connections.connection('dw') as connection:
+            cursor = connection.cursor()
+            try:
+                partitions = [name for name, _, _ in self.list_partitions(cursor)]
+                if FUTURE_PARTITION not in partitions:
+                    logging.warning(
+                        f"{self.table} has no {FUTURE_PARTITION} partition; "
+                        "run sql/partition_fact_sales.sql to partition it"
+                    )
+                    return []
+
+                existing = self.monthly_partitions(cursor)
+                if existing:
+                    month = add_months(max(existing), 1)
+                else:
+                    month = month_start(date_from or ETLConfig.START_DATE)
+
+                definitions = []
+                created = []
+                while month <= last_month:
+                    name = partition_name(month)
+                    definitions.append(
+                        f"PARTITION {name} VALUES LESS THAN ({date_key(add_months(month, 1))})"
+                    )
+                    created.append(name)
+                    month = add_months(month, 1)
+
+                if not created:
+                    return []
+
+                definitions.append(f"PARTITION {FUTURE_PARTITION} VALUES LESS THAN MAXVALUE")
+                cursor.execute(
+                    f"ALTER TABLE {self.table} REORGANIZE PARTITION {FUTURE_PARTITION} INTO "
+                    f"({', '.join(definitions)})"
+                )
+                logging.info(f"Created {len(created)} {self.table} partitions: {created[0]}..{created[-1]}")
+                return created
+            finally:
+                cursor.close()
+
+    def clear_range(self, date_from, date_to):
+        """Empty date_from..date_to before a reload
+
+        Whole months are truncated, which is a metadata operation; partial
+        months are deleted row by row, but only inside their own partition.
+        Nothing is checked against staging here; DataLoader.load_fact_sales
+        refuses a reload whose rows are no longer staged before calling this.
+        Returns the number of partitions touched.
+        """
+        start_key = date_key(date_from)
+        end_key = date_key(date_to)
+
+        with self.connections.connection('dw') as connection:
+            cursor = connection.cursor()
+            try:
+                months = self.monthly_partitions(cursor)
+                month = month_start(date_from)
+                touched = 0
+                while month <= month_start(date_to):
+                    name = months.get(month)
+                    month_first = date_key(month)
+                    month_last = date_key(add_months(month, 1)) - 1
+                    if name is None:
+                        # Not split out yet, so the rows sit in a catch-all partition
+                        cursor.execute(
+                            f"DELETE FROM {self.table} WHERE date_key BETWEEN %s AND %s",
+                            (max(start_key, month_first), min(end_key, month_last))
+                        )
+                    elif start_key <= month_first and month_last <= end_key:
+                        cursor.execute(f"ALTER TABLE {self.table} TRUNCATE PARTITION {name}")
+                    else:
+                        cursor.execute(
+                            f"DELETE FROM {self.table} PARTITION ({name}) "
+                            "WHERE date_key BETWEEN %s AND %s",
+                            (max(start_key, month_first), min(end_key, month_last))
+                        )
+                    connection.commit()
+                    touched += 1
+                    month = add_months(month, 1)
+
+                logging.info(f"Cleared {self.table} for {date_from}..{date_to} ({touched} partitions)")
+                return touched
+            finally:
+                cursor.close()
+
+    def archive_partition(self, name):
+        """Move a monthly partition into its own table, then drop the partition
+
+        EXCHANGE PARTITION swaps the data files instead of copying rows. The
+        archive table is named <table>_archive_<yyyymm>. Returns that name.
+        """
+        month = partition_month(name)
+        if month is None:
+            raise ValueError(f"Only monthly partitions can be archived, not '{name}'")
+        archive_table = f"{self.table}_archive_{month:%Y%m}"
+
+        with self.connections.connection('dw') as connection:
+            cursor = connection.cursor()
+            try:
+                cursor.execute(f"CREATE TABLE {archive_table} LIKE {self.table}")
+                cursor.execute(f"ALTER TABLE {archive_table} REMOVE PARTITIONING")
+                cursor.execute(
+                    f"ALTER TABLE {self.table} EXCHANGE PARTITION {name} WITH TABLE {archive_table}"
+                )
+                cursor.execute(f"ALTER TABLE {self.table} DROP PARTITION {name}")
+                logging.info(f"Archived {self.table} partition {name} to {archive_table}")
+                return archive_table
+            finally:
+                cursor.close()
+
+    def drop_partition(self, name):
+        """Drop a monthly partition and its rows"""
+        if partition_month(name) is None:
+            raise ValueError(f"Only monthly partitions can be dropped, not '{name}'")
+
+        with self.connections.connection('dw') as connection:
+            cursor = connection.cursor()
+            try:
+                cursor.execute(f"ALTER TABLE {self.table} DROP PARTITION {name}")
+                logging.info(f"Dropped {self.table} partition {name}")
+            finally:
+                cursor.close()
+
+    def apply_retention(self, retention_months=None, archive=None):
+        """Archive (or drop) monthly partitions older than retention_months
+
+        Aggregates are rebuilt from fact_sales, so expired months also leave
+        agg_sales_daily on the next create_aggregates. Returns the partitions
+        removed.
+        """
+        retention_months = (
+            ETLConfig.FACT_RETENTION_MONTHS if retention_months is None else retention_months
+        )
+        archive = ETLConfig.FACT_ARCHIVE_EXPIRED if archive is None else archive
+        if not retention_months:
+            return []
+
+        cutoff = add_months(month_start(date.today()), -retention_months)
+        with self.connections.connection('dw') as connection:
+            cursor = connection.cursor()
+            try:
+                months = self.monthly_partitions(cursor)
+            finally:
+                cursor.close()
+
+        expired = [name for month, name in sorted(months.items()) if month < cutoff]
+        for name in expired:
+            if archive:
+                self.archive_partition(name)
+            else:
+                self.drop_partition(name)
+        return expired
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Manage the monthly partitions of fact_sales")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help="show partitions and approximate row counts")
+    ensure_parser = commands.add_parser('ensure', help="create partitions ahead of the data")
+    ensure_parser.add_argument('--months-ahead', type=int, default=None)
+    reload_parser = commands.add_parser('reload', help="empty a date range and load it again")
+    reload_parser.add_argument('--from', dest='date_from', required=True, help="YYYY-MM-DD")
+    reload_parser.add_argument('--to', dest='date_to', required=True, help="YYYY-MM-DD")
+    retention_parser = commands.add_parser('retention', help="archive or drop expired months")
+    retention_parser.add_argument('--months', type=int, default=None)
+    retention_parser.add_argument('--drop', action='store_true', help="drop instead of archiving")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        filename=ETLConfig.LOG_FILE,
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    manager = PartitionManager()
+
+    if args.command == 'list':
+        with manager.connections.connection('dw') as connection:
+            cursor = connection.cursor()
+            for name, bound, rows in manager.list_partitions(cursor):
+                print(f"{name:<12} < {bound:<10} {rows or 0:>12}")
+            cursor.close()
+    elif args.command == 'ensure':
+        print(manager.ensure_partitions(date_to=ETLConfig.END_DATE, months_ahead=args.months_ahead))
+    elif args.command == 'reload':
+        from load_sales import DataLoader
+
+        loader = DataLoader()
+        loader.load_fact_sales(date_from=args.date_from, date_to=args.date_to, reload=True)
+        loader.create_aggregates()
+    elif args.command == 'retention':
+        print(manager.apply_retention(args.months, archive=not args.drop))
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Quarantine of rejected staging rows
+Rows that fail validation are moved out of the staging tables into
+<table>_rejects with a reason code, the message and their source file, so
+the staging tables only hold rows that are pending or ready to load.
+Quarantined rows can be checked again against the current rules
+(reprocess) or sent back to staging as they are (replay).
+
+    python scripts/rejects.py summary
+    python scripts/rejects.py reprocess --tables staging_sales --reason QUANTITY_ABOVE_MAX
+    python scripts/rejects.py replay staging_customers --file customers.csv
+"""
+import sys
+import os
+
+# Thêm thư mục gốc vào đường dẫn Python
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import logging
+from config.etl_config import ETLConfig
+from connection_manager import ConnectionManager
+from retry import run_with_retry
+from etl_metrics import record
+
+# Source columns copied between a staging table and its rejects table
+STAGING_COLUMNS = {
+    'staging_sales': [
+        'order_id', 'order_date', 'customer_id', 'product_id',
+        'quantity', 'unit_price', 'total_amount', 'file_name',
+    ],
+    'staging_customers': [
+        'customer_id', 'customer_name', 'email', 'phone', 'address',
+        'city', 'country', 'registration_date', 'file_name',
+    ],
+    'staging_products': [
+        'product_id', 'product_name', 'category', 'subcategory',
+        'supplier', 'cost_price', 'msrp', 'file_name',
+    ],
+}
+
+
+def reject_rules(table):
+    """(reason code, condition, params, message) per rule, first match wins
+
+    Built on each call so reprocessing sees the current ETLConfig limits.
+    """
+    if table == 'staging_sales':
+        return [
+            ('QUANTITY_BELOW_MIN', "quantity < %s", (ETLConfig.MIN_QUANTITY,), 'Quantity below minimum'),
+            ('QUANTITY_ABOVE_MAX', "quantity > %s", (ETLConfig.MAX_QUANTITY,), 'Quantity above maximum'),
+            ('UNIT_PRICE_BELOW_MIN', "unit_price < %s", (ETLConfig.MIN_UNIT_PRICE,), 'Unit price below minimum'),
+            ('UNIT_PRICE_ABOVE_MAX', "unit_price > %s", (ETLConfig.MAX_UNIT_PRICE,), 'Unit price above maximum'),
+            ('TOTAL_MISMATCH', "total_amount != (quantity * unit_price)", (), 'Total amount mismatch'),
+            ('ORDER_DATE_OUT_OF_RANGE', "order_date < %s OR order_date > %s",
+             (ETLConfig.START_DATE, ETLConfig.END_DATE), 'Order date out of range'),
+            ('MISSING_CUSTOMER_ID', "customer_id IS NULL OR TRIM(customer_id) = ''", (), 'Missing customer ID'),
+            ('MISSING_PRODUCT_ID', "product_id IS NULL OR TRIM(product_id) = ''", (), 'Missing product ID'),
+        ]
+    if table == 'staging_customers':
+        return [
+            ('INVALID_EMAIL', "email NOT LIKE '%@%.%'", (), 'Invalid email format'),
+        ]
+    if table == 'staging_products':
+        return [
+            ('INVALID_COST_PRICE', "cost_price <= 0", (), 'Invalid cost price'),
+            ('INVALID_MSRP', "msrp <= 0", (), 'Invalid MSRP'),
+            ('MSRP_BELOW_COST', "msrp < cost_price", (), 'MSRP lower than cost'),
+        ]
+    raise ValueError(f"No reject rules for {table}")
+
+
+def failing_condition(rules):
+    """SQL that is TRUE for rows breaking any rule; NULL comparisons count as passing"""
+    condition = ' OR '.join(f"({rule_condition})" for _, rule_condition, _, _ in rules)
+    params = tuple(param for _, _, rule_params, _ in rules for param in rule_params)
+    return f"COALESCE({condition}, FALSE)", params
+
+
+def case_expression(rules, field):
+    """CASE yielding the reason code (field=0) or message (field=3) of the first broken rule"""
+    branches = ' '.join(f"WHEN {rule[1]} THEN '{rule[field]}'" for rule in rules)
+    params = tuple(param for _, _, rule_params, _ in rules for param in rule_params)
+    return f"CASE {branches} END", params
+
+
+def filter_clause(reason=None, file_name=None, reject_ids=None):
+    """WHERE conditions on a rejects table, always at least 'TRUE'"""
+    conditions = ['TRUE']
+    params = ()
+    if reason:
+        conditions.append("reason_code = %s")
+        params += (reason,)
+    if file_name:
+        conditions.append("file_name = %s")
+        params += (file_name,)
+    if reject_ids:
+        conditions.append(f"reject_id IN ({', '.join(['%s'] * len(reject_ids))})")
+        params += tuple(reject_ids)
+    return ' AND '.join(conditions), params
+
+
+class RejectsManager:
+    """Moves failed staging rows into <table>_rejects and back"""
+
+    def __init__(self, connection_manager=None):
+        self.connections = connection_manager or ConnectionManager.shared()
+
+    def quarantine(self, connection, table):
+        """Move the pending rows of `table` that break a rule into its rejects table
+
+        Only rows up to the staging_id read when the call starts are
+        considered, so rows extracted concurrently are neither copied nor
+        deleted half-way. Returns (rows quarantined, that staging_id); the
+        caller must mark no row past it valid, since those were not checked.
+        """
+        rules = reject_rules(table)
+        columns = ', '.join(STAGING_COLUMNS[table])
+        failing, failing_params = failing_condition(rules)
+        reason_case, reason_params = case_expression(rules, 0)
+        message_case, message_params = case_expression(rules, 3)
+        cursor = connection.cursor()
+
+        def move_rejects():
+            cursor.execute(f"SELECT MAX(staging_id) FROM {table}")
+            last_id = cursor.fetchone()[0] or 0
+            pending = f"processed_flag = FALSE AND staging_id <= %s AND {failing}"
+
+            cursor.execute(f"""
+                INSERT INTO {table}_rejects
+                (staging_id, {columns}, load_timestamp, reason_code, error_message)
+                SELECT staging_id, {columns}, load_timestamp, {reason_case}, {message_case}
+                FROM {table}
+                WHERE {pending}
+            """, reason_params + message_params + (last_id,) + failing_params)
+            moved = cursor.rowcount
+            cursor.execute(f"DELETE FROM {table} WHERE {pending}", (last_id,) + failing_params)
+            connection.commit()
+            return moved, last_id
+
+        try:
+            moved, last_id = run_with_retry(move_rejects, connections=(connection,),
+                                            description=f"{table} quarantine")
+        finally:
+            cursor.close()
+        if moved:
+            logging.warning(f"Quarantined {moved} rows from {table} into {table}_rejects")
+        record(rows=moved)
+        return moved, last_id
+
+    def restore(self, connection, table, where, params):
+        """Move the rejects matching `where` back to staging as pending rows; returns the count
+
+        Restored rows get new staging_ids, so a replayed row counts as the
+        latest version of its order line during deduplication.
+        """
+        columns = ', '.join(STAGING_COLUMNS[table])
+        cursor = connection.cursor()
+
+        def move_back():
+            cursor.execute(f"SELECT MAX(reject_id) FROM {table}_rejects")
+            last_id = cursor.fetchone()[0] or 0
+            selected = f"reject_id <= %s AND {where}"
+            cursor.execute(f"""
+                INSERT INTO {table} ({columns})
+                SELECT {columns} FROM {table}_rejects
+                WHERE {selected}
+            """, (last_id,) + params)
+            cursor.execute(f"DELETE FROM {table}_rejects WHERE {selected}", (last_id,) + params)
+            restored = cursor.rowcount
+            connection.commit()
+            return restored
+
+        try:
+            return run_with_retry(move_back, connections=(connection,),
+                                  description=f"{table} restore")
+        finally:
+            cursor.close()
+
+    def reprocess(self, tables=None, reason=None, file_name=None):
+        """Check quarantined rows against the current rules
+
+        Rows that now pass go back to staging for the next run; rows that
+        still fail keep their place with an updated reason code. Returns
+        {table: (restored, still rejected)}.
+        """
+        results = {}
+        with self.connections.connection('staging') as connection:
+            for table in tables or STAGING_COLUMNS:
+                rules = reject_rules(table)
+                failing, failing_params = failing_condition(rules)
+                reason_case, reason_params = case_expression(rules, 0)
+                message_case, message_params = case_expression(rules, 3)
+                where, params = filter_clause(reason, file_name)
+
+                cursor = connection.cursor()
+                try:
+                    # Counted first: the update may change the reason_code `where` filters on
+                    cursor.execute(
+                        f"SELECT COUNT(*) FROM {table}_rejects WHERE {where} AND {failing}",
+                        params + failing_params
+                    )
+                    still_rejected = cursor.fetchone()[0]
+                    cursor.execute(f"""
+                        UPDATE {table}_rejects
+                        SET reason_code = {reason_case}, error_message = {message_case}
+                        WHERE {where} AND {failing}
+                    """, reason_params + message_params + params + failing_params)
+                    connection.commit()
+                finally:
+                    cursor.close()
+
+                restored = self.restore(connection, table, f"{where} AND NOT {failing}",
+                                        params + failing_params)
+                results[table] = (restored, still_rejected)
+                logging.info(f"Reprocessed {table}_rejects: {restored} restored, {still_rejected} still rejected")
+        return results
+
+    def replay(self, table, reason=None, file_name=None, reject_ids=None):
+        """Send quarantined rows back to staging unchanged, e.g. after fixing them by hand
+
+        They are validated again by the next run. Returns the rows replayed.
+        """
+        where, params = filter_clause(reason, file_name, reject_ids)
+        with self.connections.connection('staging') as connection:
+            replayed = self.restore(connection, table, where, params)
+        logging.info(f"Replayed {replayed} rows from {table}_rejects")
+        return replayed
+
+    def summary(self, tables=None):
+        """(table, reason code, file, rows) for every group of quarantined rows"""
+        rows = []
+        with self.connections.connection('staging') as connection:
+            cursor = connection.cursor()
+            try:
+                for table in tables or STAGING_COLUMNS:
+                    cursor.execute(f"""
+                        SELECT reason_code, file_name, COUNT(*)
+                        FROM {table}_rejects
+                        GROUP BY reason_code, file_name
+                        ORDER BY reason_code, file_name
+                    """)
+                    rows.extend((table,) + row for row in cursor.fetchall())
+            finally:
+                cursor.close()
+        return rows
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect and reprocess quarantined staging rows")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('summary', help="count quarantined rows by table, reason and file")
+    reprocess_parser = commands.add_parser('reprocess', help="restore rows that pass the current rules")
+    reprocess_parser.add_argument('--tables', nargs='+', choices=list(STAGING_COLUMNS), help="default: all")
+    replay_parser = commands.add_parser('replay', help="send rows back to staging unchecked")
+    replay_parser.add_argument('table', choices=list(STAGING_COLUMNS))
+    replay_parser.add_argument('--ids', nargs='+', type=int, help="reject_ids to replay")
+    for command_parser in (reprocess_parser, replay_parser):
+        command_parser.add_argument('--reason', help="only this reason code")
+        command_parser.add_argument('--file', dest='file_name', help="only rows from this source file")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        filename=ETLConfig.LOG_FILE,
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    manager = RejectsManager()
+
+    if args.command == 'summary':
+        for table, reason, file_name, count in manager.summary():
+            print(f"{table:<18} {reason:<24} {file_name or '':<30} {count:>10}")
+    elif args.command == 'reprocess':
+        for table, (restored, rejected) in manager.reprocess(args.tables, args.reason, args.file_name).items():
+            print(f"{table}: {restored} restored, {rejected} still rejected")
+    else:
+        replayed = manager.replay(args.table, args.reason, args.file_name, args.ids)
+        print(f"{args.table}: {replayed} rows replayed")
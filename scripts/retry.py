@@ -0,0 +1,89 @@
+"""
+Retry layer for batch database operations
+Transient MySQL errors (deadlocks, lock wait timeouts, dropped connections)
+roll back and retry only the failed batch, with jittered exponential backoff
+"""
+import sys
+import os
+
+# Thêm thư mục gốc vào đường dẫn Python
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import logging
+import random
+import time
+from mysql.connector import Error
+from config.database_config import DatabaseConfig
+from etl_metrics import record
+
+# MySQL error codes worth retrying; anything else fails the batch immediately
+TRANSIENT_ERRORS = {
+    1205: 'lock wait timeout',
+    1213: 'deadlock',
+    2006: 'server has gone away',
+    2013: 'lost connection',
+}
+
+# Upper bound for a single backoff sleep, in seconds
+MAX_RETRY_DELAY = 60
+
+
+def is_transient(error):
+    """True when `error` is a MySQL error that a retry can be expected to clear"""
+    return isinstance(error, Error) and error.errno in TRANSIENT_ERRORS
+
+
+def backoff_delay(attempt, base_delay):
+    """Exponential backoff with jitter, so concurrent writers do not retry in lockstep"""
+    delay = min(base_delay * 2 ** (attempt - 1), MAX_RETRY_DELAY)
+    return random.uniform(delay / 2, delay)
+
+
+def reset_connection(connection):
+    """Discard the failed transaction and make sure the session is usable again"""
+    try:
+        connection.rollback()
+    except Error:
+        # The connection is gone; the server has already rolled the transaction back
+        pass
+    connection.ping(reconnect=True, attempts=DatabaseConfig.MAX_RETRIES, delay=1)
+
+
+def run_with_retry(operation, connections=(), description='batch', max_retries=None, base_delay=None):
+    """Call operation() and retry it on transient MySQL errors
+
+    `operation` must be safe to repeat: it has to redo the whole unit of work
+    up to and including its commit. Before each retry the connections in
+    `connections` are rolled back and reconnected if needed.
+    """
+    max_retries = DatabaseConfig.MAX_RETRIES if max_retries is None else max_retries
+    base_delay = DatabaseConfig.RETRY_DELAY if base_delay is None else base_delay
+
+    attempt = 0
+    while True:
+        try:
+            return operation()
+        except Error as e:
+            if not is_transient(e) or attempt >= max_retries:
+                raise
+            attempt += 1
+            record(retries=1)
+            delay = backoff_delay(attempt, base_delay)
+            logging.warning(
+                f"Transient MySQL error during {description} ({TRANSIENT_ERRORS[e.errno]}: {e}); "
+                f"retry {attempt}/{max_retries} in {delay:.1f}s"
+            )
+            time.sleep(delay)
+            for connection in connections:
+                reset_connection(connection)
+
+
+def executemany_with_retry(connection, cursor, query, rows, description='batch'):
+    """executemany + commit as one retryable unit; returns the affected row count"""
+    def insert_batch():
+        cursor.executemany(query, rows)
+        row_count = cursor.rowcount
+        connection.commit()
+        return row_count
+
+    return run_with_retry(insert_batch, connections=(connection,), description=description)
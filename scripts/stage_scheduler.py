@@ -0,0 +1,115 @@
+"""
+Dependency-aware stage scheduler
+Runs ETL stages on a worker pool as soon as everything they depend on has completed
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from contextlib import nullcontext
+from datetime import datetime
+
+
+class PipelineStage:
+    """One named unit of pipeline work and the stages it must wait for"""
+
+    def __init__(self, name, func, depends_on=()):
+        self.name = name
+        self.func = func
+        self.depends_on = tuple(depends_on)
+
+
+class StageScheduler:
+    def __init__(self, stages, max_workers=1, metrics_recorder=None, profiler=None):
+        self.stages = {stage.name: stage for stage in stages}
+        self.max_workers = max(1, max_workers)
+        # Optional MetricsRecorder collecting per-stage telemetry
+        self.metrics_recorder = metrics_recorder
+        # Optional StageProfiler for the stages selected in ETL_PROFILE_STAGES
+        self.profiler = profiler
+        self.timings = {}
+        self._validate()
+
+    def _validate(self):
+        """Reject unknown dependencies and cycles before anything runs"""
+        for stage in self.stages.values():
+            for dependency in stage.depends_on:
+                if dependency not in self.stages:
+                    raise ValueError(f"Stage '{stage.name}' depends on unknown stage '{dependency}'")
+
+        resolved = set()
+        remaining = dict(self.stages)
+        while remaining:
+            ready = [name for name, stage in remaining.items() if set(stage.depends_on) <= resolved]
+            if not ready:
+                raise ValueError(f"Dependency cycle between stages: {sorted(remaining)}")
+            for name in ready:
+                resolved.add(name)
+                del remaining[name]
+
+    def _run_stage(self, stage):
+        """Run one stage and record its timing"""
+        started_at = datetime.now()
+        start = time.perf_counter()
+        status = 'FAILED'
+        logging.info(f"Stage started: {stage.name}")
+        tracking = self.metrics_recorder.track(stage.name) if self.metrics_recorder else nullcontext()
+        profiling = self.profiler.profile(stage.name) if self.profiler else nullcontext()
+        try:
+            with tracking, profiling:
+                stage.func()
+            status = 'COMPLETED'
+        finally:
+            duration = time.perf_counter() - start
+            self.timings[stage.name] = {
+                'started_at': started_at,
+                'duration_seconds': round(duration, 3),
+                'status': status,
+            }
+            logging.info(f"Stage {status.lower()}: {stage.name} ({duration:.2f}s)")
+
+    def run(self):
+        """Run all stages; stop scheduling new ones at the first failure and re-raise it"""
+        completed = set()
+        pending = dict(self.stages)
+        running = {}
+        failure = None
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='etl_stage') as executor:
+            while pending or running:
+                if failure is None:
+                    ready = [
+                        name for name, stage in pending.items()
+                        if set(stage.depends_on) <= completed
+                    ]
+                    for name in ready:
+                        stage = pending.pop(name)
+                        running[executor.submit(self._run_stage, stage)] = name
+
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        future.result()
+                        completed.add(name)
+                    except Exception as e:
+                        logging.error(f"Stage {name} failed: {e}")
+                        if failure is None:
+                            failure = e
+
+        if failure is not None:
+            skipped = sorted(pending)
+            if skipped:
+                logging.error(f"Stages not run after failure: {', '.join(skipped)}")
+            raise failure
+
+        return self.timings
+
+    def log_summary(self):
+        """Log per-stage timings in start order"""
+        for name, timing in sorted(self.timings.items(), key=lambda item: item[1]['started_at']):
+            logging.info(
+                f"  {name:<28} {timing['status']:<10} {timing['duration_seconds']:>10.2f}s"
+            )
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Staging retention: archive and purge loaded rows
+After a successful load, rows that were loaded into the DW are archived
+per source file, to gzip CSV files or to <table>_history tables, and
+deleted from staging in bounded batches, so validation, dedup and the fact
+load only ever scan recent files. Rejected rows live in <table>_rejects.
+"""
+import sys
+import os
+
+# Thêm thư mục gốc vào đường dẫn Python
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import csv
+import gzip
+import logging
+import re
+from datetime import datetime
+from config.etl_config import ETLConfig
+from connection_manager import ConnectionManager
+from retry import run_with_retry
+from etl_metrics import record
+
+ARCHIVE_MODES = ('file', 'table', 'none')
+
+# Per staging table, the extract process that registers its files
+STAGING_TABLES = {
+    'staging_sales': 'EXTRACT_SALES',
+    'staging_customers': 'EXTRACT_CUSTOMERS',
+    'staging_products': 'EXTRACT_PRODUCTS',
+}
+
+# Rejected rows are already in <table>_rejects, so every row left is either pending or loaded
+FINISHED = "processed_flag = TRUE"
+
+
+class StagingLifecycle:
+    """Archives and purges loaded staging rows, one source file at a time"""
+
+    def __init__(self, connection_manager=None, archive_mode=None, archive_dir=None,
+                 batch_size=None, retention_days=None):
+        self.connections = connection_manager or ConnectionManager.shared()
+        self.archive_mode = archive_mode or ETLConfig.STAGING_ARCHIVE_MODE
+        self.archive_dir = archive_dir or ETLConfig.STAGING_ARCHIVE_DIR
+        self.batch_size = batch_size or ETLConfig.STAGING_PURGE_BATCH_SIZE
+        self.retention_days = (
+            ETLConfig.STAGING_RETENTION_DAYS if retention_days is None else retention_days
+        )
+        if self.archive_mode not in ARCHIVE_MODES:
+            raise ValueError(f"Unknown archive mode '{self.archive_mode}', expected one of {ARCHIVE_MODES}")
+
+    def fact_load_pending(self):
+        """True while a fact load could still resume from staging
+
+        That is a RUNNING or FAILED load with a checkpoint, unless a later
+        load of the same partition has completed since.
+        """
+        with self.connections.connection('dw') as connection:
+            cursor = connection.cursor()
+            try:
+                cursor.execute("""
+                    SELECT COUNT(*)
+                    FROM etl_checkpoint c
+                    JOIN etl_metadata m ON m.process_id = c.process_id
+                    WHERE c.process_name = 'LOAD_FACT_SALES'
+                    AND m.status IN ('RUNNING', 'FAILED')
+                    AND NOT EXISTS (
+                        SELECT 1
+                        FROM etl_checkpoint c2
+                        JOIN etl_metadata m2 ON m2.process_id = c2.process_id
+                        WHERE c2.process_name = 'LOAD_FACT_SALES'
+                        AND c2.partition_key = c.partition_key
+                        AND m2.status = 'COMPLETED'
+                        AND m2.process_id > c.process_id
+                    )
+                """)
+                return cursor.fetchone()[0] > 0
+            finally:
+                cursor.close()
+
+    def purgeable_files(self, cursor, table):
+        """Source files whose extract completed and whose newest row is past the retention period"""
+        cursor.execute(f"""
+            SELECT s.file_name
+            FROM {table} s
+            WHERE s.file_name IN (
+                SELECT source_file FROM etl_metadata
+                WHERE process_name = %s AND status = 'COMPLETED'
+            )
+            GROUP BY s.file_name
+            HAVING MAX(s.load_timestamp) < NOW() - INTERVAL %s DAY
+        """, (STAGING_TABLES[table], self.retention_days))
+        return [row[0] for row in cursor.fetchall()]
+
+    def archive_path(self, table, file_name):
+        safe_name = re.sub(r'[^\w.-]+', '_', file_name)
+        stamp = datetime.now().strftime('%Y%m%dT%H%M%S')
+        return os.path.join(self.archive_dir, table, f"{safe_name}.{stamp}.csv.gz")
+
+    def purge_file(self, connection, table, file_name):
+        """Archive and delete the loaded rows of one source file; returns the rows purged
+
+        Rows are walked in staging_id order, one bounded batch per
+        transaction. In table mode the copy and the delete commit together;
+        in file mode a batch is written and flushed before its delete
+        commits, so a crash in between can only archive rows twice, never
+        lose them.
+        """
+        select_query = f"""
+            SELECT * FROM {table}
+            WHERE file_name = %s AND {FINISHED} AND staging_id > %s
+            ORDER BY staging_id
+            LIMIT {int(self.batch_size)}
+        """
+        range_filter = f"file_name = %s AND {FINISHED} AND staging_id BETWEEN %s AND %s"
+
+        cursor = connection.cursor()
+        archive_file = None
+        writer = None
+        purged = 0
+        last_id = 0
+        try:
+            while True:
+                cursor.execute(select_query, (file_name, last_id))
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+                columns = [column[0] for column in cursor.description]
+                first_id, last_id = rows[0][0], rows[-1][0]
+
+                if self.archive_mode == 'file':
+                    if writer is None:
+                        path = self.archive_path(table, file_name)
+                        os.makedirs(os.path.dirname(path), exist_ok=True)
+                        archive_file = gzip.open(path, 'wt', newline='', encoding='utf-8')
+                        writer = csv.writer(archive_file)
+                        writer.writerow(columns)
+                    writer.writerows(rows)
+                    archive_file.flush()
+
+                def delete_batch():
+                    if self.archive_mode == 'table':
+                        cursor.execute(
+                            f"INSERT IGNORE INTO {table}_history SELECT * FROM {table} WHERE {range_filter}",
+                            (file_name, first_id, last_id)
+                        )
+                    cursor.execute(
+                        f"DELETE FROM {table} WHERE {range_filter}", (file_name, first_id, last_id)
+                    )
+                    deleted = cursor.rowcount
+                    connection.commit()
+                    return deleted
+
+                purged += run_with_retry(
+                    delete_batch, connections=(connection,),
+                    description=f"{table} purge of {file_name}"
+                )
+                record(rows=len(rows), batches=1)
+        finally:
+            if archive_file is not None:
+                archive_file.close()
+            cursor.close()
+        return purged
+
+    def purge(self, tables=None):
+        """Archive and purge the loaded rows of every completed source file; returns {table: rows purged}"""
+        tables = list(tables or STAGING_TABLES)
+        if 'staging_sales' in tables and self.fact_load_pending():
+            # An interrupted fact load resumes from staging_id checkpoints; keep its rows
+            logging.warning("Unfinished fact load found; staging_sales is not purged")
+            tables.remove('staging_sales')
+
+        purged = {}
+        with self.connections.connection('staging') as connection:
+            cursor = connection.cursor()
+            try:
+                files = {table: self.purgeable_files(cursor, table) for table in tables}
+            finally:
+                cursor.close()
+
+            for table, file_names in files.items():
+                purged[table] = 0
+                for file_name in file_names:
+                    rows = self.purge_file(connection, table, file_name)
+                    purged[table] += rows
+                    logging.info(f"Purged {rows} rows of {file_name} from {table} (archive: {self.archive_mode})")
+        return purged
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Archive and purge loaded staging rows")
+    parser.add_argument('--tables', nargs='+', choices=list(STAGING_TABLES), help="default: all")
+    parser.add_argument('--archive', choices=ARCHIVE_MODES, help="override ETL_STAGING_ARCHIVE_MODE")
+    parser.add_argument('--retention-days', type=int, help="keep files loaded within this many days")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        filename=ETLConfig.LOG_FILE,
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    lifecycle = StagingLifecycle(archive_mode=args.archive, retention_days=args.retention_days)
+    for table, rows in lifecycle.purge(args.tables).items():
+        print(f"{table}: {rows} rows purged")
@@ -1,9 +1,5 @@
-import mysql.connector
-from mysql.connector import Error
-import pandas as pd
 from datetime import datetime
 import logging
-from config.database_config import DatabaseConfig
 from config.etl_config import ETLConfig
 import sys
 import os
@@ -11,6 +7,11 @@ import os
 # Thêm thư mục gốc vào đường dẫn Python
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from connection_manager import ConnectionManager
+from etl_metrics import record
+from date_dimension import DateDimension
+from rejects import RejectsManager
+
 logging.basicConfig(
     filename=ETLConfig.LOG_FILE,
     level=logging.INFO,
@@ -18,31 +19,13 @@ logging.basicConfig(
 )
 
 class DataTransformer:
-    def __init__(self):
-        self.staging_config = DatabaseConfig()
-        self.dw_config = DatabaseConfig()
+    def __init__(self, connection_manager=None):
+        self.connections = connection_manager or ConnectionManager.shared()
+        self.rejects = RejectsManager(self.connections)
         
     def create_connection(self, database='staging'):
-        """Create database connection"""
-        try:
-            if database == 'staging':
-                config = self.staging_config
-                db_name = config.STAGING_DATABASE
-            else:
-                config = self.dw_config
-                db_name = config.DW_DATABASE
-            
-            connection = mysql.connector.connect(
-                host=config.STAGING_HOST,
-                port=config.STAGING_PORT,
-                user=config.STAGING_USER,
-                password=config.STAGING_PASSWORD,
-                database=db_name
-            )
-            return connection
-        except Error as e:
-            logging.error(f"Error connecting to {database} database: {e}")
-            raise
+        """Borrow a pooled connection to the staging or DW database"""
+        return self.connections.get_connection(database)
     
     def validate_and_clean_sales(self):
         """Validate and clean sales data in staging"""
@@ -63,48 +46,23 @@ class DataTransformer:
             process_id = cursor.lastrowid
             connection.commit()
             
-            # Step 1: Mark invalid records
-            validation_query = """
-                UPDATE staging_sales 
-                SET processed_flag = FALSE,
-                    error_message = CASE
-                        WHEN quantity < %s THEN 'Quantity below minimum'
-                        WHEN quantity > %s THEN 'Quantity above maximum'
-                        WHEN unit_price < %s THEN 'Unit price below minimum'
-                        WHEN unit_price > %s THEN 'Unit price above maximum'
-                        WHEN total_amount != (quantity * unit_price) THEN 'Total amount mismatch'
-                        WHEN order_date < %s OR order_date > %s THEN 'Order date out of range'
-                        ELSE NULL
-                    END
-                WHERE processed_flag = FALSE 
-                AND error_message IS NULL
-            """
-            
-            cursor.execute(validation_query, (
-                ETLConfig.MIN_QUANTITY,
-                ETLConfig.MAX_QUANTITY,
-                ETLConfig.MIN_UNIT_PRICE,
-                ETLConfig.MAX_UNIT_PRICE,
-                ETLConfig.START_DATE,
-                ETLConfig.END_DATE
-            ))
-            connection.commit()
-            
-            invalid_count = cursor.rowcount
-            logging.info(f"Marked {invalid_count} invalid records")
+            # Step 1: Move invalid records to staging_sales_rejects
+            invalid_count, checked_id = self.rejects.quarantine(connection, 'staging_sales')
+            logging.info(f"Quarantined {invalid_count} invalid records")
             
-            # Step 2: Mark valid records
+            # Step 2: Mark valid records; rows extracted since the check wait for the next run
             mark_valid_query = """
                 UPDATE staging_sales 
                 SET processed_flag = TRUE
-                WHERE error_message IS NULL 
-                AND processed_flag = FALSE
+                WHERE processed_flag = FALSE
+                AND staging_id <= %s
             """
-            cursor.execute(mark_valid_query)
+            cursor.execute(mark_valid_query, (checked_id,))
             connection.commit()
             
             valid_count = cursor.rowcount
             logging.info(f"Marked {valid_count} valid records")
+            record(rows=valid_count)
             
             # Step 3: Remove duplicates (keep latest)
             deduplicate_query = """
@@ -143,8 +101,9 @@ class DataTransformer:
             raise
             
         finally:
-            if 'connection' in locals() and connection.is_connected():
-                cursor.close()
+            if 'connection' in locals():
+                if connection.is_connected():
+                    cursor.close()
                 connection.close()
     
     def transform_customers(self):
@@ -166,6 +125,9 @@ class DataTransformer:
             process_id = cursor.lastrowid
             connection.commit()
             
+            # Move records with invalid emails to staging_customers_rejects, as extracted
+            _, checked_id = self.rejects.quarantine(connection, 'staging_customers')
+            
             # Clean customer data
             transform_queries = [
                 # Trim whitespace
@@ -178,32 +140,24 @@ class DataTransformer:
                     city = TRIM(city),
                     country = TRIM(country)
                 WHERE processed_flag = FALSE
+                AND staging_id <= %s
                 """,
                 
-                # Validate email format
-                """
-                UPDATE staging_customers 
-                SET error_message = CASE
-                        WHEN email NOT LIKE '%@%.%' THEN 'Invalid email format'
-                        ELSE NULL
-                    END
-                WHERE processed_flag = FALSE
-                """,
-                
-                # Mark valid records
+                # Mark valid records, only those the quarantine checked
                 """
                 UPDATE staging_customers 
                 SET processed_flag = TRUE
-                WHERE error_message IS NULL 
-                AND processed_flag = FALSE
+                WHERE processed_flag = FALSE
+                AND staging_id <= %s
                 """
             ]
             
             total_transformed = 0
             for query in transform_queries:
-                cursor.execute(query)
+                cursor.execute(query, (checked_id,))
                 connection.commit()
                 total_transformed += cursor.rowcount
+            record(rows=total_transformed, batches=len(transform_queries))
             
             # Update metadata
             end_time = datetime.now()
@@ -223,8 +177,9 @@ class DataTransformer:
             raise
             
         finally:
-            if 'connection' in locals() and connection.is_connected():
-                cursor.close()
+            if 'connection' in locals():
+                if connection.is_connected():
+                    cursor.close()
                 connection.close()
     
     def transform_products(self):
@@ -246,6 +201,9 @@ class DataTransformer:
             process_id = cursor.lastrowid
             connection.commit()
             
+            # Move records with invalid prices to staging_products_rejects, as extracted
+            _, checked_id = self.rejects.quarantine(connection, 'staging_products')
+            
             # Clean product data
             transform_queries = [
                 # Trim whitespace and standardize
@@ -259,34 +217,24 @@ class DataTransformer:
                     ),
                     supplier = TRIM(supplier)
                 WHERE processed_flag = FALSE
+                AND staging_id <= %s
                 """,
                 
-                # Validate prices
-                """
-                UPDATE staging_products 
-                SET error_message = CASE
-                        WHEN cost_price <= 0 THEN 'Invalid cost price'
-                        WHEN msrp <= 0 THEN 'Invalid MSRP'
-                        WHEN msrp < cost_price THEN 'MSRP lower than cost'
-                        ELSE NULL
-                    END
-                WHERE processed_flag = FALSE
-                """,
-                
-                # Calculate profit margin
+                # Mark valid records, only those the quarantine checked
                 """
                 UPDATE staging_products 
                 SET processed_flag = TRUE
-                WHERE error_message IS NULL 
-                AND processed_flag = FALSE
+                WHERE processed_flag = FALSE
+                AND staging_id <= %s
                 """
             ]
             
             total_transformed = 0
             for query in transform_queries:
-                cursor.execute(query)
+                cursor.execute(query, (checked_id,))
                 connection.commit()
                 total_transformed += cursor.rowcount
+            record(rows=total_transformed, batches=len(transform_queries))
             
             # Update metadata
             end_time = datetime.now()
@@ -306,63 +254,24 @@ class DataTransformer:
             raise
             
         finally:
-            if 'connection' in locals() and connection.is_connected():
-                cursor.close()
+            if 'connection' in locals():
+                if connection.is_connected():
+                    cursor.close()
                 connection.close()
     
-    def populate_date_dimension(self, start_date='2020-01-01', end_date='2025-12-31'):
-        """Populate date dimension table"""
+    def populate_date_dimension(self, start_date=None, end_date=None):
+        """Populate date dimension table
+
+        Without a range, covers ETLConfig.START_DATE..END_DATE widened to the
+        order dates in staging; only missing dates are inserted.
+        """
         try:
             logging.info("Populating date dimension")
-            
-            connection = self.create_connection('dw')
-            cursor = connection.cursor()
-            
-            # Generate date range
-            start = datetime.strptime(start_date, '%Y-%m-%d')
-            end = datetime.strptime(end_date, '%Y-%m-%d')
-            
-            current_date = start
-            dates_to_insert = []
-            
-            while current_date <= end:
-                date_key = int(current_date.strftime('%Y%m%d'))
-                dates_to_insert.append((
-                    date_key,
-                    current_date.date(),
-                    current_date.day,
-                    current_date.month,
-                    (current_date.month - 1) // 3 + 1,
-                    current_date.year,
-                    current_date.weekday() + 1,
-                    current_date.strftime('%A'),
-                    current_date.strftime('%B'),
-                    1 if current_date.weekday() >= 5 else 0,
-                    0  # is_holiday
-                ))
-                current_date += pd.Timedelta(days=1)
-            
-            # Insert dates
-            insert_query = """
-                INSERT IGNORE INTO dim_date 
-                (date_key, full_date, day, month, quarter, year, 
-                 day_of_week, day_name, month_name, is_weekend, is_holiday)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """
-            
-            cursor.executemany(insert_query, dates_to_insert)
-            connection.commit()
-            
-            logging.info(f"Date dimension populated: {len(dates_to_insert)} dates")
+            DateDimension(self.connections).populate(start_date, end_date)
             
         except Exception as e:
             logging.error(f"Error populating date dimension: {e}")
             raise
-            
-        finally:
-            if 'connection' in locals() and connection.is_connected():
-                cursor.close()
-                connection.close()
 
 if __name__ == "__main__":
     transformer = DataTransformer()
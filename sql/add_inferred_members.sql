@@ -0,0 +1,6 @@
+-- Add inferred-member support to the dimensions of an existing installation
+-- New installs get the column from create_dw_tables.sql.
+USE sales_dw;
+
+ALTER TABLE dim_customer ADD COLUMN is_inferred BOOLEAN DEFAULT FALSE AFTER is_current;
+ALTER TABLE dim_product ADD COLUMN is_inferred BOOLEAN DEFAULT FALSE AFTER is_current;
@@ -0,0 +1,13 @@
+-- Add what the staging purge needs to an existing staging database
+-- New installs get these from create_staging_tables.sql.
+USE staging_sales;
+
+-- Purge walks each source file in staging_id order
+CREATE INDEX idx_staging_sales_file_name ON staging_sales(file_name, staging_id);
+CREATE INDEX idx_staging_customers_file_name ON staging_customers(file_name, staging_id);
+CREATE INDEX idx_staging_products_file_name ON staging_products(file_name, staging_id);
+
+-- Archive of purged staging rows (ETL_STAGING_ARCHIVE_MODE=table)
+CREATE TABLE IF NOT EXISTS staging_sales_history LIKE staging_sales;
+CREATE TABLE IF NOT EXISTS staging_customers_history LIKE staging_customers;
+CREATE TABLE IF NOT EXISTS staging_products_history LIKE staging_products;
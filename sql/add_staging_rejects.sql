@@ -0,0 +1,84 @@
+-- Move rows rejected by validation out of an existing staging database
+-- New installs get the rejects tables from create_staging_tables.sql. Run
+-- after sql/add_staging_archive.sql. Sales rows flagged with error_message
+-- move to staging_sales_rejects, then the column is dropped.
+USE staging_sales;
+
+CREATE TABLE IF NOT EXISTS staging_sales_rejects (
+    reject_id INT AUTO_INCREMENT PRIMARY KEY,
+    staging_id INT,
+    order_id VARCHAR(50),
+    order_date DATE,
+    customer_id VARCHAR(50),
+    product_id VARCHAR(50),
+    quantity INT,
+    unit_price DECIMAL(10, 2),
+    total_amount DECIMAL(12, 2),
+    file_name VARCHAR(255),
+    load_timestamp TIMESTAMP NULL,
+    reason_code VARCHAR(50) NOT NULL,
+    error_message VARCHAR(255),
+    rejected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    KEY idx_staging_sales_rejects_reason (reason_code, file_name)
+);
+
+CREATE TABLE IF NOT EXISTS staging_customers_rejects (
+    reject_id INT AUTO_INCREMENT PRIMARY KEY,
+    staging_id INT,
+    customer_id VARCHAR(50),
+    customer_name VARCHAR(255),
+    email VARCHAR(255),
+    phone VARCHAR(50),
+    address TEXT,
+    city VARCHAR(100),
+    country VARCHAR(100),
+    registration_date DATE,
+    file_name VARCHAR(255),
+    load_timestamp TIMESTAMP NULL,
+    reason_code VARCHAR(50) NOT NULL,
+    error_message VARCHAR(255),
+    rejected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    KEY idx_staging_customers_rejects_reason (reason_code, file_name)
+);
+
+CREATE TABLE IF NOT EXISTS staging_products_rejects (
+    reject_id INT AUTO_INCREMENT PRIMARY KEY,
+    staging_id INT,
+    product_id VARCHAR(50),
+    product_name VARCHAR(255),
+    category VARCHAR(100),
+    subcategory VARCHAR(100),
+    supplier VARCHAR(255),
+    cost_price DECIMAL(10, 2),
+    msrp DECIMAL(10, 2),
+    file_name VARCHAR(255),
+    load_timestamp TIMESTAMP NULL,
+    reason_code VARCHAR(50) NOT NULL,
+    error_message VARCHAR(255),
+    rejected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    KEY idx_staging_products_rejects_reason (reason_code, file_name)
+);
+
+INSERT INTO staging_sales_rejects
+(staging_id, order_id, order_date, customer_id, product_id, quantity, unit_price,
+ total_amount, file_name, load_timestamp, reason_code, error_message)
+SELECT
+    staging_id, order_id, order_date, customer_id, product_id, quantity, unit_price,
+    total_amount, file_name, load_timestamp,
+    CASE error_message
+        WHEN 'Quantity below minimum' THEN 'QUANTITY_BELOW_MIN'
+        WHEN 'Quantity above maximum' THEN 'QUANTITY_ABOVE_MAX'
+        WHEN 'Unit price below minimum' THEN 'UNIT_PRICE_BELOW_MIN'
+        WHEN 'Unit price above maximum' THEN 'UNIT_PRICE_ABOVE_MAX'
+        WHEN 'Total amount mismatch' THEN 'TOTAL_MISMATCH'
+        WHEN 'Order date out of range' THEN 'ORDER_DATE_OUT_OF_RANGE'
+        ELSE 'UNKNOWN'
+    END,
+    LEFT(error_message, 255)
+FROM staging_sales
+WHERE error_message IS NOT NULL;
+
+DELETE FROM staging_sales WHERE error_message IS NOT NULL;
+
+ALTER TABLE staging_sales DROP COLUMN error_message;
+ALTER TABLE staging_sales_history DROP COLUMN error_message;
@@ -0,0 +1,11 @@
+-- Add the holiday name and fiscal period columns to an existing dim_date
+-- New installs get them from create_dw_tables.sql. Afterwards run
+--     python scripts/date_dimension.py --refresh
+-- to fill them for the dates already in the table.
+USE sales_dw;
+
+ALTER TABLE dim_date
+    ADD COLUMN holiday_name VARCHAR(100) AFTER is_holiday,
+    ADD COLUMN fiscal_year INT AFTER holiday_name,
+    ADD COLUMN fiscal_quarter INT AFTER fiscal_year,
+    ADD COLUMN fiscal_month INT AFTER fiscal_quarter;
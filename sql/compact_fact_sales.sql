@@ -0,0 +1,78 @@
+-- Move an existing fact_sales to the compact layout of create_dw_tables.sql
+-- order_id moves to dim_order and the fact keeps its 4-byte order_key;
+-- order_timestamp (always the order date) is dropped in favour of date_key;
+-- cost, profit and margin become generated columns over the stored unit_cost.
+-- Run after partition_fact_sales.sql and tune_indexes.sql. The facts are
+-- copied into a new table with the same partitions and swapped in by
+-- RENAME, so readers see either the old or the new table, never a mix.
+-- Partitions archived earlier (fact_sales_archive_<yyyymm>) keep the old
+-- layout and must be migrated the same way before they are exchanged back.
+USE sales_dw;
+
+CREATE TABLE IF NOT EXISTS dim_order (
+    order_key INT UNSIGNED AUTO_INCREMENT PRIMARY KEY,
+    order_id VARCHAR(50) NOT NULL,
+    UNIQUE KEY unique_order_id (order_id)
+);
+
+INSERT IGNORE INTO dim_order (order_id)
+SELECT DISTINCT order_id FROM fact_sales;
+
+-- Same partitions and secondary indexes as the current table; dropping
+-- order_timestamp also drops idx_fact_sales_order_timestamp
+CREATE TABLE fact_sales_compact LIKE fact_sales;
+
+ALTER TABLE fact_sales_compact
+    DROP INDEX unique_order,
+    DROP COLUMN order_id,
+    DROP COLUMN order_timestamp,
+    DROP COLUMN cost_amount,
+    DROP COLUMN profit_amount,
+    DROP COLUMN profit_margin,
+    ADD COLUMN order_key INT UNSIGNED NOT NULL AFTER product_key,
+    MODIFY quantity SMALLINT UNSIGNED NOT NULL,
+    MODIFY unit_price DECIMAL(8, 2) NOT NULL,
+    MODIFY total_amount DECIMAL(10, 2) NOT NULL,
+    ADD COLUMN unit_cost DECIMAL(8, 2) AFTER total_amount,
+    ADD UNIQUE KEY unique_order (order_key, product_key, date_key);
+
+ALTER TABLE fact_sales_compact
+    ADD COLUMN cost_amount DECIMAL(12, 2) AS (quantity * unit_cost) VIRTUAL,
+    ADD COLUMN profit_amount DECIMAL(12, 2) AS (total_amount - quantity * unit_cost) VIRTUAL,
+    ADD COLUMN profit_margin DECIMAL(8, 2) AS (
+        IF(total_amount > 0, ROUND((total_amount - quantity * unit_cost) / total_amount * 100, 2), 0)
+    ) VIRTUAL;
+
+-- The stored cost was quantity * cost_price rounded to cents, so dividing
+-- by quantity gives back the unit cost the line was loaded with
+INSERT INTO fact_sales_compact
+(sales_key, date_key, customer_key, product_key, order_key,
+ quantity, unit_price, total_amount, unit_cost)
+SELECT
+    fs.sales_key,
+    fs.date_key,
+    fs.customer_key,
+    fs.product_key,
+    o.order_key,
+    fs.quantity,
+    fs.unit_price,
+    fs.total_amount,
+    ROUND(fs.cost_amount / fs.quantity, 2)
+FROM fact_sales fs
+JOIN dim_order o ON fs.order_id = o.order_id;
+
+RENAME TABLE fact_sales TO fact_sales_wide, fact_sales_compact TO fact_sales;
+
+-- Views read fact_sales.order_id; recreate them from tableau_queries.sql:
+--     mysql sales_dw < sql/tableau_queries.sql
+-- agg_sales_daily is unchanged (order_key counts the same orders); the
+-- OLAP mirror still has the old columns and is rebuilt:
+--     python scripts/olap_mirror.py refresh --rebuild
+-- Once the row counts of fact_sales and fact_sales_wide match:
+--     DROP TABLE fact_sales_wide;
+
+-- Optional: InnoDB page compression, trading CPU on every page read and
+-- write for more rows per buffer pool page. Needs innodb_file_per_table
+-- and a filesystem with hole punching; OPTIMIZE rebuilds the existing pages.
+--     ALTER TABLE fact_sales COMPRESSION = 'zlib';
+--     OPTIMIZE TABLE fact_sales;
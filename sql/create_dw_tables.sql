@@ -15,6 +15,10 @@ CREATE TABLE IF NOT EXISTS dim_date (
     month_name VARCHAR(20),
     is_weekend BOOLEAN,
     is_holiday BOOLEAN DEFAULT FALSE,
+    holiday_name VARCHAR(100),
+    fiscal_year INT,
+    fiscal_quarter INT,
+    fiscal_month INT,
     UNIQUE KEY unique_full_date (full_date)
 );
 
@@ -33,6 +37,9 @@ CREATE TABLE IF NOT EXISTS dim_customer (
     valid_from DATE NOT NULL,
     valid_to DATE,
     is_current BOOLEAN DEFAULT TRUE,
+    -- Placeholder created by the fact load for a customer_id not loaded yet,
+    -- filled in by the next dimension load, cleared once facts are reconciled
+    is_inferred BOOLEAN DEFAULT FALSE,
     UNIQUE KEY unique_customer_id (customer_id, valid_from)
 );
 
@@ -50,31 +57,53 @@ CREATE TABLE IF NOT EXISTS dim_product (
     valid_from DATE NOT NULL,
     valid_to DATE,
     is_current BOOLEAN DEFAULT TRUE,
+    -- Placeholder created by the fact load for a product_id not loaded yet,
+    -- filled in by the next dimension load, cleared once facts are reconciled
+    is_inferred BOOLEAN DEFAULT FALSE,
     UNIQUE KEY unique_product_id (product_id, valid_from)
 );
 
+-- Dimension: Order
+-- Maps the source order_id to the 4-byte key stored on every fact line
+CREATE TABLE IF NOT EXISTS dim_order (
+    order_key INT UNSIGNED AUTO_INCREMENT PRIMARY KEY,
+    order_id VARCHAR(50) NOT NULL,
+    UNIQUE KEY unique_order_id (order_id)
+);
+
 -- Fact: Sales
+-- Partitioned by month on date_key. scripts/partition_manager.py splits
+-- monthly partitions (p202401 < 20240201) out of p_future ahead of the data.
+-- Partitioned InnoDB tables cannot have foreign keys, so dimension keys are
+-- guaranteed by the loader, and every unique key includes date_key.
+-- Columns are sized to the validation limits in ETLConfig (quantity up to
+-- MAX_QUANTITY, prices up to MAX_UNIT_PRICE). The cost, profit and margin
+-- measures are computed on read from unit_cost, so they take no space.
 CREATE TABLE IF NOT EXISTS fact_sales (
-    sales_key BIGINT AUTO_INCREMENT PRIMARY KEY,
+    sales_key BIGINT AUTO_INCREMENT,
     date_key INT NOT NULL,
     customer_key INT NOT NULL,
     product_key INT NOT NULL,
-    order_id VARCHAR(50) NOT NULL,
-    quantity INT NOT NULL,
-    unit_price DECIMAL(10, 2) NOT NULL,
-    total_amount DECIMAL(12, 2) NOT NULL,
-    cost_amount DECIMAL(12, 2),
-    profit_amount DECIMAL(12, 2),
-    profit_margin DECIMAL(5, 2),
-    order_timestamp TIMESTAMP,
+    order_key INT UNSIGNED NOT NULL,
+    quantity SMALLINT UNSIGNED NOT NULL,
+    unit_price DECIMAL(8, 2) NOT NULL,
+    total_amount DECIMAL(10, 2) NOT NULL,
+    -- Product cost at load time, later dim_product versions do not change it
+    unit_cost DECIMAL(8, 2),
+    cost_amount DECIMAL(12, 2) AS (quantity * unit_cost) VIRTUAL,
+    profit_amount DECIMAL(12, 2) AS (total_amount - quantity * unit_cost) VIRTUAL,
+    profit_margin DECIMAL(8, 2) AS (
+        IF(total_amount > 0, ROUND((total_amount - quantity * unit_cost) / total_amount * 100, 2), 0)
+    ) VIRTUAL,
     
-    -- Foreign keys
-    FOREIGN KEY (date_key) REFERENCES dim_date(date_key),
-    FOREIGN KEY (customer_key) REFERENCES dim_customer(customer_key),
-    FOREIGN KEY (product_key) REFERENCES dim_product(product_key),
+    PRIMARY KEY (sales_key, date_key),
     
     -- Business keys
-    UNIQUE KEY unique_order (order_id, product_key)
+    UNIQUE KEY unique_order (order_key, product_key, date_key)
+)
+PARTITION BY RANGE (date_key) (
+    PARTITION p_history VALUES LESS THAN (20200101),
+    PARTITION p_future VALUES LESS THAN MAXVALUE
 );
 
 -- Create aggregate table for performance
@@ -88,7 +117,69 @@ CREATE TABLE IF NOT EXISTS agg_sales_daily (
     avg_unit_price DECIMAL(10, 2),
     order_count INT,
     unique_customers INT,
+    total_profit DECIMAL(12, 2),
+    line_count INT,
+    sum_profit_margin DECIMAL(14, 2),
     FOREIGN KEY (date_key) REFERENCES dim_date(date_key),
     FOREIGN KEY (customer_key) REFERENCES dim_customer(customer_key),
     FOREIGN KEY (product_key) REFERENCES dim_product(product_key)
-);
\ No newline at end of file
+);
+
+-- Process tracking for the loaders, which write their metadata to the DW
+CREATE TABLE IF NOT EXISTS etl_metadata (
+    process_id INT AUTO_INCREMENT PRIMARY KEY,
+    process_name VARCHAR(100),
+    source_file VARCHAR(255),
+    records_extracted INT,
+    records_transformed INT,
+    records_loaded INT,
+    start_time TIMESTAMP,
+    end_time TIMESTAMP,
+    status VARCHAR(50),
+    error_message TEXT
+);
+
+-- Last committed batch of each fact load, used to resume after a failure
+CREATE TABLE IF NOT EXISTS etl_checkpoint (
+    process_id INT PRIMARY KEY,
+    process_name VARCHAR(100) NOT NULL,
+    partition_key VARCHAR(50) NOT NULL DEFAULT '',
+    last_staging_id INT NOT NULL,
+    records_loaded INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    KEY idx_etl_checkpoint_partition (process_name, partition_key)
+);
+
+-- Indexes dropped for a bulk load until they are rebuilt (scripts/bulk_load.py)
+CREATE TABLE IF NOT EXISTS etl_deferred_index (
+    table_name VARCHAR(64) NOT NULL,
+    index_name VARCHAR(64) NOT NULL,
+    is_unique BOOLEAN NOT NULL,
+    column_list VARCHAR(500) NOT NULL,
+    deferred_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (table_name, index_name)
+);
+
+-- Per-stage performance telemetry, one row per stage per run
+CREATE TABLE IF NOT EXISTS etl_stage_metrics (
+    metric_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    run_id VARCHAR(64) NOT NULL,
+    stage_name VARCHAR(100) NOT NULL,
+    status VARCHAR(20),
+    started_at DATETIME,
+    duration_seconds DECIMAL(12, 3),
+    rows_processed BIGINT DEFAULT 0,
+    rows_per_second DECIMAL(14, 2),
+    bytes_read BIGINT DEFAULT 0,
+    batches INT DEFAULT 0,
+    round_trips INT DEFAULT 0,
+    retries INT DEFAULT 0,
+    parse_seconds DECIMAL(12, 3) DEFAULT 0,
+    transform_seconds DECIMAL(12, 3) DEFAULT 0,
+    db_wait_seconds DECIMAL(12, 3) DEFAULT 0,
+    peak_rss_mb DECIMAL(10, 1),
+    error_message TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_stage_metrics_run (run_id),
+    INDEX idx_stage_metrics_stage (stage_name, started_at)
+);
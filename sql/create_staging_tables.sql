@@ -14,8 +14,7 @@ CREATE TABLE IF NOT EXISTS staging_sales (
     total_amount DECIMAL(12, 2),
     file_name VARCHAR(255),
     load_timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    processed_flag BOOLEAN DEFAULT FALSE,
-    error_message TEXT
+    processed_flag BOOLEAN DEFAULT FALSE
 );
 
 -- Table for raw customers data
@@ -49,12 +48,80 @@ CREATE TABLE IF NOT EXISTS staging_products (
     processed_flag BOOLEAN DEFAULT FALSE
 );
 
+-- Rows rejected by validation, moved out of staging (see scripts/rejects.py)
+CREATE TABLE IF NOT EXISTS staging_sales_rejects (
+    reject_id INT AUTO_INCREMENT PRIMARY KEY,
+    staging_id INT,
+    order_id VARCHAR(50),
+    order_date DATE,
+    customer_id VARCHAR(50),
+    product_id VARCHAR(50),
+    quantity INT,
+    unit_price DECIMAL(10, 2),
+    total_amount DECIMAL(12, 2),
+    file_name VARCHAR(255),
+    load_timestamp TIMESTAMP NULL,
+    reason_code VARCHAR(50) NOT NULL,
+    error_message VARCHAR(255),
+    rejected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    KEY idx_staging_sales_rejects_reason (reason_code, file_name)
+);
+
+CREATE TABLE IF NOT EXISTS staging_customers_rejects (
+    reject_id INT AUTO_INCREMENT PRIMARY KEY,
+    staging_id INT,
+    customer_id VARCHAR(50),
+    customer_name VARCHAR(255),
+    email VARCHAR(255),
+    phone VARCHAR(50),
+    address TEXT,
+    city VARCHAR(100),
+    country VARCHAR(100),
+    registration_date DATE,
+    file_name VARCHAR(255),
+    load_timestamp TIMESTAMP NULL,
+    reason_code VARCHAR(50) NOT NULL,
+    error_message VARCHAR(255),
+    rejected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    KEY idx_staging_customers_rejects_reason (reason_code, file_name)
+);
+
+CREATE TABLE IF NOT EXISTS staging_products_rejects (
+    reject_id INT AUTO_INCREMENT PRIMARY KEY,
+    staging_id INT,
+    product_id VARCHAR(50),
+    product_name VARCHAR(255),
+    category VARCHAR(100),
+    subcategory VARCHAR(100),
+    supplier VARCHAR(255),
+    cost_price DECIMAL(10, 2),
+    msrp DECIMAL(10, 2),
+    file_name VARCHAR(255),
+    load_timestamp TIMESTAMP NULL,
+    reason_code VARCHAR(50) NOT NULL,
+    error_message VARCHAR(255),
+    rejected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    KEY idx_staging_products_rejects_reason (reason_code, file_name)
+);
+
 -- Create indexes for better performance
 CREATE INDEX idx_staging_sales_order_date ON staging_sales(order_date);
 CREATE INDEX idx_staging_sales_customer_id ON staging_sales(customer_id);
 CREATE INDEX idx_staging_sales_product_id ON staging_sales(product_id);
+-- Validation, the fact load's month list and the date dimension range filter on processed_flag
+CREATE INDEX idx_staging_sales_processed ON staging_sales(processed_flag, order_date);
+-- Deduplication joins order lines on order_id and product_id
+CREATE INDEX idx_staging_sales_order_line ON staging_sales(order_id, product_id);
 CREATE INDEX idx_staging_customers_customer_id ON staging_customers(customer_id);
 CREATE INDEX idx_staging_products_product_id ON staging_products(product_id);
+CREATE INDEX idx_staging_sales_file_name ON staging_sales(file_name, staging_id);
+CREATE INDEX idx_staging_customers_file_name ON staging_customers(file_name, staging_id);
+CREATE INDEX idx_staging_products_file_name ON staging_products(file_name, staging_id);
+
+-- Archive of purged staging rows (ETL_STAGING_ARCHIVE_MODE=table)
+CREATE TABLE IF NOT EXISTS staging_sales_history LIKE staging_sales;
+CREATE TABLE IF NOT EXISTS staging_customers_history LIKE staging_customers;
+CREATE TABLE IF NOT EXISTS staging_products_history LIKE staging_products;
 
 -- Create metadata table for tracking ETL processes
 CREATE TABLE IF NOT EXISTS etl_metadata (
@@ -4,6 +4,12 @@
 DROP TABLE IF EXISTS staging_sales;
 DROP TABLE IF EXISTS staging_customers;
 DROP TABLE IF EXISTS staging_products;
+DROP TABLE IF EXISTS staging_sales_history;
+DROP TABLE IF EXISTS staging_customers_history;
+DROP TABLE IF EXISTS staging_products_history;
+DROP TABLE IF EXISTS staging_sales_rejects;
+DROP TABLE IF EXISTS staging_customers_rejects;
+DROP TABLE IF EXISTS staging_products_rejects;
 DROP TABLE IF EXISTS etl_metadata;
 
 -- Drop DW tables
@@ -12,6 +18,10 @@ DROP TABLE IF EXISTS agg_sales_daily;
 DROP TABLE IF EXISTS dim_customer;
 DROP TABLE IF EXISTS dim_product;
 DROP TABLE IF EXISTS dim_date;
+DROP TABLE IF EXISTS dim_order;
+DROP TABLE IF EXISTS etl_checkpoint;
+DROP TABLE IF EXISTS etl_deferred_index;
+DROP TABLE IF EXISTS etl_stage_metrics;
 
 -- Drop databases
 DROP DATABASE IF EXISTS staging_sales;
@@ -0,0 +1,25 @@
+-- Partition an existing, unpartitioned fact_sales by month on date_key
+-- New installs get the partitioned table from create_dw_tables.sql.
+-- Rows land in p_future first; running
+--     python scripts/partition_manager.py ensure
+-- afterwards splits them into monthly partitions (a one-off copy).
+USE sales_dw;
+
+-- Partitioned InnoDB tables cannot have foreign keys (default constraint names)
+ALTER TABLE fact_sales
+    DROP FOREIGN KEY fact_sales_ibfk_1,
+    DROP FOREIGN KEY fact_sales_ibfk_2,
+    DROP FOREIGN KEY fact_sales_ibfk_3;
+
+-- Every unique key must contain the partitioning column
+ALTER TABLE fact_sales
+    DROP PRIMARY KEY,
+    ADD PRIMARY KEY (sales_key, date_key),
+    DROP INDEX unique_order,
+    ADD UNIQUE KEY unique_order (order_id, product_key, date_key);
+
+ALTER TABLE fact_sales
+PARTITION BY RANGE (date_key) (
+    PARTITION p_history VALUES LESS THAN (20200101),
+    PARTITION p_future VALUES LESS THAN MAXVALUE
+);
@@ -8,7 +8,7 @@ SELECT
     d.day_name,
     SUM(fs.total_amount) as daily_sales,
     SUM(fs.quantity) as total_quantity,
-    COUNT(DISTINCT fs.order_id) as order_count,
+    COUNT(DISTINCT fs.order_key) as order_count,
     COUNT(DISTINCT fs.customer_key) as customer_count
 FROM fact_sales fs
 JOIN dim_date d ON fs.date_key = d.date_key
@@ -22,7 +22,7 @@ SELECT
     c.city,
     c.country,
     SUM(fs.total_amount) as total_spent,
-    COUNT(DISTINCT fs.order_id) as order_count,
+    COUNT(DISTINCT fs.order_key) as order_count,
     AVG(fs.total_amount) as avg_order_value
 FROM fact_sales fs
 JOIN dim_customer c ON fs.customer_key = c.customer_key
@@ -55,7 +55,7 @@ SELECT
     d.month_name,
     SUM(fs.total_amount) as monthly_sales,
     SUM(fs.profit_amount) as monthly_profit,
-    COUNT(DISTINCT fs.order_id) as order_count,
+    COUNT(DISTINCT fs.order_key) as order_count,
     COUNT(DISTINCT fs.customer_key) as customer_count
 FROM fact_sales fs
 JOIN dim_date d ON fs.date_key = d.date_key
@@ -68,23 +68,24 @@ SELECT
     COUNT(DISTINCT c.customer_key) as customer_count,
     SUM(fs.total_amount) as segment_revenue,
     AVG(fs.total_amount) as avg_customer_value,
-    COUNT(DISTINCT fs.order_id) / COUNT(DISTINCT c.customer_key) as avg_orders_per_customer
+    COUNT(DISTINCT fs.order_key) / COUNT(DISTINCT c.customer_key) as avg_orders_per_customer
 FROM fact_sales fs
 JOIN dim_customer c ON fs.customer_key = c.customer_key
 WHERE c.is_current = TRUE
 GROUP BY c.customer_segment
 ORDER BY segment_revenue DESC;
 
--- 6. Hourly Sales Pattern (if timestamp available)
+-- 6. Weekday Sales Pattern (orders carry a date, not a time of day)
 SELECT 
-    HOUR(order_timestamp) as hour_of_day,
-    COUNT(DISTINCT order_id) as order_count,
-    SUM(total_amount) as hourly_sales,
-    AVG(total_amount) as avg_order_value
-FROM fact_sales
-WHERE order_timestamp IS NOT NULL
-GROUP BY HOUR(order_timestamp)
-ORDER BY hour_of_day;
+    d.day_of_week,
+    d.day_name,
+    COUNT(DISTINCT fs.order_key) as order_count,
+    SUM(fs.total_amount) as weekday_sales,
+    AVG(fs.total_amount) as avg_order_value
+FROM fact_sales fs
+JOIN dim_date d ON fs.date_key = d.date_key
+GROUP BY d.day_of_week, d.day_name
+ORDER BY d.day_of_week;
 
 -- 7. Year-over-Year Growth
 SELECT 
@@ -141,9 +142,10 @@ FROM (
     SELECT 
         c.customer_key,
         YEAR(c.registration_date) as registration_year,
-        YEAR(MAX(fs.order_timestamp)) as last_order_year
+        YEAR(MAX(d.full_date)) as last_order_year
     FROM dim_customer c
     LEFT JOIN fact_sales fs ON c.customer_key = fs.customer_key
+    LEFT JOIN dim_date d ON fs.date_key = d.date_key
     WHERE c.is_current = TRUE
     GROUP BY c.customer_key, c.registration_date
 ) customer_data
@@ -156,7 +158,7 @@ SELECT
     c.city,
     COUNT(DISTINCT c.customer_key) as customer_count,
     SUM(fs.total_amount) as regional_sales,
-    COUNT(DISTINCT fs.order_id) as order_count,
+    COUNT(DISTINCT fs.order_key) as order_count,
     AVG(fs.total_amount) as avg_order_value
 FROM fact_sales fs
 JOIN dim_customer c ON fs.customer_key = c.customer_key
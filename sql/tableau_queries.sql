@@ -2,8 +2,9 @@
 CREATE OR REPLACE VIEW tableau_sales_view AS
 SELECT 
     fs.sales_key,
-    fs.order_id,
-    fs.order_timestamp,
+    o.order_id,
+    -- fact_sales no longer stores the order timestamp; orders carry only a date
+    CAST(d.full_date AS DATETIME) AS order_timestamp,
     fs.quantity,
     fs.unit_price,
     fs.total_amount,
@@ -45,6 +46,7 @@ FROM fact_sales fs
 JOIN dim_date d ON fs.date_key = d.date_key
 JOIN dim_customer c ON fs.customer_key = c.customer_key
 JOIN dim_product p ON fs.product_key = p.product_key
+JOIN dim_order o ON fs.order_key = o.order_key
 WHERE c.is_current = TRUE AND p.is_current = TRUE;
 
 -- 2. Daily Aggregates View
@@ -57,7 +59,7 @@ SELECT
     d.day_name,
     d.is_weekend,
     
-    COUNT(DISTINCT fs.order_id) as order_count,
+    COUNT(DISTINCT fs.order_key) as order_count,
     COUNT(DISTINCT fs.customer_key) as customer_count,
     SUM(fs.quantity) as total_quantity,
     SUM(fs.total_amount) as total_sales,
@@ -100,7 +102,7 @@ SELECT
     c.customer_segment,
     c.registration_date,
     
-    COUNT(DISTINCT fs.order_id) as total_orders,
+    COUNT(DISTINCT fs.order_key) as total_orders,
     SUM(fs.quantity) as total_quantity,
     SUM(fs.total_amount) as lifetime_value,
     AVG(fs.total_amount) as avg_order_value,
@@ -112,7 +114,7 @@ SELECT
     ) as days_since_last_order,
     
     -- Frequency (orders per month)
-    COUNT(DISTINCT fs.order_id) / 
+    COUNT(DISTINCT fs.order_key) / 
     NULLIF(DATEDIFF(CURDATE(), MIN(d.full_date)) / 30.44, 0) as monthly_frequency,
     
     -- Monetary segments
@@ -143,7 +145,7 @@ SELECT
     p.msrp,
     p.profit_margin as expected_margin,
     
-    COUNT(DISTINCT fs.order_id) as times_ordered,
+    COUNT(DISTINCT fs.order_key) as times_ordered,
     SUM(fs.quantity) as total_quantity_sold,
     SUM(fs.total_amount) as total_revenue,
     SUM(fs.cost_amount) as total_cost,
@@ -159,7 +161,7 @@ SELECT
     
     -- Category performance
     SUM(SUM(fs.total_amount)) OVER (PARTITION BY p.category) as category_revenue,
-    SUM(COUNT(DISTINCT fs.order_id)) OVER (PARTITION BY p.category) as category_orders
+    SUM(COUNT(DISTINCT fs.order_key)) OVER (PARTITION BY p.category) as category_orders
     
 FROM fact_sales fs
 JOIN dim_product p ON fs.product_key = p.product_key
@@ -174,7 +176,7 @@ SELECT
     c.city,
     
     COUNT(DISTINCT c.customer_key) as customer_count,
-    COUNT(DISTINCT fs.order_id) as order_count,
+    COUNT(DISTINCT fs.order_key) as order_count,
     SUM(fs.quantity) as total_quantity,
     SUM(fs.total_amount) as total_sales,
     SUM(fs.profit_amount) as total_profit,
@@ -0,0 +1,21 @@
+-- Bring the indexes of an existing installation in line with
+-- create_staging_tables.sql and create_indexes.sql
+-- Redundant single-column indexes are dropped after their replacements exist.
+USE staging_sales;
+
+CREATE INDEX idx_staging_sales_processed ON staging_sales(processed_flag, order_date);
+CREATE INDEX idx_staging_sales_order_line ON staging_sales(order_id, product_id);
+
+USE sales_dw;
+
+CREATE INDEX idx_dim_customer_current ON dim_customer(customer_id, is_current);
+DROP INDEX idx_dim_customer_customer_id ON dim_customer;
+
+CREATE INDEX idx_dim_product_current ON dim_product(product_id, is_current, cost_price);
+DROP INDEX idx_dim_product_product_id ON dim_product;
+
+DROP INDEX idx_dim_date_full_date ON dim_date;
+DROP INDEX idx_fact_sales_order_id ON fact_sales;
+
+CREATE INDEX idx_agg_sales_daily_grain ON agg_sales_daily(customer_key, product_key, date_key);
+DROP INDEX idx_agg_sales_daily_customer_key ON agg_sales_daily;